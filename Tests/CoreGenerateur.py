@@ -1,8 +1,12 @@
 import json
 from enum import Enum
-from collections import defaultdict, Counter
-import re
-import string
+from collections import defaultdict, Counter, deque
+
+from conceptNormalizer import ConceptNormalizer, STOP_WORDS
+from ontologySnapshot import write_snapshot
+from ontologyStore import write_store
+from checkpointStore import iter_results, iter_result_lines, decode_record, is_checkpoint
+from extractionIndex import ExtractionIndex, content_hash
 
 class TypeRelation(Enum):
     IMPLIQUE = "implique"
@@ -34,42 +38,15 @@ class TypeRelation(Enum):
     IDENTIQUE_A = "identique_à"
     PERSONNALISEE = "personnalisée"
 
+# Moteur de normalisation partagé (règles précompilées, résultats mémorisés, rejets comptés par règle)
+NORMALIZER = ConceptNormalizer()
+# Version des règles de collect_entries et de conceptNormalizer : à incrémenter quand elles
+# changent, pour que les index d'extraction incrémentale (extractionIndex) soient reconstruits
+EXTRACTION_RULES_VERSION = 1
+
 def clean_concept(concept):
-    """Nettoie et normalise les concepts."""
-    if not isinstance(concept, str):
-        return None
-    
-    # Enlever les caractères indésirables et normaliser
-    concept = concept.strip().upper()
-    
-    # Enlever les prefixes comme "LA ", "LE ", "LES ", etc.
-    concept = re.sub(r'^(LA |LE |LES |L\'|UN |UNE |DES |DU |DE LA |DE L\')', '', concept)
-    
-    # Enlever les phrases explicatives qui commencent par des mots comme "VOICI"
-    if any(phrase in concept for phrase in ['VOICI', 'CONCEPTS LIÉS', 'EST EXPLIQUÉ PAR', 'SONT :', 'PAR LA RELATION']):
-        return None
-    
-    # Enlever les concepts trop longs (probablement des descriptions)
-    if len(concept) > 50:
-        return None
-    
-    # Enlever les concepts vides ou avec des caractères spéciaux indésirables
-    if not concept or concept in ['', ' '] or '\n' in concept:
-        return None
-    
-    # Enlever les concepts qui contiennent deux espaces (pas forcement consécutifs)
-    if '  ' in concept:
-        return None
-    
-    # Enleer les concepts qui contiennent un espace ET qui font plus de 22 caractères
-    if ' ' in concept and len(concept) > 22:
-        return None
-    
-    # Enlever les concepts qui sont juste des mots de liaison
-    if concept in ['ET', 'OU', 'DONC', 'MAIS', 'CAR', 'PUIS', 'ALORS']:
-        return None
-    
-    return concept
+    """Nettoie et normalise les concepts (voir conceptNormalizer.clean_rule)."""
+    return NORMALIZER.clean(concept)
 
 def normalize_relation_key(relation_key):
     """Normalise les clés de relations pour correspondre à l'enum."""
@@ -105,18 +82,14 @@ def normalize_relation_key(relation_key):
     }
     return mapping.get(relation_key, relation_key)
 
-def extract_ontology_from_json(json_file_path, min_concept_frequency=2):
-    """Extrait l'ontologie depuis le fichier JSON."""
-    
-    with open(json_file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # Dictionnaires pour stocker les données
-    all_concepts = Counter()
-    all_relations = set()
-    
-    # Parcourir toutes les entrées
-    for entry_id, entry_data in data.items():
+def collect_entries(entries, all_concepts, all_relations, unknown_relations=None):
+    """
+    Ajoute à all_concepts (Counter) et all_relations (set de triplets) les concepts et
+    relations d'une suite d'entrées (entry_id, entry_data). Les types de relation inconnus
+    sont affichés, ou ajoutés à unknown_relations (une fois par occurrence) si la liste est
+    fournie.
+    """
+    for entry_id, entry_data in entries:
         mot_principal = entry_data.get('mot', '').strip().upper()
         
         if mot_principal:
@@ -129,42 +102,186 @@ def extract_ontology_from_json(json_file_path, min_concept_frequency=2):
                 continue
                 
             relation_type_normalized = normalize_relation_key(relation_type)
+            relation_enum = TypeRelation.__members__.get(relation_type_normalized)
             
-            # Parcourir les concepts liés
-            for concept in relation_data['concepts']:
-                concept_clean = clean_concept(concept)
-                if concept_clean and concept_clean != mot_principal:
+            # Parcourir les concepts liés (nettoyés en un appel, rejets exclus)
+            for concept_clean in NORMALIZER.clean_many(relation_data['concepts']):
+                if concept_clean != mot_principal:
                     if ' ' in concept_clean:
                         sous_concepts = [c for c in concept_clean.split(' ') if c]
-                        for sous_concept in sous_concepts:
-                            all_concepts[sous_concept] += 1
-                            try:
-                                relation_enum = TypeRelation[relation_type_normalized]
-                                all_relations.add((mot_principal, relation_enum, sous_concept))
-                            except KeyError:
-                                print(f"Relation inconnue: {relation_type_normalized}")
                     else:
-                        all_concepts[concept_clean] += 1
-                        try:
-                            relation_enum = TypeRelation[relation_type_normalized]
-                            all_relations.add((mot_principal, relation_enum, concept_clean))
-                        except KeyError:
+                        sous_concepts = (concept_clean,)
+                    for sous_concept in sous_concepts:
+                        all_concepts[sous_concept] += 1
+                        if relation_enum is not None:
+                            all_relations.add((mot_principal, relation_enum, sous_concept))
+                        elif unknown_relations is not None:
+                            unknown_relations.append(relation_type_normalized)
+                        else:
                             print(f"Relation inconnue: {relation_type_normalized}")
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _reset_worker():
+    # Avec fork, le processus hérite des compteurs du parent : ne remonter que les siens
+    NORMALIZER.take_counts()
+
+def _collect_chunk(entries, encoded):
+    """
+    Partie « map » : concepts, relations et compteurs de normalisation d'un lot d'entrées,
+    ou de lignes du journal à décoder si encoded.
+    """
+    if encoded:
+        entries = (decode_record(line) for _, line in entries)
+    concepts = Counter()
+    relations = set()
+    unknown_relations = []
+    collect_entries(entries, concepts, relations, unknown_relations)
+    # Relations renvoyées par nom : dépickler un membre d'Enum par triplet coûte 5 à 6 fois plus
+    relations = {(src, rel.name, dst) for src, rel, dst in relations}
+    return concepts, relations, unknown_relations, NORMALIZER.take_counts()
+
+def collect_parallel(entries, all_concepts, all_relations, workers, chunk_size=200, encoded=False):
+    """
+    Comme collect_entries(), réparti sur workers processus : les entrées sont
+    découpées en lots consécutifs de chunk_size, chaque processus renvoie un Counter et un
+    set partiels, fusionnés ici dans l'ordre des lots. Le Counter final a donc le même ordre
+    d'insertion qu'en série (les égalités de fréquence se départagent pareil) et les
+    relations inconnues sont affichées dans le même ordre.
+    Les triplets de all_relations portent le nom de la relation, pas le membre de TypeRelation :
+    le hachage d'un membre d'Enum passe par du Python et coûterait plus que la fusion elle-même.
+    encoded : entries sont des lignes du journal (iter_result_lines), décodées par les
+    processus de travail plutôt qu'ici.
+    Au plus 2 lots par processus sont en attente : la lecture reste en flux.
+    """
+    # Importé ici : multiprocessing coûte ~10 ms à l'import et ne sert qu'en mode parallèle
+    import multiprocessing
+
+    def merge(result):
+        concepts, relations, unknown_relations, counts = result
+        all_concepts.update(concepts)
+        all_relations.update(relations)
+        for relation_type in unknown_relations:
+            print(f"Relation inconnue: {relation_type}")
+        NORMALIZER.add_counts(counts)
+
+    pending = deque()
+    with multiprocessing.Pool(workers, initializer=_reset_worker) as pool:
+        for chunk in _chunked(entries, chunk_size):
+            pending.append(pool.apply_async(_collect_chunk, (chunk, encoded)))
+            if len(pending) >= 2 * workers:
+                merge(pending.popleft().get())
+        while pending:
+            merge(pending.popleft().get())
+
+def extract_ontology_from_json(json_file_path, min_concept_frequency=2, workers=1, chunk_size=200):
+    """
+    Extrait l'ontologie depuis le fichier JSON (ou le journal .jsonl de GenerateurOntologique).
+    Les entrées sont lues une à une (iter_results) : la mémoire est celle des compteurs et
+    des relations collectées, pas celle du fichier.
+    workers > 1 : concepts et relations sont collectés par un pool de processus (voir
+    collect_parallel), avec un résultat identique à celui du mode série.
+    """
+    
+    # Dictionnaires pour stocker les données
+    all_concepts = Counter()
+    all_relations = set()
     
+    # Parcourir toutes les entrées
+    if workers > 1 and is_checkpoint(json_file_path):
+        collect_parallel(iter_result_lines(json_file_path), all_concepts, all_relations, workers, chunk_size,
+                         encoded=True)
+    elif workers > 1:
+        collect_parallel(iter_results(json_file_path), all_concepts, all_relations, workers, chunk_size)
+    else:
+        collect_entries(iter_results(json_file_path), all_concepts, all_relations)
+    
+    core_concepts, core_relations = filter_ontology(all_concepts, all_relations, min_concept_frequency)
+    if workers > 1:
+        core_relations = relations_from_names(core_relations)
+    
+    return core_concepts, core_relations, all_concepts
+
+def filter_ontology(all_concepts, all_relations, min_concept_frequency):
+    """Concepts assez fréquents, et relations entre concepts fréquents ET valides."""
     # Filtrer les concepts par fréquence
     core_concepts = {concept for concept, count in all_concepts.items() 
                     if count >= min_concept_frequency}
     
     # Filtrer les relations pour ne garder que celles avec des concepts fréquents ET valides
+    # (validité vérifiée une fois par concept, pas à chaque extrémité de relation)
+    valid_concepts = {concept for concept in core_concepts if is_valid_concept(concept)}
     core_relations = [
         (src, rel, dst) for src, rel, dst in all_relations
-        if src in core_concepts and dst in core_concepts and is_valid_concept(src) and is_valid_concept(dst)
+        if src in valid_concepts and dst in valid_concepts
     ]
+    return core_concepts, core_relations
+
+def relations_from_names(triples):
+    """Triplets (source, nom de relation, destination) -> (source, TypeRelation, destination)."""
+    members = TypeRelation.__members__
+    return [(src, members[rel], dst) for src, rel, dst in triples]
+
+def entry_contribution(entry_id, entry_data):
+    """Concepts (Counter, dans l'ordre de rencontre) et triplets (par nom de relation) d'une seule entrée."""
+    concepts = Counter()
+    relations = set()
+    collect_entries([(entry_id, entry_data)], concepts, relations)
+    return concepts, {(src, rel.name, dst) for src, rel, dst in relations}
+
+def _hashed_entries(json_file_path):
+    # (id, empreinte, entrée) ; pour un journal, l'empreinte porte sur la ligne brute et
+    # l'entrée n'est décodée que si elle doit être retraitée
+    if is_checkpoint(json_file_path):
+        for entry_id, line in iter_result_lines(json_file_path):
+            yield entry_id, content_hash(line.rstrip(b"\n")), line
+    else:
+        for entry_id, entry_data in iter_results(json_file_path):
+            payload = json.dumps(entry_data, ensure_ascii=False, sort_keys=True)
+            yield str(entry_id), content_hash(payload.encode("utf-8")), entry_data
+
+def extract_ontology_incremental(json_file_path, index_path, min_concept_frequency=2):
+    """
+    Comme extract_ontology_from_json, mais en ne retraitant que les entrées ajoutées ou
+    modifiées depuis la dernière extraction, d'après l'index index_path (extractionIndex) ;
+    les entrées disparues sont retirées des totaux. Le résultat est celui d'une extraction
+    complète (mêmes concepts, relations et fréquences, dans le même ordre).
+    Le fichier est tout de même relu pour calculer les empreintes : avec un journal .jsonl,
+    seules les lignes nouvelles ou modifiées sont décodées.
+    Renvoie aussi le bilan des changements (voir ExtractionIndex.commit).
+    """
+    journal = is_checkpoint(json_file_path)
+    with ExtractionIndex(index_path, EXTRACTION_RULES_VERSION) as index:
+        for position, (entry_id, digest, entry_data) in enumerate(_hashed_entries(json_file_path)):
+            if index.unchanged(entry_id, position, digest):
+                continue
+            if journal:
+                entry_data = decode_record(entry_data)[1]
+            index.put(entry_id, position, digest, *entry_contribution(entry_id, entry_data))
+        changes = index.commit()
+        all_concepts = index.concept_counts()
+        all_relations = index.relations().fetchall()
     
-    return core_concepts, core_relations, all_concepts
+    core_concepts, core_relations = filter_ontology(all_concepts, all_relations, min_concept_frequency)
+    return core_concepts, relations_from_names(core_relations), all_concepts, changes
 
-def generate_python_code(core_concepts, core_relations, concept_frequencies, output_file):
-    """Génère le code Python avec les constantes."""
+def generate_python_code(core_concepts, core_relations, concept_frequencies, output_file, snapshot_file=None,
+                         store_file=None):
+    """
+    Génère le code Python avec les constantes.
+    Si snapshot_file est fourni, écrit aussi un instantané binaire (ontologySnapshot) avec les
+    sections CORE_PHILOSOPHICAL_CONCEPTS (et leurs fréquences) et CORE_RELATIONS.
+    Si store_file est fourni, écrit aussi les mêmes concepts et relations dans une base SQLite
+    indexée (ontologyStore), interrogeable sans tout charger.
+    """
     
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write("from enum import Enum\n\n")
@@ -218,46 +335,51 @@ def generate_python_code(core_concepts, core_relations, concept_frequencies, out
         for concept, freq in sorted(concept_frequencies.items(), key=lambda x: x[1], reverse=True)[:15]:
             if concept in core_concepts:
                 f.write(f"# - {concept}: {freq}\n")
-
-STOP_WORDS = {
-    "ET", "OU", "DONC", "MAIS", "CAR", "PUIS", "ALORS", "SI", "IL", "AU", "AUX", "DU", "DE", "DES", "EN", "UN", "UNE", "LE", "LA", "LES", "CE", "CET", "CETTE", "SON", "SA", "SES", "SUR", "PAR", "POUR", "AVEC", "SANS", "DANS", "SOUS", "VERS", "CHEZ", "FAUT"
-}
+    
+    if snapshot_file:
+        write_snapshot(
+            snapshot_file,
+            triple_sections={"CORE_RELATIONS": sorted_relations},
+            concept_sections={"CORE_PHILOSOPHICAL_CONCEPTS": {c: concept_frequencies.get(c, 0) for c in sorted_concepts}},
+        )
+    if store_file:
+        write_store(store_file, {c: concept_frequencies.get(c, 0) for c in sorted_concepts}, sorted_relations)
 
 def is_valid_concept(concept):
-    # Exclure si dans la liste des stop words
-    if concept in STOP_WORDS:
-        return False
-    # Exclure si commence/termine par un guillemet ou parenthèse
-    if concept.startswith('"') or concept.endswith('"'):
-        return False
-    if concept.startswith('(') or concept.endswith('(') or concept.endswith(')'):
-        return False
-    # Exclure si contient des caractères non alphanumériques (hors espace et tiret)
-    allowed = set(string.ascii_uppercase + " -")
-    if not all(c in allowed or c.isalpha() for c in concept):
-        return False
-    # Exclure si moins de 2 lettres
-    if sum(1 for c in concept if c.isalpha()) < 2:
-        return False
-    return True
+    """Vrai si le concept peut figurer dans l'ontologie (voir conceptNormalizer.validity_rule)."""
+    return NORMALIZER.is_valid(concept)
 
 def main():
     # Remplacez par le chemin vers votre fichier JSON
     json_file_path = "votre_base_donnees.json"  # Changez ce chemin
     output_file = "ontologie_generee.py"
+    snapshot_file = "ontologie_generee.opfsnap"
+    store_file = "ontologie_generee.sqlite"
+    workers = 1  # > 1 : extraction répartie sur autant de processus (même résultat)
+    index_file = None  # ex. "ontologie_index.sqlite" : ne retraite que les entrées ajoutées ou modifiées
     
     print("Extraction de l'ontologie depuis le JSON...")
-    core_concepts, core_relations, concept_frequencies = extract_ontology_from_json(
-        json_file_path, min_concept_frequency=2
-    )
+    if index_file:
+        core_concepts, core_relations, concept_frequencies, changes = extract_ontology_incremental(
+            json_file_path, index_file, min_concept_frequency=2
+        )
+        print(f"Entrées retraitées (index {index_file}): {changes}")
+    else:
+        core_concepts, core_relations, concept_frequencies = extract_ontology_from_json(
+            json_file_path, min_concept_frequency=2, workers=workers
+        )
     
     print(f"Concepts extraits: {len(core_concepts)}")
     print(f"Relations extraites: {len(core_relations)}")
+    stats = NORMALIZER.stats()
+    print(f"Concepts rejetés au nettoyage: {dict(NORMALIZER.clean_rejections.most_common())}")
+    print(f"Concepts exclus de l'ontologie: {dict(NORMALIZER.validity_rejections.most_common())}")
+    print(f"Cache de normalisation: {stats['hit_rate']:.1%} de succès ({stats['cached']} chaînes)")
     
     print("Génération du code Python...")
-    generate_python_code(core_concepts, core_relations, concept_frequencies, output_file)
+    generate_python_code(core_concepts, core_relations, concept_frequencies, output_file, snapshot_file, store_file)
     
-    print(f"Ontologie générée dans {output_file}")
+    print(f"Ontologie générée dans {output_file} (instantané binaire : {snapshot_file}, base SQLite : {store_file})")
     
     # Afficher quelques statistiques
     print("\nTop 15 des concepts les plus fréquents:")
@@ -1,11 +1,24 @@
 import os
 import json
-import requests
 from tqdm import tqdm
 import time
-import openai
 import sys
+import asyncio
 import concurrent.futures
+import functools
+
+from httpClients import make_session, DictionaryClient, OllamaClient
+from llmCache import ResponseCache
+from rateLimiter import AdaptiveLimiter, is_congestion
+from wordPool import WordPool
+from usageMetrics import UsageMetrics
+from checkpointStore import CheckpointStore, open_store, read_results, write_json, compact, is_checkpoint
+from shardedRun import ShardDirectory, run_worker, merge, default_worker_id
+
+try:
+    import openai
+except ImportError:
+    openai = None  # backend OpenAI indisponible, Ollama reste utilisable
 
 try:
     from colorama import Fore, Style, init as colorama_init
@@ -24,10 +37,38 @@ def cprint(text, color=None, bold=False, end="\n"):
 
 # ---------- CONFIGURATION ----------
 OPENAI_API_KEY = ""  # Mets ta clé directe ici
-openai.api_key = OPENAI_API_KEY
+if openai is not None:
+    openai.api_key = OPENAI_API_KEY
+    # Les surcharges sont retentées par cached_completion (via le limiteur), pas par le SDK
+    openai.max_retries = 0
 
 API_URL = "https://philo-lycee.fr/api/dictionnaire.php?id="
-OUTFILE = "concepts_ontologie.json"
+OLLAMA_URL = "http://localhost:11434/api/chat"
+# Journal JSONL append-only (checkpointStore) ; un nom en .json garde l'ancien format réécrit à chaque mot.
+# Un concepts_ontologie.json d'une génération antérieure est importé dans le journal (open_results)
+OUTFILE = "concepts_ontologie.jsonl"
+DICT_CACHE_FILE = "dictionnaire_cache.jsonl"
+
+# Sessions HTTP partagées (keep-alive, timeouts) : celle du dictionnaire retente aussi les
+# statuts 429/5xx ; celle d'Ollama ne retente que les erreurs de connexion, les surcharges
+# étant gérées par RATE_LIMITER et cached_completion
+HTTP_SESSION = make_session()
+LLM_SESSION = make_session(retry_statuses=())
+DICTIONARY = DictionaryClient(API_URL, HTTP_SESSION)
+OLLAMA_CLIENT = OllamaClient(OLLAMA_URL, LLM_SESSION)
+
+# Cache persistant des réponses LLM (llmCache.ResponseCache) ; None : désactivé
+LLM_CACHE_FILE = "llm_cache.sqlite"
+LLM_CACHE = None
+
+# Limiteur partagé des appels au backend (débit et concurrence adaptative), à la place des pauses fixes
+RATE_LIMITER = AdaptiveLimiter(max_concurrency=32)
+# Débit par défaut vers OpenAI en ligne de commande (les anciennes pauses fixes en donnaient environ 45/min)
+OPENAI_DEFAULT_RPM = 45
+# Un appel refusé pour surcharge (429, 5xx, délai dépassé) est retenté jusqu'à CONGESTION_RETRIES
+# fois, après CONGESTION_BACKOFF, 2 * CONGESTION_BACKOFF, ... secondes
+CONGESTION_RETRIES = 4
+CONGESTION_BACKOFF = 2.0
 
 types_relations = [
     "IMPLIQUE", "CONTREDIT", "EST_EQUIVALENT", "EST_UN", "FAIT_PARTIE_DE",
@@ -74,10 +115,12 @@ COST_PER_1M_INPUT = 1.10  # $/1M tokens input
 COST_PER_1M_OUTPUT = 4.40  # $/1M tokens output
 AVG_INPUT_TOKENS = 300  # estimation grossière par requête
 AVG_OUTPUT_TOKENS = 50  # estimation grossière par requête
+AVG_BATCH_TOKENS_PER_RELATION = 60  # tokens d'entrée ajoutés par relation supplémentaire d'un lot
 
-def estimate_cost_per_request():
-    input_cost = (AVG_INPUT_TOKENS / 1_000_000) * COST_PER_1M_INPUT
-    output_cost = (AVG_OUTPUT_TOKENS / 1_000_000) * COST_PER_1M_OUTPUT
+def estimate_cost_per_request(batch_size=1):
+    input_tokens = AVG_INPUT_TOKENS + (batch_size - 1) * AVG_BATCH_TOKENS_PER_RELATION
+    input_cost = (input_tokens / 1_000_000) * COST_PER_1M_INPUT
+    output_cost = (AVG_OUTPUT_TOKENS * batch_size / 1_000_000) * COST_PER_1M_OUTPUT
     return input_cost + output_cost
 
 def format_time(seconds):
@@ -95,15 +138,20 @@ def format_cost(cost):
     return f"{cost:.4f} $"
 
 # ---------- FONCTIONS UTILES ----------
+def require_openai():
+    """Vérifie que le backend OpenAI est utilisable (paquet openai installé)."""
+    if openai is None:
+        raise RuntimeError("Backend OpenAI indisponible : le paquet openai n'est pas installé "
+                           "(pip install openai, ou utiliser --ollama)")
+
 def get_mot_def(id):
     """Récupère le mot et la définition pour un id donné."""
     cprint(f"⏳ Récupération du mot et de la définition pour l'id {id}...", "cyan")
     try:
-        r = requests.get(API_URL + str(id))
-        data = r.json()
-        if data.get('success'):
-            cprint(f"✅ Mot trouvé : {data['mot']}", "green")
-            return data['mot'], data['defmot']
+        mot, definition = DICTIONARY.mot_def(id)
+        if mot:
+            cprint(f"✅ Mot trouvé : {mot}", "green")
+            return mot, definition
         else:
             cprint(f"❌ Aucun mot trouvé pour l'id {id}.", "red")
             return None, None
@@ -111,6 +159,67 @@ def get_mot_def(id):
         cprint(f"⚠️ Erreur lors de la récupération de l'id {id} : {e}", "red")
         return None, None
 
+# Usage réel (tokens, latence, coût) de chaque requête au backend
+METRICS = UsageMetrics({"openai": (COST_PER_1M_INPUT, COST_PER_1M_OUTPUT)})
+METRICS_FILE = "generation_metrics.json"
+
+def openai_usage(response):
+    """Usage annoncé par l'API OpenAI."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {}
+    return {"input_tokens": usage.prompt_tokens, "output_tokens": usage.completion_tokens}
+
+def estimate_tokens(request):
+    """Estimation des tokens d'une requête (environ 4 caractères par token, plus la réponse attendue)."""
+    return sum(len(message["content"]) for message in request["messages"]) // 4 + AVG_OUTPUT_TOKENS
+
+def cached_completion(request, call, mot=None, relation=None):
+    """
+    Texte de la réponse du backend pour request, depuis LLM_CACHE si possible (les réponses
+    vides n'y sont pas mises). call() renvoie (texte, usage) ; les appels réels passent par
+    RATE_LIMITER et sont comptés dans METRICS (pour le mot et la relation donnés). Un appel
+    refusé pour surcharge est retenté après une attente croissante (CONGESTION_RETRIES) ;
+    les autres erreurs, et la dernière surcharge, sont propagées.
+    """
+    key = None
+    if LLM_CACHE is not None:
+        key = LLM_CACHE.key(request)
+        text = LLM_CACHE.get(key)
+        if text is not None:
+            METRICS.record(request["backend"], mot, relation, 0.0, cached=True)
+            return text
+    def timed_call():
+        # La latence mesurée exclut l'attente d'une place dans le limiteur
+        start = time.perf_counter()
+        try:
+            text, usage = call()
+        except Exception:
+            METRICS.record(request["backend"], mot, relation, time.perf_counter() - start, error=True)
+            raise
+        METRICS.record(request["backend"], mot, relation, time.perf_counter() - start, usage)
+        return text
+
+    for attempt in range(CONGESTION_RETRIES + 1):
+        try:
+            if RATE_LIMITER is None:
+                text = timed_call()
+            else:
+                with RATE_LIMITER.slot(estimate_tokens(request)):
+                    text = timed_call()
+            break
+        except Exception as e:
+            if attempt == CONGESTION_RETRIES or not is_congestion(e):
+                raise
+            # Attente hors du limiteur : les autres threads ne sont pas bloqués pendant ce temps
+            delay = CONGESTION_BACKOFF * 2 ** attempt
+            cprint(f"⏳ Backend surchargé ({e}), nouvelle tentative dans {delay:.0f}s...", "yellow")
+            time.sleep(delay)
+    # Une réponse vide est un raté du modèle : la mettre en cache la rejouerait à chaque passage
+    if key is not None and text and text.strip():
+        LLM_CACHE.put(key, text)
+    return text
+
 def openai_concepts(mot, definition, relation, explication):
     """Demande à OpenAI des concepts reliés via une relation donnée, explication incluse."""
     cprint(f"🧠 Appel OpenAI pour '{mot}' - relation '{relation}'...", "magenta")
@@ -126,22 +235,30 @@ def openai_concepts(mot, definition, relation, explication):
         f"Explication de la relation : {explication}\n"
         "Quels concepts sont liés à ce mot par cette relation ?"
     )
-    try:
+    messages = [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt}
+    ]
+
+    def call():
         response = openai.chat.completions.create(
             model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": prompt}
-            ],
+            messages=messages,
             temperature=0.3,
         )
-        text = response.choices[0].message.content.strip()
-        concepts = [c.strip() for c in text.replace('.', '').split(',') if c.strip()]
-        cprint(f"   → Concepts trouvés : {', '.join(concepts)}", "yellow")
-        return concepts
+        return response.choices[0].message.content.strip(), openai_usage(response)
+
+    try:
+        text = cached_completion(
+            {"backend": "openai", "model": "gpt-4o-mini", "messages": messages, "temperature": 0.3}, call,
+            mot, relation)
     except Exception as e:
+        # Propagée : le mot n'est pas sauvegardé et sera redemandé à la reprise
         cprint(f"⚠️ Erreur OpenAI : {e}", "red")
-        return []
+        raise
+    concepts = [c.strip() for c in text.replace('.', '').split(',') if c.strip()]
+    cprint(f"   → Concepts trouvés : {', '.join(concepts)}", "yellow")
+    return concepts
 
 def ollama_concepts(mot, definition, relation, explication, model="llama3.1:latest"):
     """Demande à Ollama des concepts reliés via une relation donnée, explication incluse."""
@@ -158,59 +275,213 @@ def ollama_concepts(mot, definition, relation, explication, model="llama3.1:late
         f"Explication de la relation : {explication}\n"
         "Quels concepts sont liés à ce mot par cette relation ?"
     )
+    messages = [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt}
+    ]
     try:
-        response = requests.post(
-            "http://localhost:11434/api/chat",
-            json={
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": prompt}
-                ],
-                "stream": False
-            },
-            timeout=120
-        )
-        response.raise_for_status()
-        data = response.json()
-        # Ollama renvoie 'message' ou 'messages'
-        if "message" in data:
-            text = data["message"]["content"].strip()
-        elif "messages" in data and data["messages"]:
-            text = data["messages"][-1]["content"].strip()
-        else:
-            text = ""
-        concepts = [c.strip() for c in text.replace('.', '').split(',') if c.strip()]
-        cprint(f"   → Concepts trouvés (Ollama) : {', '.join(concepts)}", "yellow")
-        return concepts
+        text = cached_completion(
+            {"backend": "ollama", "model": model, "messages": messages},
+            lambda: OLLAMA_CLIENT.complete(model, messages), mot, relation)
     except Exception as e:
+        # Propagée : le pool ne sauvegarde pas le mot, qui sera redemandé à la reprise
         cprint(f"⚠️ Erreur Ollama : {e}", "red")
-        return []
+        raise
+    concepts = [c.strip() for c in text.replace('.', '').split(',') if c.strip()]
+    cprint(f"   → Concepts trouvés (Ollama) : {', '.join(concepts)}", "yellow")
+    return concepts
+
+# ---------- REQUÊTES GROUPÉES ----------
+BATCH_SYSTEM = (
+    "Tu es un expert en philosophie. Pour chaque relation conceptuelle demandée, "
+    "donne entre 5 et 10 concepts français UNIQUEMENT EN MAJUSCULES qui sont liés au mot "
+    "selon la relation, sans explication. Un concept = 1 mot. Réponds uniquement par un objet "
+    "JSON dont les clés sont les noms des relations et les valeurs des listes de concepts."
+)
+
+def relation_batches(batch_size):
+    """Découpe types_relations en lots de batch_size relations (batch_size <= 0 : un seul lot)."""
+    if batch_size <= 0:
+        batch_size = len(types_relations)
+    return [types_relations[i:i + batch_size] for i in range(0, len(types_relations), batch_size)]
+
+def llm_json(messages, use_ollama, ollama_model, mot=None, relation=None):
+    """Appel au backend en mode réponse JSON (mis en cache et compté comme les autres appels)."""
+    if use_ollama:
+        return cached_completion(
+            {"backend": "ollama", "model": ollama_model, "messages": messages, "format": "json"},
+            lambda: OLLAMA_CLIENT.complete(ollama_model, messages, format="json"), mot, relation)
+
+    def call():
+        response = openai.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0.3,
+            response_format={"type": "json_object"},
+        )
+        return response.choices[0].message.content.strip(), openai_usage(response)
+
+    return cached_completion(
+        {"backend": "openai", "model": "gpt-4o-mini", "messages": messages, "temperature": 0.3,
+         "response_format": "json_object"}, call, mot, relation)
+
+def parse_batch_response(text, relations):
+    """
+    Valide la réponse JSON d'un lot. Renvoie {relation: concepts} pour les relations dont la
+    valeur est une liste de chaînes (ou une chaîne séparée par des virgules) ; les autres
+    sont absentes du résultat.
+    """
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    # Les modèles changent parfois la casse ou les accents des clés
+    by_key = {normalize_relation(str(key)): value for key, value in data.items()}
+    parsed = {}
+    for relation in relations:
+        value = by_key.get(normalize_relation(relation))
+        if isinstance(value, str):
+            value = value.split(",")
+        if not isinstance(value, list) or not all(isinstance(c, str) for c in value):
+            continue
+        concepts = [c.replace('.', '').strip() for c in value if c.strip()]
+        if concepts:
+            parsed[relation] = concepts
+    return parsed
+
+def batched_concepts(mot, definition, relations, use_ollama, ollama_model):
+    """
+    Demande les concepts de plusieurs relations en une seule requête (réponse JSON).
+    Renvoie la liste des couples (relation, entrée) dans l'ordre de relations ; les relations
+    absentes ou invalides dans la réponse sont redemandées une par une.
+    """
+    cprint(f"🧠 Appel groupé pour '{mot}' - {len(relations)} relations...", "magenta")
+    explications = {relation: relation_explications.get(normalize_relation(relation), "") for relation in relations}
+    prompt = (
+        f"Mot : {mot}\n"
+        f"Définition : {definition}\n"
+        "Relations :\n"
+        + "".join(f"- {relation} : {explications[relation]}\n" for relation in relations)
+        + "Quels concepts sont liés à ce mot par chacune de ces relations ? Réponds avec un objet JSON "
+        + "de la forme {" + ", ".join(f'"{relation}": ["CONCEPT", ...]' for relation in relations[:2]) + ", ...}."
+    )
+    messages = [
+        {"role": "system", "content": BATCH_SYSTEM},
+        {"role": "user", "content": prompt}
+    ]
+    try:
+        # Dans les métriques, un lot est compté sous le nom de ses relations jointes par '+'
+        text = llm_json(messages, use_ollama, ollama_model, mot, "+".join(relations))
+        parsed = parse_batch_response(text, relations)
+    except Exception as e:
+        cprint(f"⚠️ Erreur de l'appel groupé : {e}", "red")
+        parsed = {}
+    missing = [relation for relation in relations if relation not in parsed]
+    if missing:
+        cprint(f"   ↩️ {len(missing)} relation(s) redemandée(s) une par une : {', '.join(missing)}", "yellow")
+    results = []
+    for relation in relations:
+        if relation in parsed:
+            results.append((relation, {"explication": explications[relation], "concepts": parsed[relation]}))
+        else:
+            results.append(relation_concepts(mot, definition, relation, use_ollama, ollama_model))
+    return results
+
+def relation_batch(mot, definition, relations, use_ollama, ollama_model):
+    """Couples (relation, entrée) d'un lot : un appel par relation si le lot n'en a qu'une."""
+    if len(relations) == 1:
+        return [relation_concepts(mot, definition, relations[0], use_ollama, ollama_model)]
+    return batched_concepts(mot, definition, relations, use_ollama, ollama_model)
 
 def load_json(filename):
+    """Charge les résultats depuis un journal .jsonl ou un JSON."""
     if os.path.exists(filename):
         cprint(f"📂 Chargement du fichier existant : {filename}", "cyan")
-        with open(filename, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return read_results(filename)
     cprint(f"🆕 Aucun fichier existant, création d'un nouveau dictionnaire.", "cyan")
     return {}
 
 def save_json(data, filename):
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    write_json(data, filename)
     cprint(f"💾 Sauvegarde dans {filename}", "green")
 
+def open_results(filename):
+    """
+    Ouvre le fichier de résultats pour ajout (journal .jsonl, ou JSON historique). Si le journal
+    n'existe pas encore mais qu'un JSON historique du même nom existe (concepts_ontologie.json,
+    fichier par défaut des versions précédentes), ses entrées sont d'abord importées dans le
+    journal : la reprise ne redemande pas les mots déjà générés.
+    """
+    legacy = os.path.splitext(filename)[0] + ".json"
+    if is_checkpoint(filename) and not os.path.exists(filename) and os.path.exists(legacy):
+        entries = read_results(legacy)
+        # Journal écrit à part puis renommé : un import interrompu est refait au lancement suivant
+        tmp_path = f"{filename}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        with CheckpointStore(tmp_path) as store:
+            store.append_many(entries.items())
+        os.replace(tmp_path, filename)
+        cprint(f"📦 {len(entries)} entrées de {legacy} importées dans le journal {filename}", "cyan")
+    if os.path.exists(filename):
+        cprint(f"📂 Reprise depuis le fichier existant : {filename}", "cyan")
+    else:
+        cprint(f"🆕 Aucun fichier existant, création de {filename}.", "cyan")
+    return open_store(filename)
+
+def prefetch_dictionary(start_id, end_id, workers=8):
+    """Charge les entrées du dictionnaire de start_id à end_id dans le cache local avant la génération."""
+    cprint(f"📥 Préchargement du dictionnaire (ids {start_id} à {end_id}, {workers} connexions)...", "cyan")
+    start_time = time.time()
+    fetched, failed = DICTIONARY.prefetch(range(start_id, end_id + 1), workers=workers)
+    cprint(f"📥 {fetched} entrées récupérées en {format_time(time.time() - start_time)}"
+           + (f", {len(failed)} en échec (retentées pendant la génération)" if failed else ""), "green")
+
+def print_cache_stats():
+    if LLM_CACHE is not None:
+        stats = LLM_CACHE.stats()
+        cprint(f"🗃️ Cache LLM : {stats['hits']} réponses en cache, {stats['misses']} appels au backend "
+               f"({stats['hit_rate']:.0%} de succès, {stats['entries']} entrées, "
+               f"{stats['bytes'] / 2**20:.1f} Mo, {stats['evictions']} évictions)", "cyan")
+
+def limiter_status():
+    """Métriques en direct et statistiques du limiteur pour les lignes de progression."""
+    status = f" | {METRICS.summary()}"
+    if RATE_LIMITER is not None:
+        status += f" | Limiteur : {RATE_LIMITER.summary()}"
+    return status
+
+def write_metrics_report():
+    """Rapport JSON final : totaux, débits, percentiles de latence, dépense, par relation et par mot."""
+    if METRICS_FILE:
+        METRICS.write_json(METRICS_FILE)
+        snap = METRICS.snapshot()
+        cprint(f"📊 {snap['requests']} requêtes, {snap['input_tokens']} tokens d'entrée, "
+               f"{snap['output_tokens']} tokens de sortie, {format_cost(snap['cost'])} — rapport dans {METRICS_FILE}",
+               "cyan")
+
 def print_separator():
     cprint("-" * 60, "blue")
 
+def normalize_relation(relation):
+    """Clé de relation_explications pour un type de relation (minuscules, sans accents)."""
+    return relation.lower().replace("é", "e").replace("à", "a").replace("è", "e").replace("ê", "e").replace("ù", "u").replace("û", "u").replace("ç", "c").replace("'", "_").replace(" ", "_")
+
 # ---------- GLOBAL OLLAMA FLAG ----------
 OLLAMA = True  # Peut être modifié manuellement ici (True/False)
 
 # ---------- SCRIPT PRINCIPAL ----------
 def process_relation(args):
-    """Fonction pour le parallélisme Ollama : traite une relation pour un mot donné."""
+    """
+    Tâche du WordPool pour Ollama sans regroupement (--batch-size 1) : une requête pour une
+    relation d'un mot, renvoie (relation, {"explication", "concepts"}).
+    """
     mot, definition, relation, explication, ollama_model = args
-    relation_key = relation.lower().replace("é", "e").replace("à", "a").replace("è", "e").replace("ê", "e").replace("ù", "u").replace("û", "u").replace("ç", "c").replace("'", "_").replace(" ", "_")
     cprint(f"🔗 [{mot}] Relation : {relation}", "blue")
     if explication:
         cprint(f"   Explication : {explication}", "cyan")
@@ -227,25 +498,35 @@ def process_relation(args):
         "concepts": concepts
     })
 
-def main(start_id=471, end_id=6120, use_ollama=False, ollama_model="llama3.1:latest"):
+def main(start_id=471, end_id=6120, use_ollama=False, ollama_model="llama3.1:latest", batch_size=1,
+         max_words=4, ordered=False, store=None, stop=None):
+    """
+    Génère les entrées des ids start_id à end_id. store : journal où enregistrer les mots
+    (par défaut celui d'OUTFILE) ; il est fermé à la fin. stop : threading.Event qui, une fois
+    positionné, arrête la génération avant le mot suivant (bail de tranche perdu).
+    """
     global OLLAMA
     # Priorité à la valeur manuelle si modifiée, sinon celle du CLI
     if OLLAMA is not None:
         use_ollama = OLLAMA
     OLLAMA = use_ollama
+    if not use_ollama:
+        require_openai()
     cprint("=== Générateur Ontologique Philosophie ===", "blue", bold=True)
     cprint(f"Traitement des IDs de {start_id} à {end_id}", "blue")
     print_separator()
-    data = load_json(OUTFILE)
+    if store is None:
+        store = open_results(OUTFILE)
     total = end_id - start_id + 1
-    already = sum(1 for idx in range(start_id, end_id + 1) if str(idx) in data)
+    already = sum(1 for idx in range(start_id, end_id + 1) if idx in store)
     cprint(f"{already}/{total} déjà traités. Début du traitement...", "cyan")
     print_separator()
 
-    ids_to_process = [idx for idx in range(start_id, end_id + 1) if str(idx) not in data]
-    nb_relations = len(types_relations)
-    total_requests = len(ids_to_process) * nb_relations
-    cost_per_req = estimate_cost_per_request()
+    ids_to_process = [idx for idx in range(start_id, end_id + 1) if idx not in store]
+    # batch_size relations par requête (1 : une requête par relation, 0 : toutes en une requête)
+    batches = relation_batches(batch_size)
+    total_requests = len(ids_to_process) * len(batches)
+    cost_per_req = estimate_cost_per_request(len(batches[0]))
     total_cost_est = total_requests * cost_per_req
 
     if not use_ollama:
@@ -258,11 +539,49 @@ def main(start_id=471, end_id=6120, use_ollama=False, ollama_model="llama3.1:lat
     processed_requests = 0
     total_mots = len(ids_to_process)
     mots_faits = 0
+    # ((id, mot, définition), erreur) des mots non sauvegardés (mode séquentiel)
+    failed = []
+
+    def on_word(key, results):
+        """Assemble et sauvegarde un mot dont toutes les requêtes sont terminées (appelé par le pool)."""
+        nonlocal mots_faits, processed_requests
+        idx, mot, definition = key
+        entry = {
+            "mot": mot,
+            "definition": definition,
+            "relations": {relation: rel_data for batch_results in results for relation, rel_data in batch_results}
+        }
+        store.append(idx, entry)
+        processed_requests += len(results)
+        mots_faits += 1
+        elapsed = time.time() - start_time
+        avg_time_per_mot = elapsed / mots_faits if mots_faits else 0.0
+        remaining_mots = total_mots - mots_faits
+        est_time_left = avg_time_per_mot * remaining_mots
+        tqdm.write(
+            f"💾 [{mot}] sauvegardé | "
+            f"🟦 Progression : {mots_faits}/{total_mots} mots | "
+            f"Temps écoulé : {format_time(elapsed)} | "
+            f"Temps restant estimé : {format_time(est_time_left)}"
+            + limiter_status()
+        )
+
+    # Ollama et requêtes groupées : un pool de threads pour tous les mots, au plus max_words
+    # mots en cours ; chaque mot est sauvegardé dès que ses requêtes sont terminées
+    pool = None
+    if use_ollama or len(batches) < len(types_relations):
+        workers = RATE_LIMITER.max_concurrency if RATE_LIMITER else 32
+        pool = WordPool(workers=workers, max_words=max_words, ordered=ordered, on_word=on_word)
 
     for idx_pos, idx in enumerate(tqdm(ids_to_process, desc="Concepts", ncols=100)):
+        if stop is not None and stop.is_set():
+            cprint("🛑 Arrêt demandé (bail de tranche perdu), mots restants laissés à l'autre worker.", "red")
+            break
         mot, definition = get_mot_def(idx)
         if not mot:
             cprint(f"⏩ Passage de l'id {idx} (mot non trouvé).", "red")
+            if DICTIONARY.is_unknown(idx):
+                store.mark_absent(idx)
             continue
 
         entry = {
@@ -271,33 +590,21 @@ def main(start_id=471, end_id=6120, use_ollama=False, ollama_model="llama3.1:lat
             "relations": {}
         }
 
-        if use_ollama:
-            args_list = []
-            for relation in types_relations:
-                relation_key = relation.lower().replace("é", "e").replace("à", "a").replace("è", "e").replace("ê", "e").replace("ù", "u").replace("û", "u").replace("ç", "c").replace("'", "_").replace(" ", "_")
-                explication = relation_explications.get(relation_key, "")
-                args_list.append((mot, definition, relation, explication, ollama_model))
-            max_workers = min(32, len(types_relations))
-            rel_start_time = time.time()
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                results = list(executor.map(process_relation, args_list))
-            rel_end_time = time.time()
-            for relation, rel_data in results:
-                entry["relations"][relation] = rel_data
-                processed_requests += 1
-            mots_faits += 1
-            elapsed = time.time() - start_time
-            avg_time_per_mot = elapsed / mots_faits if mots_faits else 0.0
-            remaining_mots = total_mots - mots_faits
-            est_time_left = avg_time_per_mot * remaining_mots
-            tqdm.write(
-                f"🟦 Progression : {mots_faits}/{total_mots} mots | "
-                f"Temps écoulé : {format_time(elapsed)} | "
-                f"Temps restant estimé : {format_time(est_time_left)}"
-            )
+        if pool is not None:
+            if len(batches) < len(types_relations):
+                tasks = [functools.partial(relation_batch, mot, definition, relations, use_ollama, ollama_model)
+                         for relations in batches]
+            else:
+                tasks = []
+                for relation in types_relations:
+                    explication = relation_explications.get(normalize_relation(relation), "")
+                    args = (mot, definition, relation, explication, ollama_model)
+                    tasks.append(lambda args=args: [process_relation(args)])
+            pool.submit((idx, mot, definition), tasks)
+            continue
         else:
             for rel_pos, relation in enumerate(types_relations):
-                relation_key = relation.lower().replace("é", "e").replace("à", "a").replace("è", "e").replace("ê", "e").replace("ù", "u").replace("û", "u").replace("ç", "c").replace("'", "_").replace(" ", "_")
+                relation_key = normalize_relation(relation)
                 explication = relation_explications.get(relation_key, "")
                 cprint(f"🔗 [{mot}] Relation : {relation}", "blue")
                 if explication:
@@ -305,7 +612,11 @@ def main(start_id=471, end_id=6120, use_ollama=False, ollama_model="llama3.1:lat
                 else:
                     cprint("   (Pas d'explication trouvée pour cette relation)", "red")
                 req_start = time.time()
-                concepts = openai_concepts(mot, definition, relation, explication)
+                try:
+                    concepts = openai_concepts(mot, definition, relation, explication)
+                except Exception as e:
+                    failed.append(((idx, mot, definition), e))
+                    break
                 req_end = time.time()
                 req_duration = req_end - req_start
                 entry["relations"][relation] = {
@@ -317,26 +628,31 @@ def main(start_id=471, end_id=6120, use_ollama=False, ollama_model="llama3.1:lat
                 avg_time_per_req = elapsed / processed_requests if processed_requests else 0.0
                 remaining_requests = total_requests - processed_requests
                 est_time_left = avg_time_per_req * remaining_requests
-                est_cost_left = remaining_requests * cost_per_req
+                # Coût moyen réellement facturé dès qu'il est connu, estimation sinon
+                mean_cost = METRICS.mean_request_cost() or cost_per_req
+                est_cost_left = remaining_requests * mean_cost
                 cprint(f"   ⏱️ Temps pour cette requête : {format_time(req_duration)}", "cyan")
-                cprint(f"   💸 Coût de cette requête : {format_cost(cost_per_req)}", "magenta")
+                cprint(f"   💸 Coût moyen par requête : {format_cost(mean_cost)} | "
+                       f"dépensé : {format_cost(METRICS.totals['cost'])}", "magenta")
                 cprint(f"   ⏳ Temps estimé restant : {format_time(est_time_left)}", "yellow")
                 cprint(f"   💰 Coût total estimé restant : {format_cost(est_cost_left)}", "yellow", bold=True)
-                cprint("   Pause pour éviter le rate limit...", "magenta")
-                time.sleep(1.3)
-            mots_faits += 1
+            else:
+                mots_faits += 1
+            if failed and failed[-1][0][0] == idx:
+                # Relation en échec : le mot n'est pas sauvegardé, il sera redemandé à la reprise
+                cprint(f"⚠️ [{mot}] non sauvegardé (id {idx})", "red")
+                print_separator()
+                continue
 
         elapsed = time.time() - start_time
         avg_time_per_req = elapsed / processed_requests if processed_requests else 0.0
         remaining_requests = total_requests - processed_requests
         est_time_left = avg_time_per_req * remaining_requests
-        est_cost_left = remaining_requests * cost_per_req
+        est_cost_left = remaining_requests * (METRICS.mean_request_cost() or cost_per_req)
 
-        data[str(idx)] = entry
-        save_json(data, OUTFILE)
-        cprint("   Petite pause avant le prochain mot...", "magenta")
+        store.append(idx, entry)
+        cprint(f"💾 Sauvegarde dans {store.path}", "green")
         print_separator()
-        time.sleep(1)
 
         if not use_ollama:
             tqdm.write(
@@ -344,10 +660,190 @@ def main(start_id=471, end_id=6120, use_ollama=False, ollama_model="llama3.1:lat
                 f"Temps écoulé : {format_time(elapsed)} | "
                 f"Temps restant estimé : {format_time(est_time_left)}"
                 + (f" | Coût restant estimé : {format_cost(est_cost_left)}" if not use_ollama else "")
+                + limiter_status()
             )
 
+    if pool is not None:
+        pool.close()
+        failed.extend(pool.errors)
+    for (idx, mot, _), error in failed:
+        cprint(f"⚠️ [{mot}] non sauvegardé (id {idx}) : {error}", "red")
+    store.close()
     cprint("🎉 Traitement terminé !", "green", bold=True)
-    cprint(f"Tous les résultats sont dans {OUTFILE}", "green")
+    print_cache_stats()
+    write_metrics_report()
+    cprint(f"Tous les résultats sont dans {store.path}", "green")
+    print_separator()
+
+# ---------- PIPELINE ASYNCHRONE ----------
+def relation_concepts(mot, definition, relation, use_ollama, ollama_model):
+    """Appel bloquant au backend (OpenAI ou Ollama) pour une relation ; renvoie l'entrée de la relation."""
+    explication = relation_explications.get(normalize_relation(relation), "")
+    if use_ollama:
+        concepts = ollama_concepts(mot, definition, relation, explication, model=ollama_model)
+    else:
+        concepts = openai_concepts(mot, definition, relation, explication)
+    return relation, {"explication": explication, "concepts": concepts}
+
+async def prefetch_definitions(ids, queue, prefetch):
+    """
+    Récupère les définitions jusqu'à prefetch ids en avance et les place dans la file, dans
+    l'ordre des ids ; None signale la fin.
+    """
+    loop = asyncio.get_running_loop()
+    pending = []
+    for idx in ids:
+        pending.append((idx, loop.run_in_executor(None, get_mot_def, idx)))
+        if len(pending) >= prefetch:
+            idx, future = pending.pop(0)
+            await queue.put((idx, *await future))
+    for idx, future in pending:
+        await queue.put((idx, *await future))
+    await queue.put(None)
+
+async def process_word_async(idx, mot, definition, llm_slots, use_ollama, ollama_model, batches):
+    """Lance les requêtes d'un mot (une par lot de relations), chacune sous la limite globale llm_slots."""
+    loop = asyncio.get_running_loop()
+
+    async def one_batch(relations):
+        async with llm_slots:
+            return await loop.run_in_executor(
+                None, relation_batch, mot, definition, relations, use_ollama, ollama_model)
+
+    results = await asyncio.gather(*(one_batch(relations) for relations in batches))
+    # L'ordre des relations dans l'entrée reste celui de types_relations
+    relations = {relation: rel_data for batch_results in results for relation, rel_data in batch_results}
+    return idx, {"mot": mot, "definition": definition, "relations": relations}
+
+async def persist_entries(store, results):
+    """
+    Seule tâche qui écrit dans store : enregistre les mots terminés dès qu'ils arrivent. Les
+    mots arrivés pendant une écriture sont regroupés dans l'écriture suivante.
+    """
+    loop = asyncio.get_running_loop()
+    done = False
+    while not done:
+        batch = [await results.get()]
+        while not results.empty():
+            batch.append(results.get_nowait())
+        entries = [item for item in batch if item is not None]
+        done = len(entries) < len(batch)
+        if entries:
+            await loop.run_in_executor(None, store.append_many, entries)
+
+async def run_pipeline(ids_to_process, store, use_ollama, ollama_model, concurrency, prefetch, on_word=None,
+                       batch_size=1, stop=None):
+    """
+    Pipeline asynchrone : préchargement des définitions, requêtes de relations de plusieurs
+    mots en parallèle (au plus concurrency à la fois, tous mots confondus), sauvegarde au fil
+    de l'eau. Les appels bloquants (requests, openai) passent par un pool de threads.
+    batch_size : relations par requête (voir relation_batches). stop : voir main().
+    Renvoie le nombre de mots traités.
+    """
+    loop = asyncio.get_running_loop()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency + prefetch + 1)
+    loop.set_default_executor(executor)
+    definitions = asyncio.Queue(maxsize=prefetch)
+    results = asyncio.Queue()
+    llm_slots = asyncio.Semaphore(concurrency)
+    # Mots en cours au plus : assez pour garder concurrency requêtes occupées entre deux mots
+    batches = relation_batches(batch_size)
+    word_slots = asyncio.Semaphore(max(2, -(-concurrency // len(batches)) + 1))
+    words_done = 0
+
+    async def word_task(idx, mot, definition):
+        nonlocal words_done
+        try:
+            result = await process_word_async(idx, mot, definition, llm_slots, use_ollama, ollama_model, batches)
+        except Exception as e:
+            # Mot non sauvegardé : il sera redemandé à la reprise
+            cprint(f"⚠️ [{mot}] non sauvegardé (id {idx}) : {e}", "red")
+        else:
+            await results.put(result)
+            words_done += 1
+            if on_word:
+                on_word(idx, mot)
+        finally:
+            word_slots.release()
+
+    producer = asyncio.create_task(prefetch_definitions(ids_to_process, definitions, prefetch))
+    writer = asyncio.create_task(persist_entries(store, results))
+    tasks = []
+    stopped = False
+    try:
+        while True:
+            item = await definitions.get()
+            if item is None:
+                break
+            idx, mot, definition = item
+            if not mot:
+                cprint(f"⏩ Passage de l'id {idx} (mot non trouvé).", "red")
+                if DICTIONARY.is_unknown(idx):
+                    store.mark_absent(idx)
+                continue
+            await word_slots.acquire()
+            if stop is not None and stop.is_set():
+                word_slots.release()
+                cprint("🛑 Arrêt demandé (bail de tranche perdu), mots restants laissés à l'autre worker.", "red")
+                stopped = True
+                break
+            tasks.append(asyncio.create_task(word_task(idx, mot, definition)))
+        await asyncio.gather(*tasks)
+        if not stopped:
+            await producer
+    finally:
+        for task in tasks + [producer]:
+            task.cancel()
+        await results.put(None)
+        await writer
+        executor.shutdown(wait=False)
+    return words_done
+
+def main_async(start_id=471, end_id=6120, use_ollama=False, ollama_model="llama3.1:latest",
+               concurrency=16, prefetch=8, batch_size=1, store=None, stop=None):
+    """Variante de main() avec le pipeline asynchrone (voir run_pipeline), sans pauses fixes."""
+    global OLLAMA
+    if OLLAMA is not None:
+        use_ollama = OLLAMA
+    OLLAMA = use_ollama
+    if not use_ollama:
+        require_openai()
+    cprint("=== Générateur Ontologique Philosophie (asynchrone) ===", "blue", bold=True)
+    cprint(f"Traitement des IDs de {start_id} à {end_id} — {concurrency} requêtes simultanées, "
+           f"{prefetch} définitions préchargées", "blue")
+    print_separator()
+    if store is None:
+        store = open_results(OUTFILE)
+    ids_to_process = [idx for idx in range(start_id, end_id + 1) if idx not in store]
+    cprint(f"{end_id - start_id + 1 - len(ids_to_process)}/{end_id - start_id + 1} déjà traités. "
+           f"Début du traitement...", "cyan")
+    if not use_ollama:
+        batches = relation_batches(batch_size)
+        total_cost_est = len(ids_to_process) * len(batches) * estimate_cost_per_request(len(batches[0]))
+        cprint(f"💸 Coût estimé total pour ce run : {format_cost(total_cost_est)}", "magenta", bold=True)
+    print_separator()
+
+    start_time = time.time()
+    progress = tqdm(total=len(ids_to_process), desc="Concepts", ncols=100)
+
+    def on_word(idx, mot):
+        progress.update(1)
+        elapsed = time.time() - start_time
+        rate = progress.n / elapsed if elapsed else 0.0
+        est_time_left = (progress.total - progress.n) / rate if rate else 0.0
+        tqdm.write(f"🟦 [{mot}] terminé | Temps écoulé : {format_time(elapsed)} | "
+                   f"Temps restant estimé : {format_time(est_time_left)}" + limiter_status())
+
+    try:
+        words = asyncio.run(run_pipeline(ids_to_process, store, use_ollama, ollama_model,
+                                         concurrency, prefetch, on_word, batch_size, stop))
+    finally:
+        progress.close()
+        store.close()
+    cprint(f"🎉 Traitement terminé : {words} mots en {format_time(time.time() - start_time)} !", "green", bold=True)
+    print_cache_stats()
+    write_metrics_report()
+    cprint(f"Tous les résultats sont dans {store.path}", "green")
     print_separator()
 
 if __name__ == "__main__":
@@ -355,16 +851,92 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Générateur Ontologique Philosophie (CLI)")
     parser.add_argument("--start", type=int, default=471, help="ID de début (défaut: 471)")
     parser.add_argument("--end", type=int, default=6120, help="ID de fin (défaut: 6120)")
-    parser.add_argument("--outfile", type=str, default=OUTFILE, help="Fichier de sortie JSON")
+    parser.add_argument("--outfile", type=str, default=OUTFILE, help="Fichier de sortie (.jsonl : journal append-only, .json : ancien format)")
+    parser.add_argument("--compact-to", type=str, default=None, help="Après la génération, écrit le JSON compacté du journal (ou la fusion des tranches) dans ce fichier")
     parser.add_argument("--ollama", action="store_true", help="Utiliser Ollama local (llama3.1:latest)")
     parser.add_argument("--ollama-model", type=str, default="llama3.1:latest", help="Nom du modèle Ollama (défaut: llama3.1:latest)")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Pipeline asynchrone (requêtes de plusieurs mots en parallèle)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requêtes LLM simultanées en mode --async (défaut: 16)")
+    parser.add_argument("--prefetch", type=int, default=8, help="Définitions préchargées en mode --async (défaut: 8)")
+    parser.add_argument("--api-url", type=str, default=API_URL, help="URL de l'API du dictionnaire (l'id est ajouté à la fin)")
+    parser.add_argument("--ollama-url", type=str, default=OLLAMA_URL, help="URL de l'API chat d'Ollama")
+    parser.add_argument("--dict-cache", type=str, default=DICT_CACHE_FILE, help="Cache local du dictionnaire (vide pour désactiver)")
+    parser.add_argument("--dict-prefetch", action="store_true", help="Précharger les ids --start à --end dans le cache avant la génération")
+    parser.add_argument("--dict-workers", type=int, default=8, help="Connexions simultanées pour le préchargement (défaut: 8)")
+    parser.add_argument("--batch-size", type=int, default=1, help="Relations demandées par requête, réponse JSON (1 : une requête par relation, 0 : toutes ; défaut: 1)")
+    parser.add_argument("--rpm", type=int, default=None, help=f"Limite de requêtes par minute vers le backend (défaut: {OPENAI_DEFAULT_RPM} pour OpenAI, aucune pour Ollama)")
+    parser.add_argument("--tpm", type=int, default=None, help="Limite de tokens par minute vers le backend (défaut: aucune)")
+    parser.add_argument("--max-concurrency", type=int, default=32, help="Plafond de la concurrence adaptative (défaut: 32)")
+    parser.add_argument("--target-latency", type=float, default=None, help="Latence (s) au-delà de laquelle la concurrence est réduite (défaut: 3x la latence habituelle)")
+    parser.add_argument("--max-words", type=int, default=4, help="Mots en cours au plus dans le pool de requêtes (défaut: 4)")
+    parser.add_argument("--ordered", action="store_true", help="Sauvegarder les mots dans l'ordre des ids (sinon dès qu'ils sont terminés)")
+    parser.add_argument("--metrics-report", type=str, default=METRICS_FILE, help="Rapport JSON des métriques (tokens, latences, coût) ; vide pour désactiver")
+    parser.add_argument("--llm-cache", type=str, default=LLM_CACHE_FILE, help="Cache persistant des réponses LLM (vide pour désactiver)")
+    parser.add_argument("--llm-cache-size", type=int, default=256, help="Taille maximale du cache LLM en Mo (défaut: 256)")
+    parser.add_argument("--shard-dir", type=str, default=None, help="Répertoire partagé d'une génération en tranches (remplace --outfile)")
+    parser.add_argument("--shard-size", type=int, default=100, help="Ids par tranche (défaut: 100)")
+    parser.add_argument("--worker-id", type=str, default=None, help="Nom du worker dans les baux et journaux (défaut: machine-pid)")
+    parser.add_argument("--lease-ttl", type=float, default=300.0, help="Durée de validité d'un bail non renouvelé, en secondes (défaut: 300)")
+    parser.add_argument("--wait", action="store_true", help="Attendre les tranches tenues par d'autres workers au lieu de s'arrêter")
     args = parser.parse_args()
 
     OUTFILE = args.outfile
+    METRICS_FILE = args.metrics_report
+    DICTIONARY = DictionaryClient(args.api_url, HTTP_SESSION, cache_file=args.dict_cache or None)
+    OLLAMA_CLIENT = OllamaClient(args.ollama_url, LLM_SESSION)
+    # Le drapeau manuel OLLAMA, s'il est défini, l'emporte sur --ollama (voir main)
+    rpm = args.rpm
+    if rpm is None and not (OLLAMA if OLLAMA is not None else args.ollama):
+        rpm = OPENAI_DEFAULT_RPM
+    RATE_LIMITER = AdaptiveLimiter(rpm=rpm, tpm=args.tpm, max_concurrency=args.max_concurrency,
+                                   target_latency=args.target_latency)
+    if args.llm_cache:
+        LLM_CACHE = ResponseCache(args.llm_cache, max_bytes=args.llm_cache_size * 2**20)
+    if args.dict_prefetch:
+        prefetch_dictionary(args.start, args.end, args.dict_workers)
+
+    def generate(start_id, end_id, store=None, stop=None):
+        if args.use_async:
+            main_async(
+                start_id=start_id,
+                end_id=end_id,
+                use_ollama=args.ollama,
+                ollama_model=args.ollama_model,
+                concurrency=args.concurrency,
+                prefetch=args.prefetch,
+                batch_size=args.batch_size,
+                store=store,
+                stop=stop
+            )
+        else:
+            main(
+                start_id=start_id,
+                end_id=end_id,
+                use_ollama=args.ollama,
+                ollama_model=args.ollama_model,
+                batch_size=args.batch_size,
+                max_words=args.max_words,
+                ordered=args.ordered,
+                store=store,
+                stop=stop
+            )
+
+    if args.shard_dir:
+        # Génération en tranches : plusieurs processus ou machines partagent args.shard_dir
+        worker_id = args.worker_id or default_worker_id()
+        if METRICS_FILE == parser.get_default("metrics_report"):
+            METRICS_FILE = os.path.join(args.shard_dir, f"metriques-{worker_id}.json")
+        directory = ShardDirectory(args.shard_dir, args.start, args.end, args.shard_size)
+        shards = run_worker(directory, lambda shard, store, stop: generate(shard.start, shard.end, store, stop),
+                            worker_id=worker_id, ttl=args.lease_ttl, wait=args.wait)
+        cprint(f"🧩 {len(shards)} tranche(s) terminée(s) par {worker_id}", "green", bold=True)
+        if args.compact_to:
+            count, unfinished = merge(directory, args.compact_to)
+            cprint(f"🗜️ {count} entrées fusionnées dans {args.compact_to}"
+                   + (f" ({len(unfinished)} tranche(s) encore en cours)" if unfinished else ""), "green")
+    else:
+        generate(args.start, args.end)
 
-    main(
-        start_id=args.start,
-        end_id=args.end,
-        use_ollama=args.ollama,
-        ollama_model=args.ollama_model
-    )
\ No newline at end of file
+    if args.compact_to and not args.shard_dir and is_checkpoint(OUTFILE):
+        count = compact(OUTFILE, args.compact_to)
+        cprint(f"🗜️ {count} entrées compactées dans {args.compact_to}", "green")
@@ -0,0 +1,117 @@
+from collections import OrderedDict, defaultdict
+
+
+class BackwardChainer:
+    """
+    Évaluation dirigée par le but (chaînage arrière) d'une table de règles.
+
+    Un but est un triplet (concept, relation, inverse) : inverse=False demande les
+    destinations d de relation(concept, d), inverse=True les sources s de relation(s, concept).
+    Seuls les sous-buts nécessaires sont évalués. Comme les règles transitives rendent les
+    sous-buts récursifs, ils sont résolus ensemble jusqu'au point fixe (tabulation), puis
+    mémorisés dans un cache LRU borné. Le résultat est celui du point fixe de la table de
+    règles, sans limite d'itérations.
+    """
+
+    def __init__(self, rules, graph, reverse_graph, max_cached_goals=10000):
+        self.graph = graph
+        self.reverse_graph = reverse_graph
+        self.rules_by_head = defaultdict(list)
+        for rule in rules:
+            self.rules_by_head[rule.head[0]].append(rule)
+        self.max_cached_goals = max_cached_goals
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        """Vide le cache (à appeler dès que les relations de base changent)."""
+        self._cache.clear()
+
+    def query(self, concept, rel, reverse=False):
+        """Renvoie le frozenset des réponses au but (concept, rel, reverse)."""
+        goal = (concept, rel, reverse)
+        cached = self._cache.get(goal)
+        if cached is not None:
+            self.hits += 1
+            self._cache.move_to_end(goal)
+            return cached
+        self.misses += 1
+        table = self._solve(goal)
+        answers = frozenset(table.pop(goal))
+        for subgoal, subgoal_answers in table.items():
+            self._remember(subgoal, frozenset(subgoal_answers))
+        self._remember(goal, answers)
+        return answers
+
+    def holds(self, src, rel, dst):
+        return dst in self.query(src, rel)
+
+    def _remember(self, goal, answers):
+        self._cache[goal] = answers
+        self._cache.move_to_end(goal)
+        while len(self._cache) > self.max_cached_goals:
+            self._cache.popitem(last=False)
+
+    def _solve(self, goal):
+        """Calcule le point fixe de tous les sous-buts atteints depuis goal."""
+        table = {goal: set()}
+        order = [goal]
+        changed = True
+        while changed:
+            changed = False
+            i = 0
+            # order s'allonge pendant le parcours quand de nouveaux sous-buts apparaissent
+            while i < len(order):
+                current = order[i]
+                i += 1
+                new_answers = self._evaluate(current, table, order) - table[current]
+                if new_answers:
+                    table[current] |= new_answers
+                    changed = True
+        return table
+
+    def _lookup(self, goal, table, order):
+        cached = self._cache.get(goal)
+        if cached is not None:
+            return cached
+        answers = table.get(goal)
+        if answers is None:
+            answers = table[goal] = set()
+            order.append(goal)
+        return answers
+
+    def _evaluate(self, goal, table, order):
+        concept, rel, reverse = goal
+        graph = self.reverse_graph if reverse else self.graph
+        found = set(graph.get(concept, {}).get(rel, ()))
+        for rule in self.rules_by_head.get(rel, ()):
+            head_src, head_dst = rule.head[1]
+            bound, answer = (head_dst, head_src) if reverse else (head_src, head_dst)
+            for binding in self._bindings(rule.body, {bound: concept}, table, order):
+                if any(binding[x] == binding[y] for x, y in rule.distinct):
+                    continue
+                found.add(binding[answer])
+        return found
+
+    def _bindings(self, atoms, binding, table, order):
+        """Énumère les liaisons de variables qui satisfont les atomes, à partir d'une variable liée."""
+        if not atoms:
+            yield binding
+            return
+        # On commence par un atome dont une variable est déjà liée
+        index = next(i for i, (_, (u, v)) in enumerate(atoms) if u in binding or v in binding)
+        rel, (u, v) = atoms[index]
+        rest = atoms[:index] + atoms[index + 1:]
+        if u in binding:
+            values = self._lookup((binding[u], rel, False), table, order)
+            if v in binding:
+                if binding[v] in values:
+                    yield from self._bindings(rest, binding, table, order)
+                return
+            target = v
+        else:
+            values = self._lookup((binding[v], rel, True), table, order)
+            target = u
+        for value in list(values):
+            yield from self._bindings(rest, {**binding, target: value}, table, order)
@@ -0,0 +1,136 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+import CoreGenerateur as core
+from benchNormalization import synthetic_lists, letter_tag
+from checkpointStore import write_json, open_store
+
+
+def synthetic_results(entries, distinct, seed=0):
+    """Entrées de génération synthétiques : un mot principal et 10 concepts bruts par type de relation."""
+    rng = random.Random(seed)
+    relation_names = [rel.name for rel in core.TypeRelation]
+    lists = iter(synthetic_lists(entries * len(relation_names), distinct, seed))
+    stems = ["liberté", "vérité", "raison", "justice", "désir", "conscience"]
+    return {
+        str(i): {
+            "mot": f"{rng.choice(stems)}{letter_tag(i % 500)}",
+            "relations": {name: {"concepts": next(lists)} for name in relation_names},
+        }
+        for i in range(1, entries + 1)
+    }
+
+
+def write_results(results, path):
+    """Écrit les entrées au format de path : .jsonl (journal de GenerateurOntologique) ou .json."""
+    if path.endswith(".jsonl"):
+        with open_store(path) as store:
+            store.append_many(results.items())
+    else:
+        write_json(results, path)
+
+
+def run_extraction(path, workers, chunk_size, output):
+    """
+    Extraction puis génération du fichier Python ; renvoie (durée d'extraction, temps CPU du
+    processus principal, temps CPU des processus de travail, contenu généré).
+    """
+    core.NORMALIZER.clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        before = os.times()
+        start = time.perf_counter()
+        concepts, relations, frequencies = core.extract_ontology_from_json(path, workers=workers, chunk_size=chunk_size)
+        elapsed = time.perf_counter() - start
+        after = os.times()
+        core.generate_python_code(concepts, relations, frequencies, output)
+    main_cpu = after.user + after.system - before.user - before.system
+    workers_cpu = after.children_user + after.children_system - before.children_user - before.children_system
+    with open(output, "rb") as f:
+        return elapsed, main_cpu, workers_cpu, f.read()
+
+
+def run_incremental(path, index_path, output):
+    """Extraction incrémentale puis génération ; renvoie (durée d'extraction, bilan des changements, contenu généré)."""
+    core.NORMALIZER.clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        concepts, relations, frequencies, changes = core.extract_ontology_incremental(path, index_path)
+        elapsed = time.perf_counter() - start
+        core.generate_python_code(concepts, relations, frequencies, output)
+    with open(output, "rb") as f:
+        return elapsed, changes, f.read()
+
+
+def incremental_series(path, first_id, steps, distinct, workdir):
+    """
+    Construit l'index, puis ajoute au journal path des lots de steps[i] entrées ; après chaque
+    étape, compare l'extraction complète à l'extraction incrémentale.
+    """
+    index_path = os.path.join(workdir, "index.sqlite")
+    output = os.path.join(workdir, "ontologie_incrementale.py")
+    reference = os.path.join(workdir, "ontologie_complete.py")
+    extra = iter(synthetic_results(sum(steps), distinct, seed=1).values())
+    rows = []
+    for step in [None] + steps:
+        if step:
+            with open_store(path) as store:
+                store.append_many((str(first_id + i), next(extra)) for i in range(step))
+            first_id += step
+        full_time, _, _, full_output = run_extraction(path, 1, 200, reference)
+        elapsed, changes, incremental_output = run_incremental(path, index_path, output)
+        rows.append(("index initial" if step is None else f"+{step}", full_time, elapsed,
+                     changes["ajoutées"] + changes["modifiées"] + changes["retirées"], incremental_output == full_output))
+    print(f"\n{'Ajout':>13} | {'Complète (s)':>12} | {'Incrémentale (s)':>16} | {'Gain':>6} | "
+          f"{'Entrées retraitées':>18} | {'Fichier identique':>17}")
+    print("-" * 98)
+    for label, full_time, elapsed, changed, identical in rows:
+        print(f"{label:>13} | {full_time:>12.2f} | {elapsed:>16.2f} | {full_time / elapsed:>5.1f}x | "
+              f"{changed:>18} | {'oui' if identical else 'NON':>17}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Banc de l'extraction (parallèle, incrémentale) de CoreGenerateur")
+    parser.add_argument("--data", type=str, default=None, help="Résultats de génération (.json ou .jsonl) ; sinon données synthétiques")
+    parser.add_argument("--entries", type=int, default=20000, help="Entrées synthétiques (défaut: 20000)")
+    parser.add_argument("--distinct", type=int, default=20000, help="Chaînes brutes distinctes synthétiques (défaut: 20000)")
+    parser.add_argument("--format", choices=["json", "jsonl"], default="jsonl", help="Format du fichier synthétique (défaut: jsonl)")
+    parser.add_argument("--workers", type=str, default="1,2,4,8", help="Nombres de processus essayés (défaut: 1,2,4,8)")
+    parser.add_argument("--chunk-size", type=int, default=200, help="Entrées par lot envoyé à un processus (défaut: 200)")
+    parser.add_argument("--appended", type=str, default=None,
+                        help="Extraction incrémentale après des ajouts successifs de ce nombre d'entrées, ex. 0,10,100 "
+                             "(journal .jsonl synthétique)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = args.data
+        if path is None:
+            path = os.path.join(workdir, f"resultats.{args.format}")
+            write_results(synthetic_results(args.entries, args.distinct), path)
+            print(f"{args.entries} entrées synthétiques, {os.path.getsize(path) / 1e6:.1f} Mo ({args.format})")
+        print(f"Processeurs disponibles : {os.cpu_count()}")
+
+        runs = []
+        for workers in (int(w) for w in args.workers.split(",")):
+            output = os.path.join(workdir, f"ontologie_{workers}.py")
+            runs.append((workers, *run_extraction(path, workers, args.chunk_size, output)))
+
+        if args.appended:
+            if args.data is not None or args.format != "jsonl":
+                parser.error("--appended demande des données synthétiques au format jsonl")
+            incremental_series(path, args.entries + 1, [int(n) for n in args.appended.split(",")], args.distinct, workdir)
+
+    serial_time, _, _, serial_output = next((run[1:] for run in runs if run[0] == 1), runs[0][1:])
+    # Le processus principal (lecture, fusion, filtre) reste séquentiel : durée série / son temps
+    # CPU borne l'accélération, quel que soit le nombre de processeurs
+    print(f"\n{'Processus':>9} | {'Extraction (s)':>14} | {'CPU principal (s)':>17} | {'CPU travail (s)':>15} | "
+          f"{'Accélération':>12} | {'Plafond':>7} | {'Fichier identique':>17}")
+    print("-" * 112)
+    for workers, elapsed, main_cpu, workers_cpu, output in runs:
+        ceiling = f"{serial_time / main_cpu:.1f}x" if workers > 1 and main_cpu else "-"
+        print(f"{workers:>9} | {elapsed:>14.2f} | {main_cpu:>17.2f} | {workers_cpu:>15.2f} | "
+              f"{serial_time / elapsed:>11.2f}x | {ceiling:>7} | {'oui' if output == serial_output else 'NON':>17}")
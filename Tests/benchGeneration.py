@@ -0,0 +1,210 @@
+import argparse
+import contextlib
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+
+import GenerateurOntologique as generateur
+from checkpointStore import open_store, scan_ids
+from fakeBackends import FakeBackends, RouteBehaviour
+from httpClients import make_session, DictionaryClient, OllamaClient
+from rateLimiter import AdaptiveLimiter
+from usageMetrics import UsageMetrics
+
+PHASES = ("dictionnaire", "persistance", "journalisation")
+
+
+class PhaseTimer:
+    """
+    Temps cumulé par phase, tous threads confondus. Les appels imbriqués dans une phase déjà
+    mesurée dans le même thread (append -> append_many, close -> sync) ne sont comptés
+    qu'une fois, dans la phase englobante.
+    """
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.calls = dict.fromkeys(PHASES, 0)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def wrap(self, phase, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            if getattr(self._local, "active", False):
+                return fn(*args, **kwargs)
+            self._local.active = True
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self._local.active = False
+                with self._lock:
+                    self.seconds[phase] += elapsed
+                    self.calls[phase] += 1
+        return timed
+
+
+def instrument(timer):
+    """Mesure les écritures de résultats et les sorties console du générateur."""
+    generateur.cprint = timer.wrap("journalisation", generateur.cprint)
+
+    class TimedTqdm(generateur.tqdm):
+        write = classmethod(timer.wrap("journalisation", generateur.tqdm.write.__func__))
+
+    generateur.tqdm = TimedTqdm
+
+    def timed_open_store(path, *args, **kwargs):
+        store = open_store(path, *args, **kwargs)
+        for name in ("append", "append_many", "sync", "close"):
+            setattr(store, name, timer.wrap("persistance", getattr(store, name)))
+        return store
+
+    generateur.open_store = timer.wrap("persistance", timed_open_store)
+
+
+def configure(backends, outfile, backend, max_concurrency):
+    """Branche le générateur sur les serveurs factices, sans cache ni fichiers partagés."""
+    session = make_session(pool_size=max(32, max_concurrency))
+    llm_session = make_session(pool_size=max(32, max_concurrency), retry_statuses=())
+    generateur.OLLAMA = None  # le choix du backend vient du banc, pas du drapeau manuel
+    generateur.OUTFILE = outfile
+    generateur.HTTP_SESSION = session
+    generateur.LLM_SESSION = llm_session
+    generateur.DICTIONARY = DictionaryClient(backends.dictionary_url, session)
+    generateur.OLLAMA_CLIENT = OllamaClient(backends.ollama_url, llm_session)
+    generateur.LLM_CACHE = None
+    generateur.RATE_LIMITER = AdaptiveLimiter(max_concurrency=max_concurrency)
+    generateur.METRICS = UsageMetrics({"openai": (generateur.COST_PER_1M_INPUT, generateur.COST_PER_1M_OUTPUT)})
+    generateur.METRICS_FILE = ""
+    if backend == "openai":
+        generateur.require_openai()
+        generateur.openai.base_url = backends.openai_url
+        generateur.openai.api_key = "banc-local"
+
+
+def run_generation(args):
+    """Lance main() ou main_async() sur les ids du banc ; renvoie la durée totale."""
+    start_id, end_id = args.start, args.start + args.words - 1
+    use_ollama = args.backend == "ollama"
+    log = open(args.log_file, "w", encoding="utf-8")
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            if args.pipeline == "async":
+                generateur.main_async(start_id, end_id, use_ollama, args.model, concurrency=args.concurrency,
+                                      prefetch=args.prefetch, batch_size=args.batch_size)
+            else:
+                generateur.main(start_id, end_id, use_ollama, args.model, batch_size=args.batch_size,
+                                max_words=args.max_words, ordered=args.ordered)
+    finally:
+        log.close()
+    return time.perf_counter() - start
+
+
+def build_report(args, wall, words, timer, backends):
+    snap = generateur.METRICS.snapshot()
+    server = backends.stats()
+    limiter = generateur.RATE_LIMITER.stats()
+    phases = {
+        "E/S LLM": snap["seconds"],
+        "attente limiteur": limiter["waited"],
+        "E/S dictionnaire": timer.seconds["dictionnaire"],
+        "persistance": timer.seconds["persistance"],
+        "journalisation": timer.seconds["journalisation"],
+    }
+    return {
+        "config": vars(args),
+        "wall_seconds": wall,
+        "words": words,
+        "words_per_minute": words * 60 / wall if wall else 0.0,
+        "llm_requests": snap["requests"],
+        "llm_requests_per_second": snap["requests"] / wall if wall else 0.0,
+        "llm_latency_p50": snap["latency_p50"],
+        "llm_latency_p95": snap["latency_p95"],
+        "llm_error_rate": snap["error_rate"],
+        "dictionary_requests": server["dictionary"]["requests"],
+        "dictionary_requests_per_second": server["dictionary"]["requests"] / wall if wall else 0.0,
+        "phase_seconds": phases,
+        "phase_calls": dict(timer.calls),
+        "concurrency_limit": limiter["concurrency_limit"],
+        "server": server,
+    }
+
+
+def print_report(report):
+    config = report["config"]
+    print(f"=== Banc de génération : backend factice {config['backend']}, pipeline {config['pipeline']}, "
+          f"lots de {config['batch_size']} relation(s) ===")
+    print(f"Mots traités : {report['words']} en {report['wall_seconds']:.2f} s "
+          f"→ {report['words_per_minute']:.1f} mots/min")
+    p50 = f"{report['llm_latency_p50']:.3f}" if report["llm_latency_p50"] is not None else "-"
+    p95 = f"{report['llm_latency_p95']:.3f}" if report["llm_latency_p95"] is not None else "-"
+    print(f"Requêtes LLM : {report['llm_requests']} ({report['llm_requests_per_second']:.1f} req/s, "
+          f"p50/p95 {p50}/{p95} s, erreurs {report['llm_error_rate']:.1%}, "
+          f"concurrence finale {report['concurrency_limit']})")
+    print(f"Requêtes dictionnaire : {report['dictionary_requests']} "
+          f"({report['dictionary_requests_per_second']:.1f} req/s)")
+    llm_server = report["server"][config["backend"]]
+    if llm_server["errors"] or llm_server["rejected"]:
+        # La session HTTP retente ces réponses : elles n'apparaissent pas toutes comme erreurs côté client
+        print(f"Réponses d'erreur du serveur LLM : {llm_server['errors']} simulées, "
+              f"{llm_server['rejected']} rejets au-delà de la capacité")
+    total = sum(report["phase_seconds"].values())
+    print("Temps cumulé par phase (somme sur tous les threads) :")
+    for phase, seconds in report["phase_seconds"].items():
+        share = seconds / total if total else 0.0
+        print(f"  {phase:<18} {seconds:>9.3f} s  {share:>6.1%}")
+    print(f"  {'(durée totale)':<18} {report['wall_seconds']:>9.3f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Banc de débit de la génération, hors ligne, sur des serveurs factices")
+    parser.add_argument("--words", type=int, default=20, help="Nombre d'ids à traiter (défaut: 20)")
+    parser.add_argument("--start", type=int, default=1, help="Premier id (défaut: 1)")
+    parser.add_argument("--backend", choices=["ollama", "openai"], default="ollama", help="Backend LLM imité (défaut: ollama)")
+    parser.add_argument("--model", type=str, default="llama3.1:latest", help="Nom de modèle envoyé au serveur factice")
+    parser.add_argument("--pipeline", choices=["main", "async"], default="main", help="main() (pool de threads) ou main_async() (défaut: main)")
+    parser.add_argument("--batch-size", type=int, default=1, help="Relations par requête (voir GenerateurOntologique --batch-size)")
+    parser.add_argument("--max-words", type=int, default=4, help="Mots en cours dans le pool de main() (défaut: 4)")
+    parser.add_argument("--ordered", action="store_true", help="Livraison des mots dans l'ordre des ids (main())")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requêtes simultanées de main_async() (défaut: 16)")
+    parser.add_argument("--prefetch", type=int, default=8, help="Définitions préchargées par main_async() (défaut: 8)")
+    parser.add_argument("--max-concurrency", type=int, default=32, help="Plafond du limiteur adaptatif (défaut: 32)")
+    parser.add_argument("--dict-latency", type=str, default="0.02", help="Loi de latence du dictionnaire (défaut: 0.02)")
+    parser.add_argument("--llm-latency", type=str, default="lognormal:0.05:0.4",
+                        help="Loi de latence du LLM : fixe, uniform:a:b, exp:moyenne, lognormal:médiane:sigma (défaut: lognormal:0.05:0.4)")
+    parser.add_argument("--token-rate", type=float, default=None, help="Tokens de sortie par seconde ajoutés à la latence LLM")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction des requêtes LLM en erreur 429/500/503 (défaut: 0)")
+    parser.add_argument("--dict-error-rate", type=float, default=0.0, help="Fraction des requêtes du dictionnaire en erreur (défaut: 0)")
+    parser.add_argument("--capacity", type=int, default=None, help="Requêtes LLM simultanées au-delà desquelles le serveur répond 429")
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="Fraction des ids sans mot (défaut: 0)")
+    parser.add_argument("--seed", type=int, default=0, help="Graine des tirages de latence et d'erreurs (défaut: 0)")
+    parser.add_argument("--log-file", type=str, default=os.devnull, help="Destination des sorties du générateur (défaut: aucune)")
+    parser.add_argument("--report", type=str, default=None, help="Écrit aussi le rapport en JSON dans ce fichier")
+    args = parser.parse_args()
+    if args.backend == "openai" and generateur.openai is None:
+        parser.error("--backend openai demande le paquet openai (pip install openai) ; --backend ollama fonctionne sans")
+
+    llm = RouteBehaviour(args.llm_latency, args.llm_error_rate, capacity=args.capacity, token_rate=args.token_rate,
+                         seed=args.seed)
+    dictionary = RouteBehaviour(args.dict_latency, args.dict_error_rate, seed=args.seed + 1)
+    routes = {"ollama": llm} if args.backend == "ollama" else {"openai": llm}
+    timer = PhaseTimer()
+    instrument(timer)
+    # Serveurs dans le même processus que le pipeline : leurs threads partagent le GIL avec lui
+    with tempfile.TemporaryDirectory() as workdir, \
+            FakeBackends(dictionary=dictionary, missing_rate=args.missing_rate, **routes) as backends:
+        outfile = os.path.join(workdir, "concepts_ontologie.jsonl")
+        configure(backends, outfile, args.backend, args.max_concurrency)
+        generateur.DICTIONARY.entry = timer.wrap("dictionnaire", generateur.DICTIONARY.entry)
+        wall = run_generation(args)
+        report = build_report(args, wall, len(scan_ids(outfile)), timer, backends)
+
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,248 @@
+import argparse
+import contextlib
+import io
+import os
+import importlib.machinery
+import importlib.util
+import py_compile
+import random
+import tempfile
+import time
+import tracemalloc
+
+from metaRelations import LogicalInferenceEngine, TypeRelation, get_core_relations, default_ontology_path
+from CoreGenerateur import generate_python_code
+from ontologySnapshot import load_relations
+from ontologyStore import OntologyStore
+
+
+# Types de relation des ontologies synthétiques : ceux qui interviennent dans DEFAULT_RULES
+SYNTHETIC_RELATIONS = [
+    "IMPLIQUE", "EST_UN", "FAIT_PARTIE_DE", "PRECEDE", "CAUSE", "EST_EQUIVALENT", "IDENTIQUE_A",
+    "S_OPPOSE_A", "CONTREDIT", "NECESSITE", "EMPECHE", "A_COMME_PROPRIETE", "INSTANCE_DE",
+    "COMPLEMENTE", "EST_ANALOGUE_A", "VISE",
+]
+
+
+def synthetic_relations(concepts=2500, density=0.3, seed=1):
+    """
+    Ontologie synthétique de la forme de celles que produit CoreGenerateur : chaque concept
+    a, pour chaque type de SYNTHETIC_RELATIONS, avec la probabilité density, une relation
+    vers un autre concept tiré au hasard (environ 12 000 relations avec les valeurs par défaut).
+    """
+    rng = random.Random(seed)
+    names = ["MOT" + "".join(rng.choice("ABCDEFGHIJ") for _ in range(4)) for _ in range(concepts)]
+    relation_types = [TypeRelation[name] for name in SYNTHETIC_RELATIONS]
+    relations = set()
+    for name in names:
+        for rel in relation_types:
+            if rng.random() < density:
+                target = rng.choice(names)
+                if target != name:
+                    relations.add((name, rel, target))
+    return sorted(relations, key=lambda x: (x[0], x[1].name, x[2]))
+
+
+def run_engine(relations, max_iterations, semi_naive, workers=1):
+    """Lance une inférence complète en silence et renvoie (moteur, relations dérivées, durée totale)."""
+    engine = LogicalInferenceEngine(relations)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        derived = engine.apply_all_rules(max_iterations=max_iterations, semi_naive=semi_naive, workers=workers)
+    return engine, derived, time.perf_counter() - start
+
+
+def bench_semi_naive(relations, max_iterations):
+    """Compare le temps par itération du moteur naïf et du moteur semi-naïf."""
+    print(f"Relations initiales: {len(relations)} | max_iterations={max_iterations}")
+
+    naive_engine, naive_derived, naive_total = run_engine(relations, max_iterations, semi_naive=False)
+    semi_engine, semi_derived, semi_total = run_engine(relations, max_iterations, semi_naive=True)
+
+    print(f"\n{'Itération':>10} | {'Naïf (s)':>10} | {'Semi-naïf (s)':>13} | {'Gain':>6}")
+    print("-" * 50)
+    nb_iterations = max(len(naive_engine.iteration_times), len(semi_engine.iteration_times))
+    for i in range(nb_iterations):
+        naive_t = naive_engine.iteration_times[i] if i < len(naive_engine.iteration_times) else 0.0
+        semi_t = semi_engine.iteration_times[i] if i < len(semi_engine.iteration_times) else 0.0
+        gain = f"{naive_t / semi_t:.1f}x" if semi_t else "-"
+        print(f"{i + 1:>10} | {naive_t:>10.3f} | {semi_t:>13.3f} | {gain:>6}")
+    print("-" * 50)
+    print(f"{'Total':>10} | {naive_total:>10.3f} | {semi_total:>13.3f} | {naive_total / semi_total:.1f}x")
+
+    identical = naive_derived == semi_derived and naive_engine.relations == semi_engine.relations
+    print(f"\nRelations dérivées: {len(naive_derived)} (naïf) / {len(semi_derived)} (semi-naïf)")
+    print(f"Point fixe identique: {'oui' if identical else 'NON'}")
+    return identical
+
+
+def bench_incremental(relations, batch_sizes=(10, 100, 1000)):
+    """Compare l'ajout/retrait d'un lot de relations avec une reconstruction complète du graphe."""
+    engine = LogicalInferenceEngine(relations)
+    start = time.perf_counter()
+    engine.build_graph()
+    rebuild = time.perf_counter() - start
+    print(f"\nReconstruction complète (build_graph) sur {len(engine.relations)} relations: {rebuild * 1000:.2f} ms")
+
+    pool = list(engine.relations)
+    rng = random.Random(0)
+    print(f"{'Lot':>8} | {'remove (ms)':>11} | {'add (ms)':>9}")
+    print("-" * 36)
+    for size in batch_sizes:
+        batch = rng.sample(pool, min(size, len(pool)))
+        start = time.perf_counter()
+        engine.remove_relations(batch)
+        removed = time.perf_counter() - start
+        start = time.perf_counter()
+        engine.add_relations(batch)
+        added = time.perf_counter() - start
+        print(f"{len(batch):>8} | {removed * 1000:>11.3f} | {added * 1000:>9.3f}")
+
+    reference = LogicalInferenceEngine(relations)
+    identical = engine.relation_graph == reference.relation_graph
+    print(f"Graphe identique à une reconstruction: {'oui' if identical else 'NON'}")
+    return identical
+
+
+def measure_engine_memory(relations, compact):
+    """Mesure la mémoire allouée par la construction d'un moteur (octets) et sa durée."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    engine = LogicalInferenceEngine(relations, compact=compact)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return engine, current, peak, elapsed
+
+
+def bench_memory(relations):
+    """Compare l'empreinte mémoire du stockage par tuples/dictionnaires et du stockage compact."""
+    print(f"\nMémoire pour {len(relations)} relations:")
+    print(f"{'Stockage':>10} | {'Retenue (Mo)':>12} | {'Pic (Mo)':>9} | {'Octets/relation':>15} | {'Construction (s)':>16}")
+    print("-" * 75)
+    results = {}
+    for label, compact in (("tuples", False), ("compact", True)):
+        engine, current, peak, elapsed = measure_engine_memory(relations, compact)
+        results[label] = engine
+        per_relation = current / len(relations) if relations else 0
+        print(f"{label:>10} | {current / 2**20:>12.2f} | {peak / 2**20:>9.2f} | {per_relation:>15.1f} | {elapsed:>16.3f}")
+    identical = set(results["compact"].relations) == results["tuples"].relations
+    print(f"Mêmes relations dans les deux stockages: {'oui' if identical else 'NON'}")
+    return identical
+
+
+def bench_parallel(relations, max_iterations, worker_counts=(1, 2, 4, 8)):
+    """Mesure le passage à l'échelle de l'évaluation parallèle et vérifie l'égalité avec le séquentiel."""
+    print(f"\nÉvaluation parallèle ({os.cpu_count()} coeurs disponibles), max_iterations={max_iterations}:")
+    print(f"{'Processus':>10} | {'Durée (s)':>10} | {'Accélération':>12} | {'Identique':>9}")
+    print("-" * 52)
+    _, reference, serial_total = run_engine(relations, max_iterations, semi_naive=False)
+    identical = True
+    for workers in worker_counts:
+        if workers == 1:
+            derived, total = reference, serial_total
+        else:
+            _, derived, total = run_engine(relations, max_iterations, semi_naive=False, workers=workers)
+        same = derived == reference
+        identical = identical and same
+        print(f"{workers:>10} | {total:>10.3f} | {serial_total / total:>11.2f}x | {'oui' if same else 'NON':>9}")
+    return identical
+
+
+def bench_loading(relations, lookups=200):
+    """
+    Compare le chargement de l'export .py (compilé depuis le source, puis depuis un .pyc
+    préparé à l'avance), de l'instantané binaire et de la base SQLite, puis le coût de recherches ponctuelles (sources d'une relation vers un
+    concept) : import du module et parcours de la liste, ou requête indexée sur la base.
+    """
+    concepts = {c for src, _, dst in relations for c in (src, dst)}
+    with tempfile.TemporaryDirectory() as tmp:
+        py_file = os.path.join(tmp, "ontologie_generee.py")
+        snapshot_file = os.path.join(tmp, "ontologie_generee.opfsnap")
+        store_file = os.path.join(tmp, "ontologie_generee.sqlite")
+        generate_python_code(concepts, relations, {c: 2 for c in concepts}, py_file, snapshot_file, store_file)
+
+        def load_source():
+            # Compilation du source à chaque appel, sans passer par __pycache__
+            with open(py_file, "r", encoding="utf-8") as f:
+                code = compile(f.read(), py_file, "exec")
+            namespace = {"__name__": "ontologie_generee_bench"}
+            exec(code, namespace)
+            return namespace["CORE_RELATIONS"]
+
+        # Bytecode compilé avant les mesures, chargé comme un import depuis __pycache__
+        pyc_file = py_compile.compile(py_file, cfile=os.path.join(tmp, "ontologie_generee.pyc"), doraise=True)
+
+        def load_module():
+            loader = importlib.machinery.SourcelessFileLoader("ontologie_generee_bench", pyc_file)
+            module = importlib.util.module_from_spec(importlib.util.spec_from_loader(loader.name, loader))
+            loader.exec_module(module)
+            return module.CORE_RELATIONS
+
+        def load_store():
+            with OntologyStore(store_file, TypeRelation) as store:
+                return list(store.triples())
+
+        print(f"\nChargement de {len(relations)} relations "
+              f"(.py: {os.path.getsize(py_file) / 2**20:.2f} Mo, instantané: {os.path.getsize(snapshot_file) / 2**20:.2f} Mo, "
+              f"base SQLite: {os.path.getsize(store_file) / 2**20:.2f} Mo):")
+        timings = []
+        for label, loader in (("module .py (à froid)", load_source),
+                              ("module .py (.pyc)", load_module),
+                              ("instantané", lambda: load_relations(snapshot_file, TypeRelation)),
+                              ("base SQLite (tout)", load_store)):
+            start = time.perf_counter()
+            loaded = loader()
+            timings.append((label, time.perf_counter() - start, len(loaded)))
+        for label, elapsed, count in timings:
+            print(f"  {label:<22}: {elapsed * 1000:>9.1f} ms ({count} relations)")
+        identical = set(load_relations(snapshot_file, TypeRelation)) == set(relations)
+        print(f"Instantané identique aux relations d'origine: {'oui' if identical else 'NON'}")
+
+        rng = random.Random(0)
+        queries = [(dst, rel) for _, rel, dst in rng.sample(list(relations), min(lookups, len(relations)))]
+        start = time.perf_counter()
+        module_relations = load_module()
+        expected = [sorted(src for src, r, d in module_relations if d == dst and r.name == rel.name)
+                    for dst, rel in queries]
+        scan_time = time.perf_counter() - start
+        start = time.perf_counter()
+        with OntologyStore(store_file, TypeRelation) as store:
+            found = [sorted(store.sources(dst, rel)) for dst, rel in queries]
+        store_time = time.perf_counter() - start
+        print(f"\n{len(queries)} recherches (sources d'une relation vers un concept):")
+        print(f"  {'module .py + parcours':<22}: {scan_time * 1000:>9.1f} ms")
+        print(f"  {'base SQLite indexée':<22}: {store_time * 1000:>9.1f} ms "
+              f"({store_time * 1000 / max(len(queries), 1):.3f} ms par recherche, ouverture comprise)")
+        store_identical = found == expected and set(load_store()) == set(relations)
+        print(f"Base SQLite identique aux relations d'origine: {'oui' if store_identical else 'NON'}")
+        return identical and store_identical
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks du moteur d'inférence")
+    parser.add_argument("--iterations", type=int, default=3, help="Nombre maximal d'itérations (défaut: 3)")
+    parser.add_argument("--bench", choices=["semi-naive", "incremental", "memory", "parallel", "loading", "all"], default="all",
+                        help="Benchmark à lancer (défaut: all)")
+    parser.add_argument("--ontology", type=str, default=None,
+                        help="Ontologie à charger (.py, .opfsnap ou .sqlite) ; par défaut celle générée par "
+                             "CoreGenerateur si elle existe, sinon une ontologie synthétique")
+    parser.add_argument("--concepts", type=int, default=2500, help="Concepts de l'ontologie synthétique (défaut: 2500)")
+    args = parser.parse_args()
+
+    if args.ontology or os.path.exists(default_ontology_path()):
+        relations = get_core_relations(args.ontology)
+    else:
+        relations = synthetic_relations(args.concepts)
+        print(f"Aucune ontologie générée : ontologie synthétique de {args.concepts} concepts ({len(relations)} relations)")
+
+    if args.bench in ("semi-naive", "all"):
+        bench_semi_naive(relations, args.iterations)
+    if args.bench in ("incremental", "all"):
+        bench_incremental(relations)
+    if args.bench in ("memory", "all"):
+        bench_memory(relations)
+    if args.bench in ("parallel", "all"):
+        bench_parallel(relations, args.iterations)
+    if args.bench in ("loading", "all"):
+        bench_loading(relations)
@@ -0,0 +1,140 @@
+import argparse
+import random
+import re
+import string
+import time
+
+from conceptNormalizer import ConceptNormalizer, STOP_WORDS
+from checkpointStore import iter_results
+
+
+# Versions d'origine de CoreGenerateur.clean_concept / is_valid_concept, comme référence
+def legacy_clean_concept(concept):
+    if not isinstance(concept, str):
+        return None
+    concept = concept.strip().upper()
+    concept = re.sub(r'^(LA |LE |LES |L\'|UN |UNE |DES |DU |DE LA |DE L\')', '', concept)
+    if any(phrase in concept for phrase in ['VOICI', 'CONCEPTS LIÉS', 'EST EXPLIQUÉ PAR', 'SONT :', 'PAR LA RELATION']):
+        return None
+    if len(concept) > 50:
+        return None
+    if not concept or concept in ['', ' '] or '\n' in concept:
+        return None
+    if '  ' in concept:
+        return None
+    if ' ' in concept and len(concept) > 22:
+        return None
+    if concept in ['ET', 'OU', 'DONC', 'MAIS', 'CAR', 'PUIS', 'ALORS']:
+        return None
+    return concept
+
+
+def legacy_is_valid_concept(concept):
+    if concept in STOP_WORDS:
+        return False
+    if concept.startswith('"') or concept.endswith('"'):
+        return False
+    if concept.startswith('(') or concept.endswith('(') or concept.endswith(')'):
+        return False
+    allowed = set(string.ascii_uppercase + " -")
+    if not all(c in allowed or c.isalpha() for c in concept):
+        return False
+    if sum(1 for c in concept if c.isalpha()) < 2:
+        return False
+    return True
+
+
+def letter_tag(number):
+    """Suffixe alphabétique distinct pour chaque entier (les chiffres rendraient le concept invalide)."""
+    tag = ""
+    while True:
+        number, digit = divmod(number, 26)
+        tag += string.ascii_lowercase[digit]
+        if not number:
+            return tag
+
+
+def synthetic_lists(lists, distinct, seed=0):
+    """
+    Listes de 10 concepts bruts comme celles du LLM : distinct chaînes (variantes de casse,
+    articles, explications, ponctuation...) tirées avec une loi de Zipf.
+    """
+    rng = random.Random(seed)
+    stems = ["liberté", "vérité", "justice", "raison", "conscience", "désir", "bonheur", "devoir", "état",
+             "nature", "culture", "langage", "temps", "existence", "autrui", "inconscient", "matière", "esprit"]
+    variants = [
+        lambda w, i: f"{w}{i}", lambda w, i: f"{w}{i}", lambda w, i: f"{w.upper()}{i}", lambda w, i: f"  la {w}{i} ",
+        lambda w, i: f"L'{w}{i}", lambda w, i: f"{w}{i}.", lambda w, i: f"voici les concepts liés : {w}",
+        lambda w, i: f"{w} et {w}{i}", lambda w, i: f"({w}{i})", lambda w, i: f"de la {w} {i}",
+        lambda w, i: f"{w}-{w}{i}", lambda w, i: "et", lambda w, i: f"{w}{i} " * 6, lambda w, i: f"{w}{i}2",
+    ]
+    vocabulary = [rng.choice(variants)(rng.choice(stems), letter_tag(i)) for i in range(distinct)]
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    return [rng.choices(vocabulary, weights, k=10) for _ in range(lists)]
+
+
+def lists_from_file(path):
+    return [relation["concepts"] for _, entry in iter_results(path)
+            for relation in entry.get("relations", {}).values() if "concepts" in relation]
+
+
+def run_legacy(lists):
+    """Nettoyage puis validité avec les fonctions d'origine ; renvoie (concepts nettoyés, valides, durées)."""
+    start = time.perf_counter()
+    cleaned = [concept for concepts in lists for concept in map(legacy_clean_concept, concepts) if concept]
+    middle = time.perf_counter()
+    valid = [concept for concept in cleaned if legacy_is_valid_concept(concept)]
+    return cleaned, valid, (middle - start, time.perf_counter() - middle)
+
+
+def run_single(lists, normalizer):
+    """Même chose avec le moteur, un appel par concept."""
+    start = time.perf_counter()
+    cleaned = [concept for concepts in lists for concept in map(normalizer.clean, concepts) if concept]
+    middle = time.perf_counter()
+    valid = [concept for concept in cleaned if normalizer.is_valid(concept)]
+    return cleaned, valid, (middle - start, time.perf_counter() - middle)
+
+
+def run_batch(lists, normalizer):
+    """Même chose avec le moteur, un appel clean_many par liste de concepts."""
+    start = time.perf_counter()
+    cleaned = [concept for concepts in lists for concept in normalizer.clean_many(concepts)]
+    middle = time.perf_counter()
+    valid = [concept for concept in cleaned if normalizer.is_valid(concept)]
+    return cleaned, valid, (middle - start, time.perf_counter() - middle)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmark de la normalisation des concepts")
+    parser.add_argument("--data", type=str, default=None, help="Résultats de génération (.json ou .jsonl) ; sinon données synthétiques")
+    parser.add_argument("--lists", type=int, default=50000, help="Listes de 10 concepts synthétiques (défaut: 50000)")
+    parser.add_argument("--distinct", type=int, default=5000, help="Chaînes brutes distinctes synthétiques (défaut: 5000)")
+    parser.add_argument("--max-cached", type=int, default=100000, help="Taille des caches du moteur (défaut: 100000)")
+    args = parser.parse_args()
+
+    lists = lists_from_file(args.data) if args.data else synthetic_lists(args.lists, args.distinct)
+    occurrences = sum(len(concepts) for concepts in lists)
+    print(f"{len(lists)} listes, {occurrences} occurrences, "
+          f"{len({c for concepts in lists for c in concepts if isinstance(c, str)})} chaînes distinctes")
+
+    runs = [
+        ("fonctions d'origine", run_legacy(lists)),
+        ("moteur, appel par concept", run_single(lists, ConceptNormalizer(args.max_cached))),
+    ]
+    batch_normalizer = ConceptNormalizer(args.max_cached)
+    runs.append(("moteur, clean_many", run_batch(lists, batch_normalizer)))
+
+    legacy_clean, legacy_valid = runs[0][1][2]
+    print(f"\n{'Version':<26} | {'Nettoyage (s)':>13} | {'Gain':>5} | {'Validité (s)':>12} | {'Gain':>5} | {'ns/occurrence':>13}")
+    print("-" * 92)
+    for name, (_, _, (clean_time, valid_time)) in runs:
+        print(f"{name:<26} | {clean_time:>13.3f} | {legacy_clean / clean_time:>4.1f}x | {valid_time:>12.3f} | "
+              f"{legacy_valid / valid_time:>4.1f}x | {(clean_time + valid_time) / occurrences * 1e9:>13.0f}")
+    identical = all(cleaned == runs[0][1][0] and valid == runs[0][1][1] for _, (cleaned, valid, _) in runs)
+    print(f"\nRésultats identiques: {'oui' if identical else 'NON'} "
+          f"({len(runs[0][1][0])} concepts nettoyés, {len(runs[0][1][1])} valides)")
+    stats = batch_normalizer.stats()
+    print(f"Cache: {stats['hit_rate']:.1%} de succès, {stats['cached']} chaînes")
+    print("Rejets au nettoyage:", dict(batch_normalizer.clean_rejections.most_common()))
+    print("Exclusions de l'ontologie:", dict(batch_normalizer.validity_rejections.most_common()))
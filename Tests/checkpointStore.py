@@ -0,0 +1,368 @@
+import json
+import os
+import re
+import threading
+import time
+
+# Une ligne du journal : {"id": "471", "entry": {...}}. L'id est écrit en premier pour
+# pouvoir reprendre une génération en ne lisant que le début des lignes.
+# Un id sans mot dans le dictionnaire est noté {"id": "471", "absent": true} : il compte
+# comme fait à la reprise, mais n'a pas d'entrée.
+ID_PREFIX_RE = re.compile(rb'^\{"id": "([^"]*)"')
+ABSENT_LINE_RE = re.compile(rb'^\{"id": "[^"]*", "absent": true\}\n$')
+NUMBER_DELIMITERS = ",}] \t\r\n"
+
+
+def is_checkpoint(path):
+    return path.endswith(".jsonl")
+
+
+class CheckpointStore:
+    """
+    Journal append-only des résultats de génération (JSONL, une entrée par ligne).
+
+    Chaque mot terminé coûte une ligne, au lieu d'une réécriture complète du JSON. Les
+    écritures sont forcées sur disque (fsync) par lots : toutes les fsync_every entrées ou
+    fsync_interval secondes, et à la fermeture. Une ligne tronquée par un arrêt brutal est
+    retirée à la réouverture ; les lignes précédentes restent intactes. Si un id apparaît
+    plusieurs fois, la dernière ligne l'emporte. Les ids absents du dictionnaire
+    (mark_absent) sont notés dans le journal, sans entrée.
+    """
+
+    def __init__(self, path, fsync_every=16, fsync_interval=2.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._ids = scan_ids(path)
+        _truncate_partial_line(path)
+        self._file = open(path, "ab")
+        # Les mots terminés et les ids absents peuvent être écrits depuis deux threads
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def ids(self):
+        """Ids déjà enregistrés ou notés absents (chaînes)."""
+        return self._ids
+
+    def __contains__(self, id):
+        return str(id) in self._ids
+
+    def append(self, id, entry):
+        self.append_many([(id, entry)])
+
+    def mark_absent(self, id):
+        """Note un id sans mot dans le dictionnaire : il ne sera pas redemandé à la reprise."""
+        self._write([json.dumps({"id": str(id), "absent": True}).encode("utf-8") + b"\n"])
+        self._ids.add(str(id))
+
+    def append_many(self, items):
+        lines = []
+        for id, entry in items:
+            lines.append(json.dumps({"id": str(id), "entry": entry}, ensure_ascii=False).encode("utf-8") + b"\n")
+            self._ids.add(str(id))
+        self._write(lines)
+
+    def _write(self, lines):
+        with self._lock:
+            self._file.write(b"".join(lines))
+            self._file.flush()
+            self._unsynced += len(lines)
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self.sync()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonFileStore:
+    """
+    Même interface que CheckpointStore pour l'ancien format (un seul JSON indenté, réécrit
+    entièrement à chaque ajout, via un fichier temporaire).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.data = read_results(path) if os.path.exists(path) else {}
+
+    def ids(self):
+        return set(self.data)
+
+    def __contains__(self, id):
+        return str(id) in self.data
+
+    def append(self, id, entry):
+        self.append_many([(id, entry)])
+
+    def append_many(self, items):
+        for id, entry in items:
+            self.data[str(id)] = entry
+        write_json(self.data, self.path)
+
+    def mark_absent(self, id):
+        # L'ancien format n'a que des entrées : l'id sera redemandé à la reprise
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_store(path, **options):
+    """CheckpointStore pour un fichier .jsonl, JsonFileStore sinon."""
+    if is_checkpoint(path):
+        return CheckpointStore(path, **options)
+    return JsonFileStore(path)
+
+
+def _complete_lines(f):
+    """Lignes complètes du journal (une dernière ligne sans '\\n' est une écriture interrompue)."""
+    for line in f:
+        if line.endswith(b"\n"):
+            yield line
+
+
+def _truncate_partial_line(path):
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Recule jusqu'au dernier saut de ligne
+        position = size
+        while position > 0:
+            step = min(65536, position)
+            f.seek(position - step)
+            chunk = f.read(step)
+            cut = chunk.rfind(b"\n")
+            if cut != -1:
+                f.truncate(position - step + cut + 1)
+                return
+            position -= step
+        f.truncate(0)
+
+
+def scan_journal(path):
+    """
+    (ids ayant une entrée, ids seulement notés absents) d'un journal, lus dans les préfixes
+    des lignes sans décoder les entrées.
+    """
+    ids, absent = set(), set()
+    if not os.path.exists(path):
+        return ids, absent
+    with open(path, "rb") as f:
+        for line in _complete_lines(f):
+            match = ID_PREFIX_RE.match(line)
+            if match:
+                (absent if ABSENT_LINE_RE.match(line) else ids).add(match.group(1).decode("utf-8"))
+    return ids, absent - ids
+
+
+def scan_ids(path):
+    """Ids présents dans un journal (entrées et ids notés absents), sans décoder les entrées."""
+    ids, absent = scan_journal(path)
+    return ids | absent
+
+
+def scan_absent_ids(path):
+    """Ids notés absents du dictionnaire dans un journal, et sans entrée."""
+    return scan_journal(path)[1]
+
+
+def iter_checkpoint(path):
+    """Itère sur les couples (id, entrée) du journal, dans l'ordre d'écriture (sans les absents)."""
+    with open(path, "rb") as f:
+        for line in _complete_lines(f):
+            if ABSENT_LINE_RE.match(line):
+                continue
+            record = json.loads(line)
+            yield record["id"], record["entry"]
+
+
+def read_results(path):
+    """Résultats de génération {id: entrée}, depuis un journal .jsonl ou un JSON."""
+    if is_checkpoint(path):
+        return dict(iter_checkpoint(path))
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def iter_results(path, chunk_size=1 << 16):
+    """
+    Itère sur les couples (id, entrée) des résultats de génération sans charger tout le
+    fichier : une entrée décodée à la fois. Mêmes entrées, dans le même ordre, que
+    read_results(path).items().
+    """
+    if is_checkpoint(path):
+        return (decode_record(line) for _, line in iter_result_lines(path))
+    return iter_json_object(path, chunk_size)
+
+
+def _line_id(line):
+    """Id d'une ligne du journal, par son préfixe si possible."""
+    match = ID_PREFIX_RE.match(line)
+    if match:
+        return match.group(1).decode("utf-8")
+    return str(json.loads(line)["id"])
+
+
+def decode_record(line):
+    """Couple (id, entrée) d'une ligne du journal."""
+    record = json.loads(line)
+    return record["id"], record["entry"]
+
+
+def iter_result_lines(path):
+    """
+    Couples (id, ligne brute en bytes) d'un journal .jsonl, un par entrée et dans l'ordre de
+    iter_results ; l'id est lu dans le préfixe de la ligne, sous forme de chaîne. Le décodage
+    (decode_record) peut être fait ailleurs, par exemple dans un autre processus, ou évité.
+    Les lignes des ids notés absents sont ignorées.
+    """
+    # Première passe sur les seuls préfixes d'id : position de la première et de la dernière
+    # ligne de chaque id. Une entrée réécrite est rendue à la place de sa première ligne,
+    # avec le contenu de la dernière (comme dict(iter_checkpoint(path))).
+    first, last = {}, {}
+    with open(path, "rb") as f:
+        offset = 0
+        for line in _complete_lines(f):
+            if not ABSENT_LINE_RE.match(line):
+                id = _line_id(line)
+                first.setdefault(id, offset)
+                last[id] = offset
+            offset += len(line)
+    with open(path, "rb") as f, open(path, "rb") as latest:
+        offset = 0
+        for line in _complete_lines(f):
+            if ABSENT_LINE_RE.match(line):
+                offset += len(line)
+                continue
+            id = _line_id(line)
+            if first[id] == offset:
+                record_line = line
+                if last[id] != offset:
+                    latest.seek(last[id])
+                    record_line = latest.readline()
+                yield id, record_line
+            offset += len(line)
+
+
+def iter_json_object(path, chunk_size=1 << 16):
+    """
+    Itère sur les couples (clé, valeur) de l'objet JSON de premier niveau de path, en ne
+    gardant en mémoire qu'une fenêtre du texte et la valeur en cours. Les clés doivent être
+    uniques (c'est le cas des fichiers écrits par write_json).
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer, pos, eof = "", 0, False
+
+        def fill(minimum=1):
+            # Ajoute au moins minimum caractères (moins à la fin du fichier)
+            nonlocal buffer, pos, eof
+            if pos > chunk_size:
+                buffer, pos = buffer[pos:], 0
+            while not eof and len(buffer) - pos < minimum:
+                chunk = f.read(max(chunk_size, minimum))
+                eof = not chunk
+                buffer += chunk
+
+        def next_char():
+            # Premier caractère non blanc, sans le consommer ('' à la fin du fichier)
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return buffer[pos:pos + 1]
+                fill()
+
+        def expect(chars):
+            nonlocal pos
+            char = next_char()
+            if char not in chars or not char:
+                raise ValueError(f"JSON invalide dans {path} : '{char}' au lieu de {' ou '.join(chars)}")
+            pos += 1
+            return char
+
+        def value():
+            # Une valeur peut dépasser la fenêtre : on la relit avec deux fois plus de texte
+            nonlocal pos
+            next_char()
+            while True:
+                try:
+                    result, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    fill(2 * (len(buffer) - pos))
+                    continue
+                # Seuls les nombres ne sont pas délimités : coupé en fin de fenêtre, "1.5e3" se lirait "1"
+                if (not eof and isinstance(result, (int, float)) and not isinstance(result, bool)
+                        and (end == len(buffer) or buffer[end] not in NUMBER_DELIMITERS)):
+                    fill(len(buffer) - pos + 1)
+                    continue
+                pos = end
+                return result
+
+        expect("{")
+        if next_char() == "}":
+            return
+        while True:
+            key = value()
+            if not isinstance(key, str):
+                raise ValueError(f"JSON invalide dans {path} : clé {key!r}")
+            expect(":")
+            yield key, value()
+            if expect(",}") == "}":
+                return
+
+
+def write_json(data, path):
+    """Écrit data au format JSON historique (indenté), de façon atomique."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def compact(checkpoint_path, json_path):
+    """Produit le JSON courant (une entrée par id, la plus récente) à partir du journal."""
+    data = read_results(checkpoint_path)
+    write_json(data, json_path)
+    return len(data)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Compacte un journal de génération (.jsonl) en JSON")
+    parser.add_argument("checkpoint", help="Journal .jsonl")
+    parser.add_argument("output", help="Fichier JSON à produire")
+    args = parser.parse_args()
+    print(f"{compact(args.checkpoint, args.output)} entrées compactées dans {args.output}")
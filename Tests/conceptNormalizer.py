@@ -0,0 +1,184 @@
+import re
+from collections import Counter, OrderedDict
+
+# Articles retirés en tête de concept
+ARTICLE_RE = re.compile(r"^(LA |LE |LES |L'|UN |UNE |DES |DU |DE LA |DE L')")
+# Phrases qui trahissent une explication du modèle plutôt qu'un concept
+EXPLANATION_PHRASES = ("VOICI", "CONCEPTS LIÉS", "EST EXPLIQUÉ PAR", "SONT :", "PAR LA RELATION")
+EXPLANATION_RE = re.compile("|".join(map(re.escape, EXPLANATION_PHRASES)))
+LINK_WORDS = frozenset({"ET", "OU", "DONC", "MAIS", "CAR", "PUIS", "ALORS"})
+STOP_WORDS = frozenset({
+    "ET", "OU", "DONC", "MAIS", "CAR", "PUIS", "ALORS", "SI", "IL", "AU", "AUX", "DU", "DE", "DES", "EN", "UN", "UNE", "LE", "LA", "LES", "CE", "CET", "CETTE", "SON", "SA", "SES", "SUR", "PAR", "POUR", "AVEC", "SANS", "DANS", "SOUS", "VERS", "CHEZ", "FAUT"
+})
+# Hors lettres, seuls l'espace et le tiret sont admis dans un concept valide
+SEPARATORS_TABLE = str.maketrans("", "", " -")
+
+NOT_A_STRING = (None, "non_chaine")
+MAX_CONCEPT_LENGTH = 50
+MAX_EXPRESSION_LENGTH = 22  # concepts de plusieurs mots
+
+
+def clean_rule(concept):
+    """
+    Règles de nettoyage d'un concept brut : (concept normalisé, None) s'il est accepté,
+    (None, règle) sinon.
+    """
+    if not isinstance(concept, str):
+        return NOT_A_STRING
+    concept = ARTICLE_RE.sub("", concept.strip().upper(), count=1)
+    if EXPLANATION_RE.search(concept):
+        return None, "phrase_explicative"
+    if len(concept) > MAX_CONCEPT_LENGTH:
+        return None, "trop_long"
+    if not concept or "\n" in concept:
+        return None, "vide"
+    if "  " in concept:
+        return None, "double_espace"
+    if " " in concept and len(concept) > MAX_EXPRESSION_LENGTH:
+        return None, "expression_trop_longue"
+    if concept in LINK_WORDS:
+        return None, "mot_de_liaison"
+    return concept, None
+
+
+def validity_rule(concept):
+    """Règle qui exclut un concept nettoyé de l'ontologie, ou None s'il est valide."""
+    if concept in STOP_WORDS:
+        return "mot_vide"
+    if concept.startswith('"') or concept.endswith('"'):
+        return "guillemet"
+    if concept.startswith('(') or concept.endswith('(') or concept.endswith(')'):
+        return "parenthese"
+    letters = concept.translate(SEPARATORS_TABLE)
+    if letters and not letters.isalpha():
+        return "caractere_interdit"
+    # Ici, tous les caractères restants sont des lettres
+    if len(letters) < 2:
+        return "moins_de_deux_lettres"
+    return None
+
+
+class ConceptNormalizer:
+    """
+    Normalisation des concepts produits par le LLM (clean) et filtre des concepts admis dans
+    l'ontologie (is_valid). Les mêmes quelques milliers de chaînes reviennent des centaines
+    de milliers de fois : les résultats sont mémorisés dans des caches LRU bornés à
+    max_cached chaînes chacun.
+
+    Les rejets sont comptés par règle et par occurrence (clean_rejections,
+    validity_rejections), y compris quand le résultat vient du cache.
+    """
+
+    def __init__(self, max_cached=100000):
+        self.max_cached = max_cached
+        self._clean_cache = OrderedDict()
+        self._valid_cache = OrderedDict()
+        self.clean_rejections = Counter()
+        self.validity_rejections = Counter()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self._clean_cache.clear()
+        self._valid_cache.clear()
+        self.clean_rejections.clear()
+        self.validity_rejections.clear()
+        self.hits = self.misses = 0
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        if len(cache) > self.max_cached:
+            cache.popitem(last=False)
+
+    def clean(self, concept):
+        """Concept normalisé (majuscules, sans article), ou None s'il est rejeté."""
+        if not isinstance(concept, str):
+            self.clean_rejections[NOT_A_STRING[1]] += 1
+            return None
+        cached = self._clean_cache.get(concept)
+        if cached is None:
+            self.misses += 1
+            cached = clean_rule(concept)
+            self._remember(self._clean_cache, concept, cached)
+        else:
+            self.hits += 1
+            self._clean_cache.move_to_end(concept)
+        result, rule = cached
+        if rule is not None:
+            self.clean_rejections[rule] += 1
+        return result
+
+    def clean_many(self, concepts):
+        """Concepts normalisés d'une liste (ceux d'une relation), rejets exclus, dans l'ordre."""
+        cache = self._clean_cache
+        cache_get, touch = cache.get, cache.move_to_end
+        rejections = self.clean_rejections
+        cleaned = []
+        append = cleaned.append
+        hits = misses = 0
+        for concept in concepts:
+            if isinstance(concept, str):
+                cached = cache_get(concept)
+                if cached is None:
+                    misses += 1
+                    cached = clean_rule(concept)
+                    self._remember(cache, concept, cached)
+                else:
+                    hits += 1
+                    touch(concept)
+            else:
+                cached = NOT_A_STRING
+            result, rule = cached
+            if rule is None:
+                append(result)
+            else:
+                rejections[rule] += 1
+        self.hits += hits
+        self.misses += misses
+        return cleaned
+
+    def is_valid(self, concept):
+        """Vrai si le concept nettoyé peut figurer dans l'ontologie."""
+        rule = self._valid_cache.get(concept, False)
+        if rule is False:
+            self.misses += 1
+            rule = validity_rule(concept)
+            self._remember(self._valid_cache, concept, rule)
+        else:
+            self.hits += 1
+            self._valid_cache.move_to_end(concept)
+        if rule is not None:
+            self.validity_rejections[rule] += 1
+            return False
+        return True
+
+    def take_counts(self):
+        """
+        Compteurs (rejets, succès et échecs du cache) accumulés depuis le dernier appel, puis
+        remis à zéro sans vider les caches. Sert à remonter les compteurs d'un processus de
+        travail vers add_counts() du processus principal.
+        """
+        counts = (self.clean_rejections, self.validity_rejections, self.hits, self.misses)
+        self.clean_rejections = Counter()
+        self.validity_rejections = Counter()
+        self.hits = self.misses = 0
+        return counts
+
+    def add_counts(self, counts):
+        """Ajoute des compteurs renvoyés par take_counts()."""
+        clean_rejections, validity_rejections, hits, misses = counts
+        self.clean_rejections.update(clean_rejections)
+        self.validity_rejections.update(validity_rejections)
+        self.hits += hits
+        self.misses += misses
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "cached": len(self._clean_cache) + len(self._valid_cache),
+            "clean_rejections": dict(self.clean_rejections),
+            "validity_rejections": dict(self.validity_rejections),
+        }
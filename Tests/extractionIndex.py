@@ -0,0 +1,212 @@
+import hashlib
+import json
+import sqlite3
+from collections import Counter
+
+
+def content_hash(data):
+    """Empreinte d'un contenu d'entrée (bytes)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ExtractionIndex:
+    """
+    Index persistant (SQLite) de ce que chaque entrée des résultats de génération apporte à
+    l'extraction de l'ontologie : poids de ses concepts (bonus du mot principal compris) et
+    ses triplets, avec l'empreinte de son contenu. D'une extraction à la suivante, seules les
+    entrées ajoutées, modifiées ou disparues sont retraitées ; les totaux (fréquence des
+    concepts, nombre d'entrées qui donnent chaque triplet) sont mis à jour par différence.
+
+    Pour chaque concept, l'index retient aussi sa première apparition (position de l'entrée,
+    rang dans l'entrée) : concept_counts() rend les concepts dans l'ordre où une extraction
+    complète les aurait comptés, donc avec les mêmes égalités de fréquence.
+
+    rules_version identifie les règles qui calculent les contributions : s'il diffère de
+    celui de l'index, l'index est vidé et tout est retraité.
+
+    Utilisation : unchanged() ou put() pour chaque entrée, dans l'ordre du fichier, puis
+    commit(). Rien n'est écrit sur disque avant commit().
+    """
+
+    def __init__(self, path, rules_version=1):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS entries (
+                id TEXT PRIMARY KEY, position INTEGER NOT NULL, hash TEXT NOT NULL,
+                concepts TEXT NOT NULL, relations TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS occurrences (
+                concept TEXT NOT NULL, entry_id TEXT NOT NULL, rank INTEGER NOT NULL,
+                PRIMARY KEY (concept, entry_id)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS concepts (
+                concept TEXT PRIMARY KEY, count INTEGER NOT NULL, first_entry TEXT NOT NULL, first_rank INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS relations (
+                src TEXT NOT NULL, rel TEXT NOT NULL, dst TEXT NOT NULL, refs INTEGER NOT NULL,
+                PRIMARY KEY (src, rel, dst)) WITHOUT ROWID;
+        """)
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'rules_version'").fetchone()
+        if row is None or row[0] != str(rules_version):
+            for table in ("entries", "occurrences", "concepts", "relations"):
+                self._db.execute(f"DELETE FROM {table}")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('rules_version', ?)", (str(rules_version),))
+            self._db.commit()
+        # id -> [position, empreinte] ; concept -> [fréquence, id de la première entrée, rang]
+        self.entries = {id: [position, digest]
+                        for id, position, digest in self._db.execute("SELECT id, position, hash FROM entries")}
+        self.concepts = {concept: [count, first_entry, first_rank]
+                         for concept, count, first_entry, first_rank in self._db.execute("SELECT * FROM concepts")}
+        self._reset_pending()
+
+    def _reset_pending(self):
+        self._seen = set()
+        self._moved = []            # (position, id) des entrées inchangées qui ont changé de position
+        self._last_position = -1    # ancienne position de la dernière entrée connue rencontrée
+        self._reordered = False
+        self._counted = set()       # concepts dont la fréquence a changé
+        self._dirty = set()         # concepts dont la première entrée a été modifiée ou retirée
+        self._candidates = {}       # concept -> (position, rang, id) de sa première apparition ajoutée
+        self.added = self.changed = self.removed = 0
+
+    def _visit(self, id):
+        """Enregistre le passage de l'entrée id ; renvoie son ancien état ou None."""
+        self._seen.add(id)
+        known = self.entries.get(id)
+        if known is not None:
+            if known[0] < self._last_position:
+                self._reordered = True
+            self._last_position = known[0]
+        return known
+
+    def unchanged(self, id, position, digest):
+        """
+        Vrai si l'entrée id est déjà indexée avec cette empreinte (elle n'est alors pas à
+        retraiter) ; sinon, put() doit suivre.
+        """
+        known = self._visit(id)
+        if known is None or known[1] != digest:
+            return False
+        if known[0] != position:
+            known[0] = position
+            self._moved.append((position, id))
+        return True
+
+    def put(self, id, position, digest, concepts, relations):
+        """
+        Remplace la contribution de l'entrée id : concepts est un Counter (concept -> poids)
+        dans l'ordre où l'extraction les rencontre, relations un ensemble de triplets
+        (source, nom de relation, destination).
+        """
+        if id not in self._seen:
+            self._visit(id)
+        if id in self.entries:
+            self._retract(id)
+            self.changed += 1
+        else:
+            self.added += 1
+        self.entries[id] = [position, digest]
+        relations = list(relations)
+        self._db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                         (id, position, digest, json.dumps(list(concepts.items()), ensure_ascii=False),
+                          json.dumps(relations, ensure_ascii=False)))
+        self._db.executemany("INSERT INTO occurrences VALUES (?, ?, ?)",
+                             [(concept, id, rank) for rank, concept in enumerate(concepts)])
+        self._db.executemany("INSERT INTO relations VALUES (?, ?, ?, 1) ON CONFLICT DO UPDATE SET refs = refs + 1",
+                             relations)
+        for rank, (concept, weight) in enumerate(concepts.items()):
+            state = self.concepts.get(concept)
+            if state is None:
+                self.concepts[concept] = [weight, id, rank]
+            else:
+                state[0] += weight
+            candidate = self._candidates.get(concept)
+            if candidate is None or (position, rank) < candidate[:2]:
+                self._candidates[concept] = (position, rank, id)
+
+    def _retract(self, id):
+        """Retire la contribution enregistrée de l'entrée id des totaux."""
+        concepts, relations = self._db.execute("SELECT concepts, relations FROM entries WHERE id = ?", (id,)).fetchone()
+        concepts = json.loads(concepts)
+        for concept, weight in concepts:
+            state = self.concepts[concept]
+            state[0] -= weight
+            self._counted.add(concept)
+            if state[1] == id:
+                self._dirty.add(concept)
+        self._db.executemany("UPDATE relations SET refs = refs - 1 WHERE src = ? AND rel = ? AND dst = ?",
+                             json.loads(relations))
+        self._db.executemany("DELETE FROM occurrences WHERE concept = ? AND entry_id = ?",
+                             [(concept, id) for concept, _ in concepts])
+
+    def _first_occurrence(self, concept):
+        return self._db.execute("""
+            SELECT o.entry_id, o.rank FROM occurrences o JOIN entries e ON e.id = o.entry_id
+            WHERE o.concept = ? ORDER BY e.position, o.rank LIMIT 1""", (concept,)).fetchone()
+
+    def commit(self):
+        """
+        Retire les entrées absentes de ce passage, met à jour la première apparition des
+        concepts touchés et écrit le tout en une transaction. Renvoie le bilan
+        {ajoutées, modifiées, retirées, inchangées}.
+        """
+        for id in [id for id in self.entries if id not in self._seen]:
+            self._retract(id)
+            del self.entries[id]
+            self._db.execute("DELETE FROM entries WHERE id = ?", (id,))
+            self.removed += 1
+        self._db.executemany("UPDATE entries SET position = ? WHERE id = ?", self._moved)
+        self._db.execute("DELETE FROM relations WHERE refs <= 0")
+
+        touched = self._counted | set(self._candidates)
+        vanished = [concept for concept in touched if self.concepts[concept][0] <= 0]
+        for concept in vanished:
+            del self.concepts[concept]
+        if self._reordered:
+            # L'ordre relatif des entrées a changé : premières apparitions recalculées en un passage
+            firsts = {}
+            for entry_id, concepts in self._db.execute("SELECT id, concepts FROM entries ORDER BY position"):
+                for rank, (concept, _) in enumerate(json.loads(concepts)):
+                    if concept not in firsts:
+                        firsts[concept] = (entry_id, rank)
+            touched = set(self.concepts)
+            for concept, (entry_id, rank) in firsts.items():
+                self.concepts[concept][1:] = [entry_id, rank]
+        else:
+            for concept in self._dirty:
+                if concept in self.concepts:
+                    self.concepts[concept][1:] = self._first_occurrence(concept)
+            for concept, (position, rank, id) in self._candidates.items():
+                state = self.concepts.get(concept)
+                if state is not None and concept not in self._dirty and \
+                        (position, rank) < (self.entries[state[1]][0], state[2]):
+                    state[1:] = [id, rank]
+
+        self._db.executemany("DELETE FROM concepts WHERE concept = ?", [(concept,) for concept in vanished])
+        self._db.executemany("INSERT OR REPLACE INTO concepts VALUES (?, ?, ?, ?)",
+                             [(concept, *self.concepts[concept]) for concept in touched if concept in self.concepts])
+        self._db.commit()
+        summary = {"ajoutées": self.added, "modifiées": self.changed, "retirées": self.removed,
+                   "inchangées": len(self.entries) - self.added - self.changed}
+        self._reset_pending()
+        return summary
+
+    def concept_counts(self):
+        """Counter concept -> fréquence, dans l'ordre de première apparition (comme une extraction complète)."""
+        entries = self.entries
+        ordered = sorted(self.concepts.items(), key=lambda item: (entries[item[1][1]][0], item[1][2]))
+        return Counter({concept: state[0] for concept, state in ordered})
+
+    def relations(self):
+        """Triplets (source, nom de relation, destination) donnés par au moins une entrée."""
+        return self._db.execute("SELECT src, rel, dst FROM relations")
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,319 @@
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+DICTIONARY_PATH = "/api/dictionnaire.php"
+OLLAMA_PATH = "/api/chat"
+OPENAI_PATH = "/v1/chat/completions"
+
+CONCEPTS = [
+    "LIBERTE", "VERITE", "JUSTICE", "RAISON", "CONSCIENCE", "DESIR", "BONHEUR", "DEVOIR",
+    "MORALE", "POLITIQUE", "ETAT", "LOI", "NATURE", "CULTURE", "ART", "TECHNIQUE", "TRAVAIL",
+    "LANGAGE", "SCIENCE", "RELIGION", "TEMPS", "EXISTENCE", "SUJET", "AUTRUI", "PERCEPTION",
+    "INCONSCIENT", "HISTOIRE", "MATIERE", "ESPRIT", "VIVANT", "DEMONSTRATION", "INTERPRETATION",
+    "EXPERIENCE", "CONNAISSANCE", "OPINION", "CROYANCE", "VOLONTE", "PASSION", "VERTU", "SAGESSE",
+]
+# Relations d'un prompt groupé : lignes "- RELATION : explication"
+BATCH_RELATION_RE = re.compile(r"^- ([A-Z_]+) :", re.MULTILINE)
+
+
+def parse_latency(spec):
+    """
+    Loi de latence (en secondes) décrite par une chaîne :
+    "0.2" (fixe), "uniform:0.1:0.5", "exp:0.3" (exponentielle de moyenne 0.3),
+    "lognormal:0.3:0.5" (médiane 0.3, sigma 0.5). Renvoie une fonction rng -> latence.
+    """
+    kind, _, params = str(spec).partition(":")
+    values = [float(v) for v in params.split(":")] if params else []
+    if not params:
+        fixed = float(kind)
+        return lambda rng: fixed
+    if kind == "uniform":
+        low, high = values
+        return lambda rng: rng.uniform(low, high)
+    if kind == "exp":
+        mean, = values
+        return lambda rng: rng.expovariate(1 / mean) if mean else 0.0
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"Loi de latence inconnue : {spec}")
+
+
+class RouteBehaviour:
+    """
+    Comportement simulé d'une route : latence tirée de la loi latency (voir parse_latency),
+    plus output_tokens / token_rate pour les routes LLM ; une fraction error_rate des
+    requêtes échoue avec un statut tiré de error_statuses ; au-delà de capacity requêtes
+    simultanées, la route répond 429 (backend saturé). Les tirages sont reproductibles (seed).
+    """
+
+    def __init__(self, latency="0", error_rate=0.0, error_statuses=(429, 500, 503), capacity=None,
+                 token_rate=None, seed=0):
+        self.sample_latency = parse_latency(latency)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.capacity = capacity
+        self.token_rate = token_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+
+    def enter(self):
+        """
+        Début d'une requête : renvoie (admise, statut d'erreur ou None, latence de base).
+        Une requête admise doit être suivie de leave().
+        """
+        with self._lock:
+            self.requests += 1
+            if self.capacity is not None and self.in_flight >= self.capacity:
+                self.rejected += 1
+                return False, 429, 0.0
+            self.in_flight += 1
+            if self._rng.random() < self.error_rate:
+                self.errors += 1
+                return True, self._rng.choice(self.error_statuses), self.sample_latency(self._rng)
+            return True, None, self.sample_latency(self._rng)
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"latency": self.latency, "requests": self.requests, "errors": self.errors,
+                    "rejected": self.rejected}
+
+
+def _concepts(seed_text, count=None):
+    rng = random.Random(hashlib.sha256(seed_text.encode("utf-8")).digest())
+    return rng.sample(CONCEPTS, count or rng.randint(5, 10))
+
+
+def fake_completion(messages, json_mode):
+    """
+    Réponse plausible et déterministe à une requête de concepts : liste séparée par des
+    virgules, ou objet JSON {relation: [concepts]} pour les relations d'un prompt groupé.
+    """
+    prompt = messages[-1]["content"] if messages else ""
+    if not json_mode:
+        return ", ".join(_concepts(prompt))
+    relations = BATCH_RELATION_RE.findall(prompt) or ["CONCEPTS"]
+    return json.dumps({relation: _concepts(prompt + relation) for relation in relations}, ensure_ascii=False)
+
+
+def count_tokens(text):
+    """Approximation du nombre de tokens (environ 4 caractères par token)."""
+    return max(1, len(text) // 4)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, comme les vrais serveurs
+    # En-têtes et corps partent en deux écritures : sans TCP_NODELAY, l'ACK retardé du client
+    # ajoute ~40 ms à chaque réponse
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=()):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _serve(self, behaviour, respond):
+        admitted, status, latency = behaviour.enter()
+        if not admitted:
+            # Rejet immédiat, sans occuper de place
+            self._send_json(429, {"error": "backend saturé"}, [("Retry-After", "0")])
+            return
+        try:
+            if status is not None:
+                time.sleep(latency)
+                self._send_json(status, {"error": f"erreur simulée {status}"}, [("Retry-After", "0")])
+                return
+            payload, output_tokens = respond()
+            if behaviour.token_rate:
+                latency += output_tokens / behaviour.token_rate
+            time.sleep(latency)
+            self._send_json(200, payload(latency) if callable(payload) else payload)
+        finally:
+            behaviour.leave()
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != DICTIONARY_PATH:
+            self._send_json(404, {"error": "route inconnue"})
+            return
+        id = parse_qs(url.query).get("id", [""])[0]
+        self._serve(self.server.dictionary, lambda: (self.server.dictionary_entry(id), 0))
+
+    def do_POST(self):
+        # Corps lu avant toute réponse, même d'erreur : la connexion reste utilisable
+        request = self._read_json()
+        path = urlsplit(self.path).path
+        if path == OLLAMA_PATH:
+            self._serve(self.server.ollama, lambda: self._ollama_response(request))
+        elif path == OPENAI_PATH:
+            self._serve(self.server.openai, lambda: self._openai_response(request))
+        else:
+            self._send_json(404, {"error": "route inconnue"})
+
+    def _ollama_response(self, request):
+        messages = request.get("messages", [])
+        content = fake_completion(messages, request.get("format") == "json")
+        prompt_tokens = sum(count_tokens(m.get("content", "")) for m in messages)
+        output_tokens = count_tokens(content)
+
+        def payload(latency):
+            return {
+                "model": request.get("model"),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "message": {"role": "assistant", "content": content},
+                "done": True,
+                "total_duration": int(latency * 1e9),
+                "prompt_eval_count": prompt_tokens,
+                "eval_count": output_tokens,
+            }
+        return payload, output_tokens
+
+    def _openai_response(self, request):
+        messages = request.get("messages", [])
+        json_mode = (request.get("response_format") or {}).get("type") == "json_object"
+        content = fake_completion(messages, json_mode)
+        prompt_tokens = sum(count_tokens(m.get("content", "")) for m in messages)
+        output_tokens = count_tokens(content)
+        payload = {
+            "id": "chatcmpl-" + hashlib.sha1(content.encode("utf-8")).hexdigest()[:12],
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": output_tokens,
+                      "total_tokens": prompt_tokens + output_tokens},
+        }
+        return payload, output_tokens
+
+
+class FakeBackends:
+    """
+    Serveurs locaux imitant les services de la génération, pour mesurer le pipeline hors
+    ligne : l'API du dictionnaire (réponses success/mot/defmot), /api/chat d'Ollama et
+    /v1/chat/completions d'une API compatible OpenAI. Chaque route a son RouteBehaviour
+    (latence, erreurs, capacité). Le serveur tourne dans un thread (un thread par connexion) ;
+    utilisable comme gestionnaire de contexte.
+
+    missing_rate : fraction des ids sans mot (success: false), tirés de façon reproductible.
+    definition_words : longueur des définitions servies.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, dictionary=None, ollama=None, openai=None,
+                 missing_rate=0.0, definition_words=40):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.request_queue_size = 256
+        self.httpd.dictionary = dictionary or RouteBehaviour()
+        self.httpd.ollama = ollama or RouteBehaviour()
+        self.httpd.openai = openai or RouteBehaviour()
+        self.httpd.dictionary_entry = self.dictionary_entry
+        self.missing_rate = missing_rate
+        self.definition_words = definition_words
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def dictionary_url(self):
+        """URL à laquelle on ajoute l'id, comme API_URL."""
+        return f"{self.base_url}{DICTIONARY_PATH}?id="
+
+    @property
+    def ollama_url(self):
+        return self.base_url + OLLAMA_PATH
+
+    @property
+    def openai_url(self):
+        """base_url du client OpenAI."""
+        return self.base_url + "/v1/"
+
+    def dictionary_entry(self, id):
+        try:
+            number = int(id)
+        except ValueError:
+            return {"success": False}
+        rng = random.Random(number)
+        if rng.random() < self.missing_rate:
+            return {"success": False}
+        words = [rng.choice(CONCEPTS).lower() for _ in range(self.definition_words)]
+        return {"success": True, "mot": f"mot{number}", "defmot": " ".join(words).capitalize() + "."}
+
+    def stats(self):
+        return {"dictionary": self.httpd.dictionary.stats(), "ollama": self.httpd.ollama.stats(),
+                "openai": self.httpd.openai.stats()}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Serveurs factices (dictionnaire, Ollama, OpenAI) pour tester la génération hors ligne")
+    parser.add_argument("--port", type=int, default=8765, help="Port d'écoute (défaut: 8765)")
+    parser.add_argument("--dict-latency", type=str, default="0.02", help="Loi de latence du dictionnaire (défaut: 0.02)")
+    parser.add_argument("--llm-latency", type=str, default="lognormal:0.5:0.4", help="Loi de latence des LLM (défaut: lognormal:0.5:0.4)")
+    parser.add_argument("--token-rate", type=float, default=None, help="Tokens de sortie par seconde ajoutés à la latence LLM (défaut: aucun)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction des requêtes LLM en erreur (défaut: 0)")
+    parser.add_argument("--capacity", type=int, default=None, help="Requêtes LLM simultanées au-delà desquelles la réponse est 429")
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="Fraction des ids sans mot dans le dictionnaire (défaut: 0)")
+    args = parser.parse_args()
+
+    def llm_route(seed):
+        return RouteBehaviour(args.llm_latency, args.error_rate, capacity=args.capacity, token_rate=args.token_rate,
+                              seed=seed)
+
+    backends = FakeBackends(port=args.port, dictionary=RouteBehaviour(args.dict_latency), ollama=llm_route(1),
+                            openai=llm_route(2), missing_rate=args.missing_rate)
+    print(f"Dictionnaire : --api-url {backends.dictionary_url}")
+    print(f"Ollama       : --ollama-url {backends.ollama_url}")
+    print(f"OpenAI       : OPENAI_BASE_URL={backends.openai_url}")
+    try:
+        backends.httpd.serve_forever()
+    except KeyboardInterrupt:
+        backends.httpd.server_close()
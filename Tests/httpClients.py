@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+import concurrent.futures
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connexion, lecture) en secondes
+DICTIONARY_TIMEOUT = (5, 30)
+OLLAMA_TIMEOUT = (5, 120)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def make_session(pool_size=32, retries=3, backoff=0.5, retry_statuses=RETRY_STATUSES):
+    """
+    Session HTTP partagée : connexions persistantes (keep-alive) réutilisées par tous les
+    threads, jusqu'à pool_size par hôte, et jusqu'à retries nouvelles tentatives avec attente
+    exponentielle (backoff, 2 * backoff, ...) sur les erreurs de connexion et les statuts
+    retry_statuses (en respectant Retry-After).
+    Pour un backend LLM, passer retry_statuses=() : les surcharges (429, 5xx) doivent
+    remonter au limiteur adaptatif, qui gère seul les nouvelles tentatives, au lieu d'être
+    rejouées ici en gardant une place de concurrence.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=retry_statuses,
+        # Sinon urllib3 rejoue aussi tout 429/503 porteur d'un Retry-After
+        respect_retry_after_header=bool(retry_statuses),
+        allowed_methods=None,  # POST compris : les appels au LLM peuvent être rejoués
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class DictionaryClient:
+    """
+    Client de l'API du dictionnaire (une entrée par id), avec un cache local optionnel
+    (fichier JSONL, une ligne {"id": ..., "data": réponse} par id). Les réponses sont mises en
+    cache, y compris les ids sans mot ; les erreurs réseau ne le sont pas, pour être
+    retentées au prochain passage. Chaque réponse est ajoutée au fichier dès qu'elle arrive :
+    un arrêt brutal ne perd au plus que la ligne en cours d'écriture, ignorée au chargement.
+    """
+
+    def __init__(self, base_url, session=None, timeout=DICTIONARY_TIMEOUT, cache_file=None):
+        self.base_url = base_url
+        self.session = session or make_session()
+        self.timeout = timeout
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._file = None
+        self.cache = {}
+        if cache_file and os.path.exists(cache_file):
+            self.cache = self._load_cache(cache_file)
+
+    @staticmethod
+    def _load_cache(path):
+        cache = {}
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # ligne tronquée par un arrêt brutal
+                cache[record["id"]] = record["data"]
+        return cache
+
+    def entry(self, id):
+        """Réponse JSON de l'API pour un id (depuis le cache si possible)."""
+        key = str(id)
+        data = self.cache.get(key)
+        if data is None:
+            response = self.session.get(self.base_url + key, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+            with self._lock:
+                self.cache[key] = data
+                self._append(key, data)
+        return data
+
+    def _append(self, key, data):
+        if not self.cache_file:
+            return
+        if self._file is None:
+            self._file = open(self.cache_file, "ab+")
+            # Une dernière ligne sans saut de ligne (arrêt brutal) ne doit pas absorber la suivante
+            size = self._file.seek(0, os.SEEK_END)
+            if size > 0:
+                self._file.seek(size - 1)
+                if self._file.read(1) != b"\n":
+                    self._file.write(b"\n")
+        self._file.write(json.dumps({"id": key, "data": data}, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._file.flush()
+
+    def mot_def(self, id):
+        """(mot, définition) pour un id, ou (None, None) si l'API ne connaît pas l'id."""
+        data = self.entry(id)
+        if data.get('success'):
+            return data['mot'], data['defmot']
+        return None, None
+
+    def is_unknown(self, id):
+        """Vrai si l'API a répondu que l'id n'a pas de mot (une erreur réseau ne compte pas)."""
+        data = self.cache.get(str(id))
+        return data is not None and not data.get('success')
+
+    def prefetch(self, ids, workers=8):
+        """
+        Charge dans le cache toutes les entrées de ids absentes du cache, en parallèle.
+        Renvoie (nombre d'entrées récupérées, liste des ids en échec).
+        """
+        missing = [id for id in ids if str(id) not in self.cache]
+        failed = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.entry, id): id for id in missing}
+            for future in concurrent.futures.as_completed(futures):
+                if future.exception() is not None:
+                    failed.append(futures[future])
+        return len(missing) - len(failed), sorted(failed)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class OllamaClient:
+    """Client de l'API /api/chat d'Ollama sur une session partagée."""
+
+    def __init__(self, url, session=None, timeout=OLLAMA_TIMEOUT):
+        self.url = url
+        self.session = session or make_session()
+        self.timeout = timeout
+
+    def complete(self, model, messages, format=None):
+        """
+        Renvoie (texte, usage) pour la réponse (non streamée) du modèle, avec l'usage annoncé
+        par Ollama : input_tokens (prompt_eval_count), output_tokens (eval_count) et
+        backend_seconds (total_duration).
+        format="json" contraint le modèle à répondre par un objet JSON.
+        """
+        payload = {"model": model, "messages": messages, "stream": False}
+        if format:
+            payload["format"] = format
+        response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        usage = {
+            "input_tokens": data.get("prompt_eval_count", 0),
+            "output_tokens": data.get("eval_count", 0),
+            "backend_seconds": data.get("total_duration", 0) / 1e9,
+        }
+        # Ollama renvoie 'message' ou 'messages'
+        if "message" in data:
+            return data["message"]["content"].strip(), usage
+        if "messages" in data and data["messages"]:
+            return data["messages"][-1]["content"].strip(), usage
+        return "", usage
@@ -0,0 +1,100 @@
+import json
+import time
+
+
+# Colonnes des statistiques par règle, dans l'ordre des listes remplies par RulePlanner.evaluate
+STAT_FIELDS = ("seconds", "candidates", "derived", "duplicates")
+
+
+def new_rule_stats():
+    """Compteurs d'une règle : [durée (s), candidats examinés, faits dérivés, doublons]."""
+    return [0.0, 0, 0, 0]
+
+
+def merge_rule_stats(total, partial):
+    """Ajoute les statistiques par règle de partial à total (dictionnaires nom -> compteurs)."""
+    for name, values in partial.items():
+        current = total.get(name)
+        if current is None:
+            current = total[name] = new_rule_stats()
+        for i, value in enumerate(values):
+            current[i] += value
+    return total
+
+
+class InferenceProfiler:
+    """
+    Collecte les statistiques d'une inférence, par itération et par règle :
+    durée, candidats de jointure examinés, faits dérivés et doublons (faits déjà connus ou
+    déjà dérivés dans la même itération).
+
+    Passé à LogicalInferenceEngine(profiler=...). Sans profileur, le moteur garde ses
+    boucles sans aucun compteur. Chaque itération terminée est transmise aux sinks : des
+    fonctions appelées avec le dictionnaire de l'itération (voir iteration_record).
+    """
+
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+        self.iterations = []
+        self.metadata = {}
+        self._current = None
+        self._start = None
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def start_iteration(self, number):
+        self._current = {"iteration": number, "rules": {}}
+        self._start = time.perf_counter()
+
+    def record_rules(self, stats):
+        """Ajoute des statistiques par règle (nom -> compteurs) à l'itération en cours."""
+        if self._current is None:
+            self.start_iteration(len(self.iterations) + 1)
+        merge_rule_stats(self._current["rules"], stats)
+
+    def end_iteration(self, new_relations):
+        record = self.iteration_record(self._current, time.perf_counter() - self._start, new_relations)
+        self.iterations.append(record)
+        self._current = None
+        for sink in self.sinks:
+            sink(record)
+        return record
+
+    @staticmethod
+    def iteration_record(current, seconds, new_relations):
+        return {
+            "iteration": current["iteration"],
+            "seconds": seconds,
+            "new_relations": new_relations,
+            "rules": {name: dict(zip(STAT_FIELDS, values)) for name, values in current["rules"].items()},
+        }
+
+    def totals(self):
+        """Statistiques cumulées par règle sur toutes les itérations."""
+        totals = {}
+        for record in self.iterations:
+            for name, stats in record["rules"].items():
+                merge_rule_stats(totals, {name: [stats[field] for field in STAT_FIELDS]})
+        return {name: dict(zip(STAT_FIELDS, values)) for name, values in totals.items()}
+
+    def report(self):
+        return {
+            **self.metadata,
+            "total_seconds": sum(record["seconds"] for record in self.iterations),
+            "iterations": self.iterations,
+            "rules": self.totals(),
+        }
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+
+def print_sink(record):
+    """Sink d'exemple : affiche le résumé d'une itération, règles les plus coûteuses en tête."""
+    print(f"[profil] itération {record['iteration']}: {record['seconds']:.3f} s, "
+          f"{record['new_relations']} nouvelles relations")
+    for name, stats in sorted(record["rules"].items(), key=lambda item: -item[1]["seconds"]):
+        print(f"  {name}: {stats['seconds'] * 1000:.1f} ms, {stats['candidates']} candidats, "
+              f"{stats['derived']} dérivées, {stats['duplicates']} doublons")
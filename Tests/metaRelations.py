@@ -3,308 +3,413 @@ from collections import defaultdict, Counter
 import itertools
 import sys
 import os
+import time
 import importlib.util
 
-# Importer le module ontologie_generee
-spec = importlib.util.spec_from_file_location("ontologie_generee", os.path.join(os.path.dirname(__file__), "ontologie_generee.py"))
-ontologie_generee = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(ontologie_generee)
+from tripleStore import CompactTripleStore
+from transitiveClosure import TransitiveClosure
+from ruleTable import RulePlanner, parse_rules, load_rules
+from backwardChaining import BackwardChainer
+from ontologySnapshot import load_relations, write_snapshot
+from ontologyStore import OntologyStore
+from inferenceProfiler import InferenceProfiler
+# UTILISER la TypeRelation du générateur au lieu de la redéfinir ! (même enum que celle écrite
+# dans ontologie_generee.py, mais importable normalement, donc sérialisable entre processus)
+from CoreGenerateur import TypeRelation
 
-# UTILISER la TypeRelation du module original au lieu de la redéfinir !
-TypeRelation = ontologie_generee.TypeRelation
-CORE_RELATIONS = ontologie_generee.CORE_RELATIONS
+ONTOLOGY_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_FILE = os.path.join(ONTOLOGY_DIR, "ontologie_generee.opfsnap")
+STORE_FILE = os.path.join(ONTOLOGY_DIR, "ontologie_generee.sqlite")
+PYTHON_FILE = os.path.join(ONTOLOGY_DIR, "ontologie_generee.py")
+
+# Relations déjà chargées dans ce processus, par (chemin absolu, section)
+_loaded_relations = {}
+
+def default_ontology_path():
+    """
+    Ontologie chargée par défaut : l'instantané binaire, sinon la base SQLite, à condition
+    qu'ils ne soient pas plus anciens que ontologie_generee.py (tous trois sont écrits
+    ensemble par CoreGenerateur ; un .py régénéré ou modifié seul rend les autres périmés).
+    Sinon, l'export Python.
+    """
+    source_mtime = os.stat(PYTHON_FILE).st_mtime_ns if os.path.exists(PYTHON_FILE) else None
+    for path in (SNAPSHOT_FILE, STORE_FILE):
+        if os.path.exists(path) and (source_mtime is None or os.stat(path).st_mtime_ns >= source_mtime):
+            return path
+    return PYTHON_FILE
+
+def get_core_relations(path=None, section="CORE_RELATIONS"):
+    """
+    Charge les relations d'une ontologie au premier appel, puis les sert depuis le cache du
+    processus. Rien n'est lu à l'import du module.
+    path: instantané binaire (.opfsnap), base SQLite (.sqlite) ou export Python (.py) ; par
+    défaut ontologie_generee.opfsnap, .sqlite ou .py à côté de ce fichier, selon
+    default_ontology_path().
+    section: liste à lire (CORE_RELATIONS, ou CORE_RELATIONS_ORIGINAL / DERIVED_RELATIONS
+    pour une ontologie enrichie ; une base SQLite n'a que CORE_RELATIONS).
+    """
+    if path is None:
+        path = default_ontology_path()
+    key = (os.path.abspath(path), section)
+    relations = _loaded_relations.get(key)
+    if relations is None:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Ontologie introuvable : {path} (lancer CoreGenerateur.py pour la générer)")
+        if path.endswith(".py"):
+            # Export Python historique : exécuté, puis ramené à notre TypeRelation par nom
+            spec = importlib.util.spec_from_file_location("ontologie_generee", path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            relations = [(src, TypeRelation[rel.name], dst) for src, rel, dst in getattr(module, section)]
+        elif path.endswith(".sqlite"):
+            if section != "CORE_RELATIONS":
+                raise KeyError(f"Section absente de la base d'ontologie : {section}")
+            with OntologyStore(path, TypeRelation) as store:
+                relations = list(store.triples())
+        else:
+            # Instantané binaire : lu par mmap, sans compiler ni exécuter de module Python
+            relations = load_relations(path, TypeRelation, section)
+        _loaded_relations[key] = relations
+    return relations
+
+def core_relation(rel):
+    """
+    Membre de notre TypeRelation pour rel. Les membres d'une autre copie de l'enum
+    (ontologie_generee.TypeRelation, par exemple) sont ramenés au nôtre par leur nom : sans
+    cela, leurs triplets ne correspondraient à aucune règle.
+    """
+    if rel.__class__ is TypeRelation:
+        return rel
+    relation = TypeRelation.__members__.get(getattr(rel, "name", None))
+    if relation is None:
+        raise ValueError(f"Type de relation inconnu : {rel!r}")
+    return relation
+
+def as_core_triples(relations):
+    """Triplets de relations dont le type est ramené à notre TypeRelation (voir core_relation)."""
+    for triple in relations:
+        if triple[1].__class__ is not TypeRelation:
+            triple = (triple[0], core_relation(triple[1]), triple[2])
+        yield triple
+
+def __getattr__(name):
+    """Compatibilité : metaRelations.CORE_RELATIONS charge l'ontologie par défaut à la demande."""
+    if name == "CORE_RELATIONS":
+        return get_core_relations()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Table des règles d'inférence par défaut (voir ruleTable.parse_rules pour la syntaxe).
+# Une table propre au projet peut être chargée avec load_rules(chemin, TypeRelation).
+DEFAULT_RULES = """
+# Transitivité
+IMPLIQUE transitif : IMPLIQUE(a, b), IMPLIQUE(b, c) => IMPLIQUE(a, c) [a != c]
+EST_UN transitif : EST_UN(a, b), EST_UN(b, c) => EST_UN(a, c) [a != c]
+FAIT_PARTIE_DE transitif : FAIT_PARTIE_DE(a, b), FAIT_PARTIE_DE(b, c) => FAIT_PARTIE_DE(a, c) [a != c]
+PRECEDE transitif : PRECEDE(a, b), PRECEDE(b, c) => PRECEDE(a, c) [a != c]
+CAUSE transitif : CAUSE(a, b), CAUSE(b, c) => CAUSE(a, c) [a != c]
+
+# Équivalence
+EST_EQUIVALENT symétrique : EST_EQUIVALENT(a, b) => EST_EQUIVALENT(b, a)
+EST_EQUIVALENT transitif : EST_EQUIVALENT(a, b), EST_EQUIVALENT(b, c) => EST_EQUIVALENT(a, c) [a != c]
+IDENTIQUE_A symétrique : IDENTIQUE_A(a, b) => IDENTIQUE_A(b, a)
+
+# Opposition
+S_OPPOSE_A symétrique : S_OPPOSE_A(a, b) => S_OPPOSE_A(b, a)
+CONTREDIT symétrique : CONTREDIT(a, b) => CONTREDIT(b, a)
+
+# Causalité
+CAUSE → PERMET : CAUSE(a, b) => PERMET(a, b)
+NECESSITE → DEPEND_DE : NECESSITE(a, b) => DEPEND_DE(a, b)
+EMPECHE → S_OPPOSE_A : EMPECHE(a, b) => S_OPPOSE_A(a, b)
+
+# Hiérarchie
+Héritage EST_UN → A_COMME_PROPRIETE : EST_UN(a, b), A_COMME_PROPRIETE(b, p) => A_COMME_PROPRIETE(a, p)
+Héritage INSTANCE_DE → A_COMME_PROPRIETE : INSTANCE_DE(a, b), A_COMME_PROPRIETE(b, p) => A_COMME_PROPRIETE(a, p)
+FAIT_PARTIE_DE → DEPEND_DE : FAIT_PARTIE_DE(a, b) => DEPEND_DE(a, b)
+
+# Complémentarité
+COMPLEMENTE symétrique : COMPLEMENTE(a, b) => COMPLEMENTE(b, a)
+EST_ANALOGUE_A symétrique : EST_ANALOGUE_A(a, b) => EST_ANALOGUE_A(b, a)
+"""
 
 class LogicalInferenceEngine:
     
-    def __init__(self, relations):
+    # Relations dont la clôture transitive peut être calculée en une passe (apply_transitive_closure)
+    TRANSITIVE_RELATIONS = [
+        TypeRelation.IMPLIQUE, TypeRelation.EST_UN, TypeRelation.FAIT_PARTIE_DE,
+        TypeRelation.PRECEDE, TypeRelation.CAUSE,
+    ]
+    
+    def __init__(self, relations, compact=False, rules=None, query_cache_size=10000, profiler=None):
         """
         Initialise le moteur d'inférence avec une liste de relations.
         relations: liste de tuples (source, TypeRelation, destination)
+        compact: si True, les relations sont stockées dans un CompactTripleStore (concepts
+        internés, adjacence CSR) ; relations et relation_graph deviennent des vues en lecture.
+        Environ 10 fois moins de mémoire, pour des inférences environ 2 fois plus lentes
+        (benchInference.py --bench memory).
+        rules: liste de ruleTable.Rule (par défaut, DEFAULT_RULES)
+        query_cache_size: nombre maximal de sous-buts mémorisés par query()/holds()
+        profiler: inferenceProfiler.InferenceProfiler qui reçoit les statistiques par règle et
+        par itération (None : aucune instrumentation)
+        Les relations d'une autre copie de TypeRelation sont ramenées à celle-ci par leur nom
+        (ValueError pour un nom inconnu), ici comme dans add_relations, remove_relations,
+        relation_exists, query et holds.
         """
+        relations = as_core_triples(relations)
+        self.rules = rules if rules is not None else parse_rules(DEFAULT_RULES, TypeRelation)
+        # Plans de jointure compilés, selon que la clôture transitive est utilisée ou non
+        self._planners = {}
+        # Durée (en secondes) de chaque itération du dernier appel à apply_all_rules
+        self.iteration_times = []
+        # Clôtures transitives déjà calculées, par type de relation (invalidées à chaque modification)
+        self._closures = {}
+        # Chaînage arrière pour query()/holds(), créé au premier appel
+        self._chainer = None
+        self.query_cache_size = query_cache_size
+        self.profiler = profiler
+        if compact:
+            self.store = CompactTripleStore(relations)
+            self.relations = self.store.triples_view()
+            self.relation_graph = self.store.graph_view()
+            self.reverse_graph = self.store.graph_view(reverse=True)
+            return
+        self.store = None
         self.relations = set(relations)
         self.relation_graph = defaultdict(lambda: defaultdict(set))
+        # Graphe inverse (destination -> relation -> sources), utilisé par l'évaluation semi-naïve
+        self.reverse_graph = defaultdict(lambda: defaultdict(set))
         self.build_graph()
     
+    @classmethod
+    def from_store(cls, path, **options):
+        """
+        Crée le moteur depuis une base d'ontologie SQLite (ontologyStore) : les relations sont
+        lues par lots et passées directement au moteur, sans liste intermédiaire.
+        options: mêmes paramètres nommés que le constructeur (compact, rules, ...).
+        """
+        with OntologyStore(path, TypeRelation) as store:
+            return cls(store.triples(), **options)
+    
     def build_graph(self):
         """Construit un graphe des relations pour faciliter les recherches."""
+        if self.store is not None:
+            self.store.compact()
+            return
         self.relation_graph.clear()
+        self.reverse_graph.clear()
         
         for src, rel, dst in self.relations:
             self.relation_graph[src][rel].add(dst)
+            self.reverse_graph[dst][rel].add(src)
+    
+    def add_relations(self, relations):
+        """
+        Ajoute un lot de relations et met à jour le graphe sur place.
+        Le coût dépend de la taille du lot, pas de celle de l'ontologie.
+        Renvoie l'ensemble des relations réellement ajoutées.
+        """
+        relations = as_core_triples(relations)
+        if self.store is not None:
+            added = set(self.store.add(relations))
+        else:
+            added = set()
+            for triple in relations:
+                if triple in self.relations:
+                    continue
+                src, rel, dst = triple
+                self.relations.add(triple)
+                self.relation_graph[src][rel].add(dst)
+                self.reverse_graph[dst][rel].add(src)
+                added.add(triple)
+        self._invalidate(added)
+        return added
+    
+    def remove_relations(self, relations):
+        """
+        Retire un lot de relations et met à jour le graphe sur place.
+        Les relations dérivées à partir des relations retirées ne sont pas supprimées :
+        relancer l'inférence sur un nouveau moteur si l'ontologie doit rester close.
+        Renvoie l'ensemble des relations réellement retirées.
+        """
+        relations = as_core_triples(relations)
+        if self.store is not None:
+            removed = set(self.store.remove(relations))
+        else:
+            removed = set()
+            for triple in relations:
+                if triple not in self.relations:
+                    continue
+                src, rel, dst = triple
+                self.relations.discard(triple)
+                self._unlink(self.relation_graph, src, rel, dst)
+                self._unlink(self.reverse_graph, dst, rel, src)
+                removed.add(triple)
+        self._invalidate(removed)
+        return removed
+    
+    def _invalidate(self, changed):
+        """Oublie les clôtures des types de relation touchés et les réponses mémorisées."""
+        for rel in {rel for _, rel, _ in changed}:
+            self._closures.pop(rel, None)
+        if changed and self._chainer is not None:
+            self._chainer.clear()
+    
+    @staticmethod
+    def _unlink(graph, key, rel, value):
+        """Retire une arête d'un graphe en supprimant les entrées devenues vides."""
+        targets = graph[key][rel]
+        targets.discard(value)
+        if not targets:
+            del graph[key][rel]
+            if not graph[key]:
+                del graph[key]
     
     def relation_exists(self, src, rel, dst):
         """Vérifie si une relation existe déjà."""
-        return (src, rel, dst) in self.relations
+        return (src, core_relation(rel), dst) in self.relations
     
-    def apply_transitive_rules(self):
-        """Applique les règles de transitivité avec les relations existantes."""
-        new_relations = set()
-        print("Application des règles de transitivité...")
-        # Règle 1: Transitivité de IMPLIQUE
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.IMPLIQUE in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.IMPLIQUE]:
-                    if concept_b in self.relation_graph and TypeRelation.IMPLIQUE in self.relation_graph[concept_b]:
-                        for concept_c in self.relation_graph[concept_b][TypeRelation.IMPLIQUE]:
-                            # OPTIMISATION: accès direct à self.relations (évite l'appel de fonction)
-                            if concept_c != concept_a and (concept_a, TypeRelation.IMPLIQUE, concept_c) not in self.relations:
-                                new_relations.add((concept_a, TypeRelation.IMPLIQUE, concept_c))
-                                count += 1
-                                if count <= 5:
-                                    print(f"    Nouveau: {concept_a} IMPLIQUE {concept_c} (via {concept_b})")
-        print(f"  IMPLIQUE transitif: {count} nouvelles relations")
-        # Règle 2: Transitivité de EST_UN
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.EST_UN in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.EST_UN]:
-                    if concept_b in self.relation_graph and TypeRelation.EST_UN in self.relation_graph[concept_b]:
-                        for concept_c in self.relation_graph[concept_b][TypeRelation.EST_UN]:
-                            if concept_c != concept_a and (concept_a, TypeRelation.EST_UN, concept_c) not in self.relations:
-                                new_relations.add((concept_a, TypeRelation.EST_UN, concept_c))
-                                count += 1
-                                if count <= 5:
-                                    print(f"    Nouveau: {concept_a} EST_UN {concept_c} (via {concept_b})")
-        print(f"  EST_UN transitif: {count} nouvelles relations")
-        # Règle 3: Transitivité de FAIT_PARTIE_DE
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.FAIT_PARTIE_DE in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.FAIT_PARTIE_DE]:
-                    if concept_b in self.relation_graph and TypeRelation.FAIT_PARTIE_DE in self.relation_graph[concept_b]:
-                        for concept_c in self.relation_graph[concept_b][TypeRelation.FAIT_PARTIE_DE]:
-                            if concept_c != concept_a and (concept_a, TypeRelation.FAIT_PARTIE_DE, concept_c) not in self.relations:
-                                new_relations.add((concept_a, TypeRelation.FAIT_PARTIE_DE, concept_c))
-                                count += 1
-                                if count <= 5:
-                                    print(f"    Nouveau: {concept_a} FAIT_PARTIE_DE {concept_c} (via {concept_b})")
-        print(f"  FAIT_PARTIE_DE transitif: {count} nouvelles relations")
-        # Règle 4: Transitivité de PRECEDE
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.PRECEDE in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.PRECEDE]:
-                    if concept_b in self.relation_graph and TypeRelation.PRECEDE in self.relation_graph[concept_b]:
-                        for concept_c in self.relation_graph[concept_b][TypeRelation.PRECEDE]:
-                            if concept_c != concept_a and (concept_a, TypeRelation.PRECEDE, concept_c) not in self.relations:
-                                new_relations.add((concept_a, TypeRelation.PRECEDE, concept_c))
-                                count += 1
-                                if count <= 5:
-                                    print(f"    Nouveau: {concept_a} PRECEDE {concept_c} (via {concept_b})")
-        print(f"  PRECEDE transitif: {count} nouvelles relations")
-        # Règle 5: Transitivité de CAUSE
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.CAUSE in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.CAUSE]:
-                    if concept_b in self.relation_graph and TypeRelation.CAUSE in self.relation_graph[concept_b]:
-                        for concept_c in self.relation_graph[concept_b][TypeRelation.CAUSE]:
-                            if concept_c != concept_a and (concept_a, TypeRelation.CAUSE, concept_c) not in self.relations:
-                                new_relations.add((concept_a, TypeRelation.CAUSE, concept_c))
-                                count += 1
-                                if count <= 5:
-                                    print(f"    Nouveau: {concept_a} CAUSE {concept_c} (via {concept_b})")
-        print(f"  CAUSE transitif: {count} nouvelles relations")
-        return new_relations
+    # ---------- CLÔTURE TRANSITIVE ----------
     
-    def apply_equivalence_rules(self):
-        """Applique les règles d'équivalence et symétrie."""
-        new_relations = set()
-        print("Application des règles d'équivalence...")
-        # Règle 6: Symétrie de EST_EQUIVALENT
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.EST_EQUIVALENT in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.EST_EQUIVALENT]:
-                    if (concept_b, TypeRelation.EST_EQUIVALENT, concept_a) not in self.relations:
-                        new_relations.add((concept_b, TypeRelation.EST_EQUIVALENT, concept_a))
-                        count += 1
-                        if count <= 5:
-                            print(f"    Nouveau: {concept_b} EST_EQUIVALENT {concept_a}")
-        print(f"  EST_EQUIVALENT symétrique: {count} nouvelles relations")
-        # Règle 7: Transitivité de EST_EQUIVALENT
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.EST_EQUIVALENT in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.EST_EQUIVALENT]:
-                    if concept_b in self.relation_graph and TypeRelation.EST_EQUIVALENT in self.relation_graph[concept_b]:
-                        for concept_c in self.relation_graph[concept_b][TypeRelation.EST_EQUIVALENT]:
-                            if concept_c != concept_a and (concept_a, TypeRelation.EST_EQUIVALENT, concept_c) not in self.relations:
-                                new_relations.add((concept_a, TypeRelation.EST_EQUIVALENT, concept_c))
-                                count += 1
-                                if count <= 5:
-                                    print(f"    Nouveau: {concept_a} EST_EQUIVALENT {concept_c} (via {concept_b})")
-        print(f"  EST_EQUIVALENT transitif: {count} nouvelles relations")
-        # Règle 8: Symétrie de IDENTIQUE_A
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.IDENTIQUE_A in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.IDENTIQUE_A]:
-                    if (concept_b, TypeRelation.IDENTIQUE_A, concept_a) not in self.relations:
-                        new_relations.add((concept_b, TypeRelation.IDENTIQUE_A, concept_a))
-                        count += 1
-                        if count <= 5:
-                            print(f"    Nouveau: {concept_b} IDENTIQUE_A {concept_a}")
-        print(f"  IDENTIQUE_A symétrique: {count} nouvelles relations")
-        return new_relations
+    def transitive_closure(self, rel):
+        """Renvoie la clôture transitive (TransitiveClosure) d'un type de relation, mise en cache."""
+        closure = self._closures.get(rel)
+        if closure is None:
+            edges = ((src, dst) for src, rels in self.relation_graph.items() for dst in rels.get(rel, ()))
+            closure = self._closures[rel] = TransitiveClosure(edges)
+        return closure
     
-    def apply_opposition_rules(self):
-        """Applique les règles d'opposition."""
-        new_relations = set()
-        print("Application des règles d'opposition...")
-        # Règle 9: Symétrie de S_OPPOSE_A
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.S_OPPOSE_A in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.S_OPPOSE_A]:
-                    if (concept_b, TypeRelation.S_OPPOSE_A, concept_a) not in self.relations:
-                        new_relations.add((concept_b, TypeRelation.S_OPPOSE_A, concept_a))
-                        count += 1
-                        if count <= 5:
-                            print(f"    Nouveau: {concept_b} S_OPPOSE_A {concept_a}")
-        print(f"  S_OPPOSE_A symétrique: {count} nouvelles relations")
-        # Règle 10: Symétrie de CONTREDIT
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.CONTREDIT in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.CONTREDIT]:
-                    if (concept_b, TypeRelation.CONTREDIT, concept_a) not in self.relations:
-                        new_relations.add((concept_b, TypeRelation.CONTREDIT, concept_a))
-                        count += 1
-                        if count <= 5:
-                            print(f"    Nouveau: {concept_b} CONTREDIT {concept_a}")
-        print(f"  CONTREDIT symétrique: {count} nouvelles relations")
-        return new_relations
+    def implies(self, concept_a, concept_c):
+        """Vrai si IMPLIQUE(a, c) découle par transitivité, sans matérialiser la clôture."""
+        return self.transitive_closure(TypeRelation.IMPLIQUE).reaches(concept_a, concept_c)
     
-    def apply_causal_rules(self):
-        """Applique les règles causales et logiques."""
+    def apply_transitive_closure(self, relation_types=None):
+        """
+        Calcule en une passe la clôture transitive complète des relations transitives
+        (condensation des composantes fortement connexes) au lieu d'une jointure à 2 sauts.
+        """
         new_relations = set()
-        print("Application des règles causales...")
-        # Règle 11: De la cause à la permission
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.CAUSE in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.CAUSE]:
-                    if (concept_a, TypeRelation.PERMET, concept_b) not in self.relations:
-                        new_relations.add((concept_a, TypeRelation.PERMET, concept_b))
-                        count += 1
-                        if count <= 5:
-                            print(f"    Nouveau: {concept_a} PERMET {concept_b} (car CAUSE)")
-        print(f"  CAUSE → PERMET: {count} nouvelles relations")
-        # Règle 12: De la nécessité à la dépendance
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.NECESSITE in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.NECESSITE]:
-                    if (concept_a, TypeRelation.DEPEND_DE, concept_b) not in self.relations:
-                        new_relations.add((concept_a, TypeRelation.DEPEND_DE, concept_b))
-                        count += 1
-                        if count <= 5:
-                            print(f"    Nouveau: {concept_a} DEPEND_DE {concept_b} (car NECESSITE)")
-        print(f"  NECESSITE → DEPEND_DE: {count} nouvelles relations")
-        # Règle 13: De empêche à s'oppose
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.EMPECHE in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.EMPECHE]:
-                    if (concept_a, TypeRelation.S_OPPOSE_A, concept_b) not in self.relations:
-                        new_relations.add((concept_a, TypeRelation.S_OPPOSE_A, concept_b))
-                        count += 1
-                        if count <= 5:
-                            print(f"    Nouveau: {concept_a} S_OPPOSE_A {concept_b} (car EMPECHE)")
-        print(f"  EMPECHE → S_OPPOSE_A: {count} nouvelles relations")
+        print("Application de la clôture transitive...")
+        for rel in relation_types if relation_types is not None else self.TRANSITIVE_RELATIONS:
+            start = time.perf_counter()
+            closure = self.transitive_closure(rel)
+            count = 0
+            for concept_a, concept_c in closure.pairs():
+                if (concept_a, rel, concept_c) not in self.relations:
+                    new_relations.add((concept_a, rel, concept_c))
+                    count += 1
+            if self.profiler is not None:
+                # La clôture apparaît comme une règle : candidats = couples de la clôture
+                pairs = closure.pair_count()
+                self.profiler.record_rules({f"clôture {rel.name}": [time.perf_counter() - start, pairs, count, pairs - count]})
+            print(f"  {rel.name} clôture: {count} nouvelles relations "
+                  f"({len(closure.members)} composantes pour {len(closure.nodes)} concepts)")
         return new_relations
     
-    def apply_hierarchical_rules(self):
-        """Applique les règles hiérarchiques."""
-        new_relations = set()
-        print("Application des règles hiérarchiques...")
-        # Règle 14: Héritage de propriétés par classification
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.EST_UN in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.EST_UN]:
-                    if concept_b in self.relation_graph and TypeRelation.A_COMME_PROPRIETE in self.relation_graph[concept_b]:
-                        for propriete in self.relation_graph[concept_b][TypeRelation.A_COMME_PROPRIETE]:
-                            if (concept_a, TypeRelation.A_COMME_PROPRIETE, propriete) not in self.relations:
-                                new_relations.add((concept_a, TypeRelation.A_COMME_PROPRIETE, propriete))
-                                count += 1
-                                if count <= 5:
-                                    print(f"    Nouveau: {concept_a} A_COMME_PROPRIETE {propriete} (héritage via {concept_b})")
-        print(f"  Héritage EST_UN → A_COMME_PROPRIETE: {count} nouvelles relations")
-        # Règle 15: Héritage de propriétés par instanciation
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.INSTANCE_DE in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.INSTANCE_DE]:
-                    if concept_b in self.relation_graph and TypeRelation.A_COMME_PROPRIETE in self.relation_graph[concept_b]:
-                        for propriete in self.relation_graph[concept_b][TypeRelation.A_COMME_PROPRIETE]:
-                            if (concept_a, TypeRelation.A_COMME_PROPRIETE, propriete) not in self.relations:
-                                new_relations.add((concept_a, TypeRelation.A_COMME_PROPRIETE, propriete))
-                                count += 1
-                                if count <= 5:
-                                    print(f"    Nouveau: {concept_a} A_COMME_PROPRIETE {propriete} (instance via {concept_b})")
-        print(f"  Héritage INSTANCE_DE → A_COMME_PROPRIETE: {count} nouvelles relations")
-        # Règle 16: De fait_partie_de à dépend_de
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.FAIT_PARTIE_DE in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.FAIT_PARTIE_DE]:
-                    if (concept_a, TypeRelation.DEPEND_DE, concept_b) not in self.relations:
-                        new_relations.add((concept_a, TypeRelation.DEPEND_DE, concept_b))
-                        count += 1
-                        if count <= 5:
-                            print(f"    Nouveau: {concept_a} DEPEND_DE {concept_b} (car FAIT_PARTIE_DE)")
-        print(f"  FAIT_PARTIE_DE → DEPEND_DE: {count} nouvelles relations")
-        return new_relations
+    # ---------- REQUÊTES (CHAÎNAGE ARRIÈRE) ----------
+    
+    def _query_engine(self):
+        if self._chainer is None:
+            self._chainer = BackwardChainer(self.rules, self.relation_graph, self.reverse_graph,
+                                            max_cached_goals=self.query_cache_size)
+        return self._chainer
+    
+    def query(self, concept, rel, reverse=False):
+        """
+        Concepts liés à concept par rel, relations dérivées comprises, sans matérialiser
+        l'ontologie enrichie : seuls les sous-buts nécessaires sont évalués (et mémorisés).
+        reverse=True renvoie au contraire les concepts s tels que rel(s, concept).
+        """
+        return set(self._query_engine().query(concept, core_relation(rel), reverse))
     
-    def apply_complementarity_rules(self):
-        """Applique les règles de complémentarité."""
+    def holds(self, src, rel, dst):
+        """Vrai si (src, rel, dst) est une relation de base ou dérivable par les règles."""
+        return self._query_engine().holds(src, core_relation(rel), dst)
+    
+    # ---------- RÈGLES ----------
+    
+    def _planner(self, transitive_closure=False):
+        """Plan de jointure compilé pour la table de règles (sans les règles closes par clôture)."""
+        planner = self._planners.get(transitive_closure)
+        if planner is None:
+            rules = self.rules
+            if transitive_closure:
+                rules = [rule for rule in rules
+                         if not (rule.is_transitive() and rule.head[0] in self.TRANSITIVE_RELATIONS)]
+            planner = self._planners[transitive_closure] = RulePlanner(rules)
+        return planner
+    
+    def apply_rules(self, delta_relations=None, transitive_closure=False, workers=1):
+        """
+        Applique la table de règles en une passe sur le graphe.
+        delta_relations=None : chaque règle est jointe sur le graphe complet.
+        Sinon, évaluation semi-naïve : seules les relations du delta sont jointes avec le graphe
+        complet. Une relation dérivée à l'itération k utilise forcément au moins un fait du
+        delta k-1 : les autres dérivations ont déjà été trouvées, le point fixe est identique.
+        transitive_closure=True remplace les règles de transitivité de TRANSITIVE_RELATIONS
+        par leur clôture complète.
+        workers > 1 : les concepts sources sont répartis sur un pool de processus
+        (même résultat que l'évaluation séquentielle), sauf si le delta est trop petit pour
+        que le pool soit rentable (RulePlanner.PARALLEL_MIN_FACTS).
+        """
+        delta = None
+        if delta_relations is not None:
+            delta = defaultdict(lambda: defaultdict(set))
+            for src, rel, dst in delta_relations:
+                delta[rel][src].add(dst)
+        
         new_relations = set()
-        print("Application des règles de complémentarité...")
-        # Règle 17: Symétrie de COMPLEMENTE
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.COMPLEMENTE in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.COMPLEMENTE]:
-                    if (concept_b, TypeRelation.COMPLEMENTE, concept_a) not in self.relations:
-                        new_relations.add((concept_b, TypeRelation.COMPLEMENTE, concept_a))
-                        count += 1
-                        if count <= 5:
-                            print(f"    Nouveau: {concept_b} COMPLEMENTE {concept_a}")
-        print(f"  COMPLEMENTE symétrique: {count} nouvelles relations")
-        # Règle 18: Symétrie de EST_ANALOGUE_A
-        count = 0
-        for concept_a in self.relation_graph:
-            if TypeRelation.EST_ANALOGUE_A in self.relation_graph[concept_a]:
-                for concept_b in self.relation_graph[concept_a][TypeRelation.EST_ANALOGUE_A]:
-                    if (concept_b, TypeRelation.EST_ANALOGUE_A, concept_a) not in self.relations:
-                        new_relations.add((concept_b, TypeRelation.EST_ANALOGUE_A, concept_a))
-                        count += 1
-                        if count <= 5:
-                            print(f"    Nouveau: {concept_b} EST_ANALOGUE_A {concept_a}")
-        print(f"  EST_ANALOGUE_A symétrique: {count} nouvelles relations")
+        if transitive_closure:
+            touched = self.TRANSITIVE_RELATIONS if delta is None else [rel for rel in self.TRANSITIVE_RELATIONS if rel in delta]
+            new_relations.update(self.apply_transitive_closure(touched))
+        
+        if delta is None:
+            print("Application des règles...")
+        else:
+            print(f"Application des règles (semi-naïf, delta de {len(delta_relations)} relations)...")
+        planner = self._planner(transitive_closure)
+        stats = {} if self.profiler is not None else None
+        if workers > 1:
+            derived, counts = planner.evaluate_parallel(
+                self.relation_graph, self.reverse_graph, self.relations, delta, workers=workers, stats=stats)
+        else:
+            derived, counts = planner.evaluate(self.relation_graph, self.reverse_graph, self.relations, delta,
+                                               stats=stats)
+        if stats is not None:
+            self.profiler.record_rules(stats)
+        for name, count in counts.items():
+            print(f"  {name}: {count} nouvelles relations")
+        new_relations.update(derived)
         return new_relations
     
-    def apply_all_rules(self, max_iterations=3):
-        """Applique toutes les règles d'inférence de manière itérative."""
+    def apply_all_rules(self, max_iterations=3, semi_naive=False, transitive_closure=False, workers=1):
+        """
+        Applique toutes les règles d'inférence de manière itérative.
+        semi_naive=True : chaque itération ne joint que les relations dérivées à l'itération
+        précédente avec le graphe complet (même résultat, itérations suivantes bien plus rapides).
+        transitive_closure=True : IMPLIQUE, EST_UN, FAIT_PARTIE_DE, PRECEDE et CAUSE sont
+        clos complètement à chaque itération (chaînes de toute longueur) au lieu d'un pas de 2.
+        workers > 1 : chaque itération est évaluée en parallèle sur un pool de processus.
+        """
         all_new_relations = set()
         iteration = 0
+        delta = None
+        self.iteration_times = []
         
         print(f"Début de l'inférence avec {len(self.relations)} relations initiales")
         
         while iteration < max_iterations:
             print(f"\n=== Itération {iteration + 1} ===")
+            iteration_start = time.perf_counter()
+            if self.profiler is not None:
+                self.profiler.start_iteration(iteration + 1)
             new_relations = set()
             
-            # Appliquer toutes les règles
-            new_relations.update(self.apply_transitive_rules())
-            new_relations.update(self.apply_equivalence_rules())
-            new_relations.update(self.apply_opposition_rules())
-            new_relations.update(self.apply_causal_rules())
-            new_relations.update(self.apply_hierarchical_rules())
-            new_relations.update(self.apply_complementarity_rules())
+            # Appliquer toutes les règles (la première itération semi-naïve porte sur tout le graphe)
+            if semi_naive and iteration > 0:
+                new_relations.update(self.apply_rules(delta, transitive_closure=transitive_closure, workers=workers))
+            else:
+                new_relations.update(self.apply_rules(transitive_closure=transitive_closure, workers=workers))
             
             # Filtrer les relations déjà existantes
             truly_new = new_relations - self.relations
@@ -312,16 +417,21 @@ class LogicalInferenceEngine:
             print(f"Nouvelles relations trouvées: {len(truly_new)}")
             
             if not truly_new:
+                self.iteration_times.append(time.perf_counter() - iteration_start)
+                if self.profiler is not None:
+                    self.profiler.end_iteration(0)
                 print("Aucune nouvelle relation trouvée, arrêt des itérations")
                 break
             
-            # Ajouter les nouvelles relations
+            # Ajouter les nouvelles relations (le graphe est mis à jour sur place)
             all_new_relations.update(truly_new)
-            self.relations.update(truly_new)
-            
-            # Reconstruire le graphe avec les nouvelles relations
-            self.build_graph()
+            self.add_relations(truly_new)
+            # Le delta sert de base à l'itération semi-naïve suivante
+            delta = truly_new
             
+            self.iteration_times.append(time.perf_counter() - iteration_start)
+            if self.profiler is not None:
+                self.profiler.end_iteration(len(truly_new))
             iteration += 1
         
         print(f"\nTerminé après {iteration} itérations")
@@ -330,16 +440,37 @@ class LogicalInferenceEngine:
         
         return all_new_relations
 
-def enhance_ontology(core_relations, output_file="ontologie_enrichie.py"):
-    """Enrichit l'ontologie avec les règles d'inférence."""
+def enhance_ontology(core_relations, output_file="ontologie_enrichie.py", semi_naive=False, compact=False,
+                     transitive_closure=False, rules_file=None, workers=1, snapshot_file=None,
+                     profile_file=None, profile_sinks=()):
+    """
+    Enrichit l'ontologie avec les règles d'inférence.
+    Si snapshot_file est fourni, écrit aussi un instantané binaire (ontologySnapshot) avec les
+    sections CORE_RELATIONS_ORIGINAL et DERIVED_RELATIONS (ALL_RELATIONS = leur concaténation).
+    Si profile_file ou profile_sinks sont fournis, l'inférence est instrumentée
+    (inferenceProfiler) : les sinks reçoivent chaque itération et le rapport JSON (par
+    itération et par règle : durée, candidats, dérivées, doublons) est écrit dans profile_file.
+    """
     
     print(f"Relations initiales: {len(core_relations)}")
     
-    # Créer le moteur d'inférence
-    engine = LogicalInferenceEngine(core_relations)
+    # Créer le moteur d'inférence (table de règles du projet si fournie)
+    rules = load_rules(rules_file, TypeRelation) if rules_file else None
+    profiler = None
+    if profile_file or profile_sinks:
+        profiler = InferenceProfiler(profile_sinks)
+        profiler.metadata = {
+            "initial_relations": len(core_relations),
+            "semi_naive": semi_naive,
+            "compact": compact,
+            "transitive_closure": transitive_closure,
+            "workers": workers,
+        }
+    engine = LogicalInferenceEngine(core_relations, compact=compact, rules=rules, profiler=profiler)
     
     # Appliquer les règles d'inférence
-    new_relations = engine.apply_all_rules()
+    new_relations = engine.apply_all_rules(semi_naive=semi_naive, transitive_closure=transitive_closure,
+                                           workers=workers)
     
     print(f"\nRésumé final:")
     print(f"Nouvelles relations dérivées: {len(new_relations)}")
@@ -394,9 +525,21 @@ def enhance_ontology(core_relations, output_file="ontologie_enrichie.py"):
     
     print(f"Ontologie enrichie sauvegardée dans {output_file}")
     
+    if profile_file:
+        profiler.metadata["derived_relations"] = len(new_relations)
+        profiler.write_json(profile_file)
+        print(f"Rapport de profilage sauvegardé dans {profile_file}")
+    
+    if snapshot_file:
+        write_snapshot(snapshot_file, triple_sections={
+            "CORE_RELATIONS_ORIGINAL": original_sorted,
+            "DERIVED_RELATIONS": derived_sorted,
+        })
+        print(f"Instantané binaire sauvegardé dans {snapshot_file}")
+    
     return list(engine.relations)
 
 # Exemple d'utilisation
 if __name__ == "__main__":
     # Utilisation des vraies relations extraites
-    enhanced_relations = enhance_ontology(CORE_RELATIONS)
\ No newline at end of file
+    enhanced_relations = enhance_ontology(get_core_relations(), snapshot_file="ontologie_enrichie.opfsnap")
\ No newline at end of file
@@ -0,0 +1,206 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+# Format binaire d'un instantané d'ontologie (entiers little-endian) :
+#   en-tête      : magic (8 octets), version, nombre de chaînes, nombre de sections (u32),
+#                  taille de la table de chaînes (u64)
+#   chaînes      : chaînes UTF-8 séparées par '\0' (concepts et noms de relations)
+#   répertoire   : par section, id de chaîne du nom, type, nombre d'éléments, réservé (u32),
+#                  position des données (u64)
+#   sections     : tableaux de u32, alignés sur 8 octets
+#       TRIPLES  : (source, relation, destination) en ids de chaînes
+#       CONCEPTS : (concept, fréquence) en id de chaîne et entier
+MAGIC = b"OPFSNAP\0"
+VERSION = 1
+HEADER = struct.Struct('<8sIIIQ')
+DIRECTORY_ENTRY = struct.Struct('<IIIIQ')
+KIND_TRIPLES = 1
+KIND_CONCEPTS = 2
+
+if array('I').itemsize != 4:
+    raise ImportError("ontologySnapshot nécessite des entiers 'I' sur 4 octets")
+
+
+def _pad(f):
+    position = f.tell()
+    if position % 8:
+        f.write(b"\0" * (8 - position % 8))
+
+
+def _u32_bytes(values):
+    data = array('I', values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tobytes()
+
+
+def write_snapshot(path, triple_sections=None, concept_sections=None):
+    """
+    Écrit un instantané binaire de l'ontologie.
+    triple_sections : {nom: itérable de (source, relation, destination)} ; la relation est un
+    membre d'Enum (son nom est stocké) ou une chaîne.
+    concept_sections : {nom: dict concept -> fréquence, ou itérable de concepts}.
+    L'écriture passe par un fichier temporaire remplacé atomiquement.
+    """
+    strings = []
+    string_ids = {}
+
+    def intern(value):
+        sid = string_ids.get(value)
+        if sid is None:
+            if '\0' in value:
+                raise ValueError(f"Chaîne invalide pour un instantané : {value!r}")
+            sid = string_ids[value] = len(strings)
+            strings.append(value)
+        return sid
+
+    sections = []
+    for name, triples in (triple_sections or {}).items():
+        ids = []
+        for src, rel, dst in triples:
+            ids.extend((intern(src), intern(getattr(rel, 'name', rel)), intern(dst)))
+        sections.append((intern(name), KIND_TRIPLES, len(ids) // 3, ids))
+    for name, concepts in (concept_sections or {}).items():
+        items = concepts.items() if hasattr(concepts, 'items') else ((concept, 0) for concept in concepts)
+        ids = []
+        for concept, frequency in items:
+            ids.extend((intern(concept), frequency))
+        sections.append((intern(name), KIND_CONCEPTS, len(ids) // 2, ids))
+
+    blob = "\0".join(strings).encode('utf-8')
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(strings), len(sections), len(blob)))
+        _pad(f)
+        f.write(blob)
+        _pad(f)
+        directory_pos = f.tell()
+        f.write(b"\0" * (DIRECTORY_ENTRY.size * len(sections)))
+        _pad(f)
+        entries = []
+        for name_id, kind, count, ids in sections:
+            entries.append(DIRECTORY_ENTRY.pack(name_id, kind, count, 0, f.tell()))
+            f.write(_u32_bytes(ids))
+            _pad(f)
+        f.seek(directory_pos)
+        f.write(b"".join(entries))
+    os.replace(tmp_path, path)
+
+
+class OntologySnapshot:
+    """
+    Lecture d'un instantané par mmap : seuls l'en-tête, la table de chaînes (un seul
+    decode + split) et le répertoire sont lus à l'ouverture ; les tableaux de triplets sont
+    exposés sans copie (triple_ids) et convertis en tuples seulement sur demande.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._views = []
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Instantané vide : {path}") from None
+        magic, version, self.nb_strings, nb_sections, blob_size = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} n'est pas un instantané d'ontologie")
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"Version d'instantané non supportée : {version} (attendu {VERSION})")
+        self.version = version
+        self._blob_pos = (HEADER.size + 7) // 8 * 8
+        self._blob_size = blob_size
+        directory_pos = (self._blob_pos + blob_size + 7) // 8 * 8
+        self._sections = {}
+        self._strings = None
+        entries = [DIRECTORY_ENTRY.unpack_from(self._mmap, directory_pos + i * DIRECTORY_ENTRY.size)
+                   for i in range(nb_sections)]
+        for name_id, kind, count, _, position in entries:
+            self._sections[self.strings[name_id]] = (kind, count, position)
+
+    @property
+    def strings(self):
+        """Table des chaînes (décodée une seule fois)."""
+        if self._strings is None:
+            blob = self._mmap[self._blob_pos:self._blob_pos + self._blob_size]
+            self._strings = blob.decode('utf-8').split("\0") if self.nb_strings else []
+        return self._strings
+
+    def section_names(self):
+        return list(self._sections)
+
+    def _u32(self, name, kind, width):
+        try:
+            section_kind, count, position = self._sections[name]
+        except KeyError:
+            raise KeyError(f"Section absente de l'instantané : {name}") from None
+        if section_kind != kind:
+            raise ValueError(f"La section {name} n'est pas du type demandé")
+        if sys.byteorder != 'little':
+            data = array('I', self._mmap[position:position + 4 * width * count])
+            data.byteswap()
+            return data
+        return memoryview(self._mmap)[position:position + 4 * width * count].cast('I')
+
+    def triple_count(self, name):
+        return self._sections[name][1]
+
+    def triple_ids(self, name):
+        """
+        Tableau plat (sans copie) des ids source, relation, destination de la section ;
+        valable jusqu'à close().
+        """
+        view = self._u32(name, KIND_TRIPLES, 3)
+        self._views.append(view)
+        return view
+
+    def triples(self, name, relation_enum=None):
+        """Liste de tuples (source, relation, destination) ; relation convertie via relation_enum si fourni."""
+        strings = self.strings
+        relations = {}
+        ids = self._u32(name, KIND_TRIPLES, 3)
+        it = iter(ids)
+        result = []
+        for src, rel, dst in zip(it, it, it):
+            relation = relations.get(rel)
+            if relation is None:
+                relation = relations[rel] = relation_enum[strings[rel]] if relation_enum else strings[rel]
+            result.append((strings[src], relation, strings[dst]))
+        if isinstance(ids, memoryview):
+            ids.release()
+        return result
+
+    def concepts(self, name):
+        """Dictionnaire concept -> fréquence de la section."""
+        strings = self.strings
+        ids = self._u32(name, KIND_CONCEPTS, 2)
+        it = iter(ids)
+        result = {strings[concept]: frequency for concept, frequency in zip(it, it)}
+        if isinstance(ids, memoryview):
+            ids.release()
+        return result
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        self._views = []
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_relations(path, relation_enum, section="CORE_RELATIONS"):
+    """Charge une section de triplets d'un instantané sous forme de liste de tuples."""
+    with OntologySnapshot(path) as snapshot:
+        return snapshot.triples(section, relation_enum)
@@ -0,0 +1,149 @@
+import os
+import sqlite3
+
+# Schéma d'une base d'ontologie (PRAGMA user_version = VERSION) :
+#   concepts  : (concept, fréquence), clé primaire concept
+#   relations : (source, nom de relation, destination), clé primaire (src, rel, dst) sans rowid :
+#               la clé sert d'index (src, rel) ; index secondaires (dst, rel) et (rel), qui
+#               contiennent aussi la clé primaire et couvrent donc les requêtes sans lecture de table
+VERSION = 1
+SCHEMA = """
+    CREATE TABLE concepts (concept TEXT PRIMARY KEY, frequency INTEGER NOT NULL) WITHOUT ROWID;
+    CREATE TABLE relations (
+        src TEXT NOT NULL, rel TEXT NOT NULL, dst TEXT NOT NULL,
+        PRIMARY KEY (src, rel, dst)) WITHOUT ROWID;
+"""
+INDEXES = """
+    CREATE INDEX relations_dst_rel ON relations (dst, rel);
+    CREATE INDEX relations_rel ON relations (rel);
+"""
+
+
+def write_store(path, concepts=None, triples=()):
+    """
+    Écrit une base SQLite d'ontologie.
+    concepts : dict concept -> fréquence, ou itérable de concepts (fréquence 0).
+    triples : itérable de (source, relation, destination) ; la relation est un membre d'Enum
+    (son nom est stocké) ou une chaîne. Les doublons sont ignorés.
+    La base est construite dans un fichier temporaire remplacé atomiquement ; les index sont
+    créés après l'insertion des données.
+    """
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    db = sqlite3.connect(tmp_path)
+    try:
+        db.execute("PRAGMA journal_mode=OFF")
+        db.execute("PRAGMA synchronous=OFF")
+        db.executescript(SCHEMA)
+        concepts = concepts or {}
+        items = concepts.items() if hasattr(concepts, 'items') else ((concept, 0) for concept in concepts)
+        db.executemany("INSERT OR REPLACE INTO concepts VALUES (?, ?)", items)
+        db.executemany("INSERT OR IGNORE INTO relations VALUES (?, ?, ?)",
+                       ((src, getattr(rel, 'name', rel), dst) for src, rel, dst in triples))
+        db.executescript(INDEXES)
+        db.execute(f"PRAGMA user_version = {VERSION}")
+        db.commit()
+    finally:
+        db.close()
+    os.replace(tmp_path, path)
+
+
+class OntologyStore:
+    """
+    Lecture d'une base d'ontologie (write_store), ouverte en lecture seule : seules les pages
+    utiles des index sont lues, il n'y a rien à charger à l'ouverture.
+    Les requêtes filtrent sur n'importe quelle combinaison de source, relation et
+    destination ; la relation est donnée par son nom ou par un membre d'Enum, et rendue
+    comme membre de relation_enum si fourni (sinon par son nom).
+    """
+
+    def __init__(self, path, relation_enum=None):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Base d'ontologie introuvable : {path}")
+        self.path = path
+        self.relation_enum = relation_enum
+        self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        except sqlite3.DatabaseError:
+            self._db.close()
+            raise ValueError(f"{path} n'est pas une base d'ontologie") from None
+        if version != VERSION:
+            self._db.close()
+            raise ValueError(f"Version de base d'ontologie non supportée : {version} (attendu {VERSION})")
+        self._relations = {}
+
+    def _relation(self, name):
+        if self.relation_enum is None:
+            return name
+        relation = self._relations.get(name)
+        if relation is None:
+            relation = self._relations[name] = self.relation_enum[name]
+        return relation
+
+    @staticmethod
+    def _where(src, rel, dst):
+        clauses, params = [], []
+        for column, value in (("src", src), ("rel", getattr(rel, 'name', rel)), ("dst", dst)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def triples(self, src=None, rel=None, dst=None, batch_size=10000):
+        """
+        Itère sur les triplets (source, relation, destination) qui correspondent aux critères
+        donnés (tous si aucun), lus par lots de batch_size : l'ontologie entière peut être
+        parcourue sans être chargée en mémoire.
+        """
+        where, params = self._where(src, rel, dst)
+        cursor = self._db.execute(f"SELECT src, rel, dst FROM relations{where}", params)
+        relation = self._relation
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for s, r, d in rows:
+                yield s, relation(r), d
+
+    def count(self, src=None, rel=None, dst=None):
+        """Nombre de triplets qui correspondent aux critères."""
+        where, params = self._where(src, rel, dst)
+        return self._db.execute(f"SELECT COUNT(*) FROM relations{where}", params).fetchone()[0]
+
+    def destinations(self, src, rel):
+        """Destinations des relations rel qui partent de src."""
+        rows = self._db.execute("SELECT dst FROM relations WHERE src = ? AND rel = ?", (src, getattr(rel, 'name', rel)))
+        return [dst for dst, in rows]
+
+    def sources(self, dst, rel):
+        """Sources des relations rel qui arrivent à dst."""
+        rows = self._db.execute("SELECT src FROM relations WHERE dst = ? AND rel = ?", (dst, getattr(rel, 'name', rel)))
+        return [src for src, in rows]
+
+    def relation_counts(self):
+        """Dictionnaire type de relation -> nombre de triplets."""
+        rows = self._db.execute("SELECT rel, COUNT(*) FROM relations GROUP BY rel")
+        return {self._relation(rel): count for rel, count in rows}
+
+    def frequency(self, concept):
+        """Fréquence d'un concept, ou None s'il est absent."""
+        row = self._db.execute("SELECT frequency FROM concepts WHERE concept = ?", (concept,)).fetchone()
+        return row[0] if row else None
+
+    def concepts(self, min_frequency=0):
+        """Dictionnaire concept -> fréquence des concepts d'au moins min_frequency."""
+        return dict(self._db.execute("SELECT concept, frequency FROM concepts WHERE frequency >= ?", (min_frequency,)))
+
+    def __len__(self):
+        return self.count()
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,159 @@
+import threading
+import time
+from contextlib import contextmanager
+
+CONGESTION_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """
+    Seau à jetons : per_minute jetons par minute, avec une réserve d'au plus burst jetons
+    (par défaut 10 secondes de débit). acquire() réserve les jetons immédiatement (le solde
+    peut devenir négatif) puis attend le temps nécessaire : les appelants sont servis dans
+    l'ordre d'arrivée. per_minute=None : pas de limite.
+    """
+
+    def __init__(self, per_minute=None, burst=None):
+        self.per_minute = per_minute
+        self.rate = per_minute / 60 if per_minute else None
+        self.capacity = burst or (max(1.0, per_minute / 6) if per_minute else None)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        """Consomme amount jetons (bornés à la capacité) ; renvoie le temps d'attente en secondes."""
+        if self.rate is None or amount <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= min(amount, self.capacity)
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+def is_congestion(error):
+    """Vrai si l'erreur signale une surcharge du backend (429, 5xx ou délai dépassé)."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status in CONGESTION_STATUSES:
+        return True
+    return "Timeout" in type(error).__name__
+
+
+class AdaptiveLimiter:
+    """
+    Limiteur partagé des appels à un backend LLM, utilisable depuis plusieurs threads :
+    - seaux à jetons pour les requêtes par minute (rpm) et les tokens par minute (tpm) ;
+    - concurrence ajustée en AIMD : +1 requête simultanée par fenêtre de réponses rapides,
+      division par 2 (au plus une fois par temps de réponse) sur une erreur 429/5xx, un délai
+      dépassé, ou une latence au-delà de target_latency. Sans target_latency, la cible est
+      latency_tolerance fois la latence de référence (moyenne lente sur les dernières
+      centaines de réponses) : seule une hausse nette par rapport à l'habitude compte.
+    Les statistiques (stats(), summary()) sont lisibles pendant l'exécution.
+    """
+
+    def __init__(self, rpm=None, tpm=None, min_concurrency=1, max_concurrency=32, initial_concurrency=4,
+                 target_latency=None, latency_tolerance=3.0, decrease_factor=0.5):
+        self.requests_bucket = TokenBucket(rpm)
+        self.tokens_bucket = TokenBucket(tpm)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(max(min_concurrency, min(initial_concurrency, max_concurrency)))
+        self.target_latency = target_latency
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self._cond = threading.Condition()
+        self._last_decrease = 0.0
+        self._started = time.monotonic()
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.congestions = 0
+        self.decreases = 0
+        self.waited = 0.0
+        self.latency = None            # moyenne glissante courte (dernières réponses)
+        self.baseline_latency = None   # moyenne glissante lente (référence)
+
+    def _latency_limit(self):
+        if self.target_latency:
+            return self.target_latency
+        if self.baseline_latency is None or self.requests < 10:
+            return None
+        return self.baseline_latency * self.latency_tolerance
+
+    @contextmanager
+    def slot(self, tokens=0):
+        """Contexte d'un appel au backend : attend une place et les jetons, puis mesure l'appel."""
+        wait_start = time.monotonic()
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        self.requests_bucket.acquire(1)
+        self.tokens_bucket.acquire(tokens)
+        start = time.monotonic()
+        congested = failed = False
+        try:
+            yield self
+        except Exception as e:
+            failed = True
+            congested = is_congestion(e)
+            raise
+        finally:
+            self._record(start - wait_start, time.monotonic() - start, failed, congested)
+
+    def _record(self, waited, latency, failed, congested):
+        with self._cond:
+            self.in_flight -= 1
+            self.requests += 1
+            self.waited += waited
+            if failed:
+                self.errors += 1
+            else:
+                if self.latency is None:
+                    self.latency = self.baseline_latency = latency
+                else:
+                    self.latency = 0.8 * self.latency + 0.2 * latency
+                    self.baseline_latency = 0.99 * self.baseline_latency + 0.01 * latency
+            latency_limit = self._latency_limit()
+            slow = not failed and latency_limit is not None and self.latency > latency_limit
+            now = time.monotonic()
+            if congested or slow:
+                self.congestions += congested
+                # Une seule réduction par temps de réponse : les requêtes déjà en vol ont vu la même surcharge
+                if now - self._last_decrease > (self.latency or latency):
+                    self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                    self.decreases += 1
+            elif not failed:
+                # +1 après une fenêtre complète de réponses (limit réponses)
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            elapsed = time.monotonic() - self._started
+            return {
+                "concurrency_limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "requests": self.requests,
+                "requests_per_minute": self.requests * 60 / elapsed if elapsed else 0.0,
+                "errors": self.errors,
+                "congestions": self.congestions,
+                "decreases": self.decreases,
+                "latency": self.latency,
+                "waited": self.waited,
+            }
+
+    def summary(self):
+        stats = self.stats()
+        latency = f"{stats['latency']:.2f}s" if stats["latency"] is not None else "-"
+        return (f"{stats['in_flight']}/{stats['concurrency_limit']} en vol, "
+                f"{stats['requests_per_minute']:.0f} req/min, latence {latency}, "
+                f"{stats['congestions']} surcharges")
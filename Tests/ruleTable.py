@@ -0,0 +1,322 @@
+import re
+import time
+from collections import Counter, defaultdict
+
+from inferenceProfiler import merge_rule_stats, new_rule_stats
+
+
+ATOM_RE = re.compile(r'(\w+)\s*\(\s*(\w+)\s*,\s*(\w+)\s*\)')
+CONSTRAINT_RE = re.compile(r'(\w+)\s*!=\s*(\w+)')
+
+
+class Rule:
+    """
+    Règle d'inférence déclarative : un corps d'un ou deux atomes et une tête.
+    Exemple : IMPLIQUE(a, b), IMPLIQUE(b, c) => IMPLIQUE(a, c) [a != c]
+    Chaque atome est un couple (relation, (variable_source, variable_destination)).
+    """
+
+    def __init__(self, name, body, head, distinct=()):
+        self.name = name
+        self.body = list(body)
+        self.head = head
+        self.distinct = list(distinct)
+        self._check()
+
+    def _check(self):
+        if len(self.body) not in (1, 2):
+            raise ValueError(f"Règle '{self.name}': le corps doit contenir 1 ou 2 atomes")
+        for _, (x, y) in self.body + [self.head]:
+            if x == y:
+                raise ValueError(f"Règle '{self.name}': un atome ne peut pas répéter une variable")
+        if len(self.body) == 2:
+            shared = set(self.body[0][1]) & set(self.body[1][1])
+            if len(shared) != 1:
+                raise ValueError(f"Règle '{self.name}': les deux atomes doivent partager exactement une variable")
+        bound = {v for _, variables in self.body for v in variables}
+        for v in list(self.head[1]) + [v for pair in self.distinct for v in pair]:
+            if v not in bound:
+                raise ValueError(f"Règle '{self.name}': variable '{v}' absente du corps")
+
+    def is_transitive(self):
+        """Vrai pour R(a,b) ∧ R(b,c) → R(a,c)."""
+        if len(self.body) != 2:
+            return False
+        (r1, (a, b)), (r2, (b2, c)) = self.body
+        return r1 == r2 == self.head[0] and b == b2 and self.head[1] == (a, c)
+
+    def __repr__(self):
+        body = ", ".join(f"{rel.name}({x}, {y})" for rel, (x, y) in self.body)
+        head = f"{self.head[0].name}({self.head[1][0]}, {self.head[1][1]})"
+        constraints = f" [{', '.join(f'{x} != {y}' for x, y in self.distinct)}]" if self.distinct else ""
+        return f"{self.name} : {body} => {head}{constraints}"
+
+
+def parse_rules(text, relation_enum):
+    """
+    Analyse une table de règles, une par ligne :
+        nom : R1(a, b), R2(b, c) => R3(a, c) [a != c]
+    Les lignes vides et celles commençant par '#' sont ignorées. Les noms de relations sont
+    résolus dans relation_enum (par exemple TypeRelation).
+    """
+    rules = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if ':' not in line or '=>' not in line:
+            raise ValueError(f"Règle invalide (ligne {number}): attendu 'nom : corps => tête'")
+        try:
+            name, definition = line.split(':', 1)
+            body_text, head_text = definition.split('=>', 1)
+            constraints = ''
+            if '[' in head_text:
+                head_text, constraints = head_text.split('[', 1)
+            body = [(relation_enum[r], (x, y)) for r, x, y in ATOM_RE.findall(body_text)]
+            head = [(relation_enum[r], (x, y)) for r, x, y in ATOM_RE.findall(head_text)]
+            if len(head) != 1:
+                raise ValueError("la tête doit contenir exactement un atome")
+            rules.append(Rule(name.strip(), body, head[0], CONSTRAINT_RE.findall(constraints)))
+        except KeyError as e:
+            raise ValueError(f"Règle invalide (ligne {number}): relation inconnue {e}") from None
+        except ValueError as e:
+            raise ValueError(f"Règle invalide (ligne {number}): {e}") from None
+    return rules
+
+
+def load_rules(path, relation_enum):
+    """Charge une table de règles depuis un fichier texte (voir parse_rules)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse_rules(f.read(), relation_enum)
+
+
+class JoinPlan:
+    """
+    Plan d'exécution d'une règle pour un atome parcouru.
+    Les valeurs liées sont rangées dans des cases : 0 = source et 1 = destination du fait
+    parcouru, 2 = valeur obtenue en sondant le second atome (s'il existe).
+    """
+
+    def __init__(self, rule, scan_index):
+        self.rule = rule
+        scan_rel, scan_vars = rule.body[scan_index]
+        self.scan_rel = scan_rel
+        slots = {scan_vars[0]: 0, scan_vars[1]: 1}
+        self.probe_rel = None
+        if len(rule.body) == 2:
+            probe_rel, (p0, p1) = rule.body[1 - scan_index]
+            self.probe_rel = probe_rel
+            # La variable partagée sert de clé ; sa position dans l'atome sondé décide du sens
+            if p0 in slots:
+                self.key_slot, self.probe_reverse, slots[p1] = slots[p0], False, 2
+            else:
+                self.key_slot, self.probe_reverse, slots[p0] = slots[p1], True, 2
+        self.head_rel = rule.head[0]
+        self.head_slots = (slots[rule.head[1][0]], slots[rule.head[1][1]])
+        self.distinct = [(slots[x], slots[y]) for x, y in rule.distinct]
+
+
+class RulePlanner:
+    """
+    Compile une table de règles en plans de jointure regroupés par relation parcourue :
+    chaque liste d'adjacence n'est lue qu'une fois par itération, quel que soit le nombre
+    de règles qui s'en servent.
+    """
+
+    # En dessous de ce nombre de faits à parcourir, evaluate_parallel évalue sans pool : le
+    # démarrage d'un pool (~25 ms) coûte plus que l'évaluation (~5 µs par fait)
+    PARALLEL_MIN_FACTS = 10000
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        # Plans utilisés pour une évaluation complète : on ne parcourt que le premier atome
+        self.full_plans = defaultdict(list)
+        # Plans utilisés pour une évaluation semi-naïve : chaque atome du corps peut être le delta
+        self.delta_plans = defaultdict(list)
+        for rule in self.rules:
+            plan = JoinPlan(rule, 0)
+            self.full_plans[plan.scan_rel].append(plan)
+            self.delta_plans[plan.scan_rel].append(plan)
+            if len(rule.body) == 2:
+                plan = JoinPlan(rule, 1)
+                self.delta_plans[plan.scan_rel].append(plan)
+
+    def _scanned(self, graph, delta, sources):
+        """Plans à utiliser et faits (relation, source, destinations) à parcourir."""
+        if delta is None:
+            if sources is None:
+                sources = graph
+            return self.full_plans, ((rel, src, dsts) for src in sources for rel, dsts in graph.get(src, {}).items())
+        return self.delta_plans, ((rel, src, dsts) for rel, by_src in delta.items() for src, dsts in by_src.items())
+
+    def evaluate(self, graph, reverse_graph, relations, delta=None, sources=None, stats=None):
+        """
+        Applique toutes les règles et renvoie (nouvelles relations, compteur par règle).
+        delta=None : chaque règle est jointe sur le graphe complet (ou seulement sur les
+        concepts sources donnés par sources).
+        delta : dictionnaire relation -> source -> destinations ; seuls les faits du delta
+        sont parcourus, joints avec le graphe complet (évaluation semi-naïve).
+        stats : dictionnaire rempli par règle avec [durée, candidats, dérivées, doublons]
+        (voir inferenceProfiler) ; None garde la boucle sans instrumentation.
+        Le compteur par règle ne compte que les relations nouvelles : une relation dérivée par
+        plusieurs règles est attribuée à la première qui la trouve (ordre de parcours des
+        plans), les suivantes la voient comme un doublon. La somme des compteurs est donc le
+        nombre de nouvelles relations.
+        """
+        if stats is not None:
+            return self._evaluate_profiled(graph, reverse_graph, relations, delta, sources, stats)
+        new_relations = set()
+        counts = Counter({rule.name: 0 for rule in self.rules})
+        plans_by_rel, scanned = self._scanned(graph, delta, sources)
+
+        for rel, src, dsts in scanned:
+            plans = plans_by_rel.get(rel)
+            if not plans:
+                continue
+            for plan in plans:
+                head_rel = plan.head_rel
+                h0, h1 = plan.head_slots
+                if plan.probe_rel is None:
+                    for dst in dsts:
+                        values = (src, dst)
+                        if any(values[i] == values[j] for i, j in plan.distinct):
+                            continue
+                        triple = (values[h0], head_rel, values[h1])
+                        if triple not in relations and triple not in new_relations:
+                            new_relations.add(triple)
+                            counts[plan.rule.name] += 1
+                    continue
+                probe_graph = reverse_graph if plan.probe_reverse else graph
+                probe_rel = plan.probe_rel
+                for dst in dsts:
+                    key = dst if plan.key_slot else src
+                    for other in probe_graph.get(key, {}).get(probe_rel, ()):
+                        values = (src, dst, other)
+                        if any(values[i] == values[j] for i, j in plan.distinct):
+                            continue
+                        triple = (values[h0], head_rel, values[h1])
+                        if triple not in relations and triple not in new_relations:
+                            new_relations.add(triple)
+                            counts[plan.rule.name] += 1
+        return new_relations, counts
+
+    def _evaluate_profiled(self, graph, reverse_graph, relations, delta, sources, stats):
+        """Même évaluation que evaluate(), en mesurant chaque plan (durée, candidats, doublons)."""
+        new_relations = set()
+        counts = Counter({rule.name: 0 for rule in self.rules})
+        for rule in self.rules:
+            stats.setdefault(rule.name, new_rule_stats())
+        plans_by_rel, scanned = self._scanned(graph, delta, sources)
+        clock = time.perf_counter
+
+        for rel, src, dsts in scanned:
+            plans = plans_by_rel.get(rel)
+            if not plans:
+                continue
+            for plan in plans:
+                start = clock()
+                head_rel = plan.head_rel
+                h0, h1 = plan.head_slots
+                candidates = rejected = derived = 0
+                if plan.probe_rel is None:
+                    bindings = ((src, dst) for dst in dsts)
+                else:
+                    probe_graph = reverse_graph if plan.probe_reverse else graph
+                    probe_rel = plan.probe_rel
+                    key_slot = plan.key_slot
+                    bindings = ((src, dst, other) for dst in dsts
+                             for other in probe_graph.get(dst if key_slot else src, {}).get(probe_rel, ()))
+                for values in bindings:
+                    candidates += 1
+                    if any(values[i] == values[j] for i, j in plan.distinct):
+                        rejected += 1
+                        continue
+                    triple = (values[h0], head_rel, values[h1])
+                    if triple not in relations and triple not in new_relations:
+                        new_relations.add(triple)
+                        derived += 1
+                rule_stats = stats[plan.rule.name]
+                rule_stats[0] += clock() - start
+                rule_stats[1] += candidates
+                rule_stats[2] += derived
+                # Les candidats écartés par une contrainte [x != y] ne sont pas des doublons
+                rule_stats[3] += candidates - rejected - derived
+                counts[plan.rule.name] += derived
+        return new_relations, counts
+
+    def evaluate_parallel(self, graph, reverse_graph, relations, delta=None, workers=2, chunks_per_worker=4,
+                          stats=None):
+        """
+        Même résultat que evaluate(), réparti sur un pool de processus.
+        Les concepts sources (ou les faits du delta) sont découpés en partitions ; chaque
+        processus évalue les règles sur sa partition et renvoie ses nouvelles relations,
+        fusionnées ensuite. Le graphe, en lecture seule, est hérité par fork (copie à
+        l'écriture) ; sans fork, il est transmis une seule fois par processus à l'initialisation.
+        Les compteurs par règle sont sommés : une relation trouvée dans deux partitions y est
+        comptée deux fois.
+        stats : comme pour evaluate(), sommé sur les partitions (durées cumulées des processus).
+        Un pool est créé à chaque appel : le fork fige le graphe tel qu'il est, un pool gardé
+        d'une itération à l'autre travaillerait sur un graphe périmé. Pour ne pas payer ce
+        démarrage sur les petits deltas, l'évaluation est séquentielle en dessous de
+        PARALLEL_MIN_FACTS faits à parcourir.
+        """
+        global _shared
+        nb_facts = len(relations) if delta is None else sum(
+            len(dsts) for by_src in delta.values() for dsts in by_src.values())
+        if workers < 2 or nb_facts < self.PARALLEL_MIN_FACTS:
+            return self.evaluate(graph, reverse_graph, relations, delta, stats=stats)
+        # Importé ici : multiprocessing coûte ~10 ms à l'import et ne sert qu'en mode parallèle
+        import multiprocessing
+        nb_chunks = workers * chunks_per_worker
+        if delta is None:
+            sources = list(graph)
+            tasks = [(sources[i::nb_chunks], None, stats is not None) for i in range(nb_chunks)]
+        else:
+            parts = [defaultdict(dict) for _ in range(nb_chunks)]
+            for rel, by_src in delta.items():
+                for i, (src, dsts) in enumerate(by_src.items()):
+                    parts[i % nb_chunks][rel][src] = dsts
+            tasks = [(None, dict(part), stats is not None) for part in parts if part]
+
+        if 'fork' in multiprocessing.get_all_start_methods():
+            _shared = (self, graph, reverse_graph, relations)
+            pool = multiprocessing.get_context('fork').Pool(workers)
+        else:
+            state = (self, _plain_graph(graph), _plain_graph(reverse_graph), set(relations))
+            pool = multiprocessing.get_context().Pool(workers, initializer=_init_worker, initargs=(state,))
+        try:
+            with pool:
+                results = pool.map(_evaluate_partition, tasks)
+        finally:
+            _shared = None
+
+        new_relations = set()
+        counts = Counter({rule.name: 0 for rule in self.rules})
+        for partial_relations, partial_counts, partial_stats in results:
+            new_relations.update(partial_relations)
+            counts.update(partial_counts)
+            if stats is not None:
+                merge_rule_stats(stats, partial_stats)
+        return new_relations, counts
+
+
+# État partagé avec les processus de travail : (planner, graphe, graphe inverse, relations)
+_shared = None
+
+
+def _init_worker(state):
+    global _shared
+    _shared = state
+
+
+def _evaluate_partition(task):
+    planner, graph, reverse_graph, relations = _shared
+    sources, delta, profiled = task
+    stats = {} if profiled else None
+    new_relations, counts = planner.evaluate(graph, reverse_graph, relations, delta, sources, stats)
+    return new_relations, counts, stats
+
+
+def _plain_graph(graph):
+    """Copie d'un graphe sous forme de dictionnaires simples (sérialisables par pickle)."""
+    return {src: {rel: set(dsts) for rel, dsts in rels.items()} for src, rels in graph.items()}
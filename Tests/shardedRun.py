@@ -0,0 +1,395 @@
+import glob
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+
+from checkpointStore import CheckpointStore, scan_journal, iter_checkpoint, write_json
+
+# Disposition du répertoire partagé :
+#   plan.json                      découpage (start, end, shard_size), écrit par le premier worker
+#   leases/<tranche>.<n>.lease     bail de génération n sur une tranche (propriétaire, échéance)
+#   done/<tranche>.json            tranche terminée (nombre d'ids enregistrés)
+#   shards/<tranche>/<worker>.jsonl  journal de chaque worker ayant travaillé sur la tranche (y
+#                                    compris les ids sans mot dans le dictionnaire, notés absents)
+PLAN_FILE = "plan.json"
+DEFAULT_TTL = 300.0
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Shard:
+    """Tranche d'ids [start, end] (bornes incluses)."""
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.name = f"{start:06d}-{end:06d}"
+
+    def __len__(self):
+        return self.end - self.start + 1
+
+    def __repr__(self):
+        return f"Shard({self.start}, {self.end})"
+
+
+def split_shards(start_id, end_id, shard_size):
+    """Découpe [start_id, end_id] en tranches de shard_size ids (la dernière peut être plus courte)."""
+    return [Shard(s, min(s + shard_size - 1, end_id)) for s in range(start_id, end_id + 1, shard_size)]
+
+
+def _write_exclusive(path, payload):
+    """Crée path avec payload, de façon atomique ; False si le fichier existe déjà."""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+        f.flush()
+        os.fsync(f.fileno())
+    try:
+        # link() échoue si la cible existe : le contenu est complet dès que le fichier apparaît
+        os.link(tmp_path, path)
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.unlink(tmp_path)
+
+
+def _read_json(path):
+    """Contenu JSON de path, ou None s'il n'existe pas ou est illisible."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class ShardDirectory:
+    """
+    Répertoire partagé (disque local ou montage réseau) d'une génération en tranches. Le
+    premier worker y fixe le découpage ; les suivants doivent demander le même.
+    """
+
+    def __init__(self, path, start_id=None, end_id=None, shard_size=None):
+        self.path = path
+        for sub in ("leases", "done", "shards"):
+            os.makedirs(os.path.join(path, sub), exist_ok=True)
+        plan_path = os.path.join(path, PLAN_FILE)
+        if start_id is not None:
+            plan = {"start": start_id, "end": end_id, "shard_size": shard_size}
+            if not _write_exclusive(plan_path, plan):
+                existing = _read_json(plan_path)
+                if existing != plan:
+                    raise ValueError(f"Le répertoire {path} contient déjà un découpage différent : {existing}")
+        plan = _read_json(plan_path)
+        if plan is None:
+            raise FileNotFoundError(f"Aucun découpage dans {path} (lancez d'abord un worker avec --start/--end)")
+        self.plan = plan
+        self.shards = split_shards(plan["start"], plan["end"], plan["shard_size"])
+
+    @property
+    def leases_dir(self):
+        return os.path.join(self.path, "leases")
+
+    def done_path(self, shard):
+        return os.path.join(self.path, "done", f"{shard.name}.json")
+
+    def journals(self, shard):
+        return sorted(glob.glob(os.path.join(self.path, "shards", shard.name, "*.jsonl")))
+
+    def _scan(self, shard):
+        """(ids ayant une entrée, ids seulement notés absents) de la tranche, tous workers confondus."""
+        ids, absent = set(), set()
+        for journal in self.journals(shard):
+            journal_ids, journal_absent = scan_journal(journal)
+            ids |= journal_ids
+            absent |= journal_absent
+        return ids, absent - ids
+
+    def absent_ids(self, shard):
+        """Ids de la tranche notés sans mot dans le dictionnaire, tous workers confondus."""
+        return self._scan(shard)[1]
+
+    def missing_ids(self, shard):
+        """Ids de la tranche ni enregistrés ni notés absents du dictionnaire."""
+        ids = {str(id) for id in range(shard.start, shard.end + 1)}
+        return ids - self.saved_ids(shard)
+
+    def is_done(self, shard):
+        return os.path.exists(self.done_path(shard))
+
+    def saved_ids(self, shard):
+        """Ids déjà enregistrés ou notés absents pour la tranche, tous workers confondus."""
+        ids, absent = self._scan(shard)
+        return ids | absent
+
+    def open_store(self, shard, worker_id):
+        """Journal propre au worker pour la tranche ; il connaît aussi les ids des autres journaux."""
+        directory = os.path.join(self.path, "shards", shard.name)
+        os.makedirs(directory, exist_ok=True)
+        return ShardStore(os.path.join(directory, f"{worker_id}.jsonl"), self.saved_ids(shard))
+
+    def mark_done(self, shard, worker_id):
+        ids, absent = self._scan(shard)
+        write_json({"worker": worker_id, "saved": len(ids), "absent": len(absent), "size": len(shard),
+                    "finished": time.time()}, self.done_path(shard))
+
+    def reopen(self, shard):
+        """Rend une tranche terminée à nouveau réclamable (pour retenter ses ids manquants)."""
+        _unlink(self.done_path(shard))
+
+    def status(self):
+        """État de chaque tranche : (tranche, 'terminée' | 'en cours' | 'libre', détails)."""
+        now = time.time()
+        rows = []
+        for shard in self.shards:
+            done = _read_json(self.done_path(shard))
+            if done is not None:
+                rows.append((shard, "terminée", done))
+                continue
+            lease = current_lease(self.leases_dir, shard.name)
+            if lease is not None and lease["expires"] > now:
+                rows.append((shard, "en cours", lease))
+            else:
+                rows.append((shard, "libre", lease))
+        return rows
+
+
+class ShardStore(CheckpointStore):
+    """Journal d'un worker pour une tranche ; `id in store` tient compte des autres journaux."""
+
+    def __init__(self, path, other_ids=(), **options):
+        super().__init__(path, **options)
+        self._ids |= set(other_ids)
+
+
+def _lease_generations(directory, name):
+    """Générations des fichiers de bail d'une tranche, de la plus récente à la plus ancienne."""
+    pattern = re.compile(rf"^{re.escape(name)}\.(\d+)\.lease$")
+    try:
+        files = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted((int(m.group(1)) for m in map(pattern.match, files) if m), reverse=True)
+
+
+def _lease_file(directory, name, generation):
+    return os.path.join(directory, f"{name}.{generation}.lease")
+
+
+def current_lease(directory, name):
+    """Contenu du bail le plus récent d'une tranche, ou None."""
+    for generation in _lease_generations(directory, name):
+        lease = _read_json(_lease_file(directory, name, generation))
+        if lease is not None:
+            return lease
+    return None
+
+
+class Lease:
+    """
+    Bail exclusif d'un worker sur une tranche, renouvelé par un thread toutes les ttl / 3
+    secondes. Un bail dont l'échéance est passée (worker arrêté ou figé) peut être repris
+    par un autre worker. Les échéances sont en temps absolu : les horloges des machines
+    doivent être synchronisées (NTP) à bien moins que ttl près.
+
+    Chaque prise de bail crée un fichier de génération n + 1, de façon exclusive : entre
+    plusieurs workers qui voient le même bail expiré, un seul réussit, et aucun fichier
+    d'un bail valide n'est jamais déplacé ni supprimé. Un bail rendu est marqué expiré, pas
+    supprimé, pour que les générations ne reviennent jamais en arrière.
+
+    Si le bail est repris pendant que son propriétaire travaille encore (figé plus de ttl
+    secondes), lost est positionné au prochain renouvellement : le propriétaire s'arrête au
+    mot suivant et laisse la tranche au nouveau. Les deux workers écrivent dans des journaux
+    distincts : les mots en cours sont au pire traités deux fois, sans perte.
+    """
+
+    def __init__(self, directory, name, generation, owner, ttl):
+        self.directory = directory
+        self.name = name
+        self.generation = generation
+        self.path = _lease_file(directory, name, generation)
+        self.owner = owner
+        self.ttl = ttl
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _payload(self, expires=None):
+        return {"owner": self.owner, "generation": self.generation, "host": socket.gethostname(),
+                "pid": os.getpid(), "expires": time.time() + self.ttl if expires is None else expires}
+
+    @classmethod
+    def acquire(cls, directory, name, owner, ttl=DEFAULT_TTL):
+        """Prend le bail s'il est libre ou expiré ; renvoie le Lease (renouvelé en tâche de fond) ou None."""
+        generations = _lease_generations(directory, name)
+        top = generations[0] if generations else -1
+        if top >= 0:
+            current = _read_json(_lease_file(directory, name, top))
+            # current None : une prise plus récente vient de nettoyer ce fichier
+            if current is None or current["expires"] > time.time():
+                return None
+        lease = cls(directory, name, top + 1, owner, ttl)
+        if not _write_exclusive(lease.path, lease._payload()):
+            return None
+        for generation in generations:
+            _unlink(_lease_file(directory, name, generation))
+        lease._thread = threading.Thread(target=lease._heartbeat, daemon=True)
+        lease._thread.start()
+        return lease
+
+    def _superseded(self):
+        generations = _lease_generations(self.directory, self.name)
+        return bool(generations) and generations[0] > self.generation
+
+    def _write(self, payload):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self.path)
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.ttl / 3):
+            if not self.renew():
+                self.lost.set()
+                return
+
+    def renew(self):
+        """Repousse l'échéance ; False si un autre worker a repris la tranche."""
+        if self._superseded():
+            return False
+        self._write(self._payload())
+        if self._superseded():
+            # Repris entre-temps : l'écriture a recréé un fichier déjà nettoyé
+            _unlink(self.path)
+            return False
+        return True
+
+    def release(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if not self._superseded():
+            self._write(self._payload(expires=0))
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def run_worker(directory, process_shard, worker_id=None, ttl=DEFAULT_TTL, wait=False, poll=10.0):
+    """
+    Réclame les tranches libres (ou au bail expiré) une à une et appelle
+    process_shard(shard, store, stop) pour chacune : store est le journal du worker pour la
+    tranche, stop un threading.Event positionné si le bail est repris par un autre worker,
+    auquel cas process_shard doit s'arrêter avant le mot suivant.
+    Une tranche n'est marquée terminée que si le bail est toujours tenu et que chacun de ses
+    ids est enregistré ou noté absent du dictionnaire (CheckpointStore.mark_absent). Une
+    tranche laissée incomplète (mots en échec) n'est pas réclamée à nouveau par ce worker :
+    un passage suivant la reprend.
+    Sans wait, s'arrête quand il ne reste rien à réclamer ; avec wait, attend (toutes les
+    poll secondes) que les tranches tenues par d'autres se terminent ou que leur bail expire.
+    Renvoie la liste des tranches terminées par ce worker.
+    """
+    worker_id = worker_id or default_worker_id()
+    processed = []
+    # Tranches laissées par ce worker (bail perdu ou ids manquants)
+    left = set()
+    while True:
+        pending = [shard for shard in directory.shards
+                   if not directory.is_done(shard) and shard.name not in left]
+        if not pending:
+            return processed
+        claimed = False
+        for shard in pending:
+            lease = Lease.acquire(directory.leases_dir, shard.name, worker_id, ttl)
+            if lease is None:
+                continue
+            try:
+                # Terminée pendant qu'on réclamait le bail
+                if directory.is_done(shard):
+                    continue
+                claimed = True
+                store = directory.open_store(shard, worker_id)
+                process_shard(shard, store, lease.lost)
+                # Bail repris (le nouveau propriétaire terminera la tranche) ou mots en échec
+                if lease.lost.is_set() or directory.missing_ids(shard):
+                    left.add(shard.name)
+                    continue
+                directory.mark_done(shard, worker_id)
+                processed.append(shard)
+            finally:
+                lease.release()
+        if not claimed:
+            if not wait:
+                return processed
+            time.sleep(poll)
+
+
+def merge(directory, output):
+    """
+    Réunit les journaux de toutes les tranches en un seul jeu de résultats {id: entrée}
+    (format JSON historique, lu par extract_ontology_from_json), par ordre d'id. Si un id a
+    été traité par plusieurs workers (mot encore en cours quand le bail a été repris),
+    l'entrée du worker qui a terminé la tranche l'emporte ; sinon, et pour les tranches non
+    terminées, celle du journal modifié en dernier (les entrées ne sont pas datées).
+    Renvoie (nombre d'entrées, tranches non terminées).
+    """
+    data = {}
+    unfinished = []
+    for shard in directory.shards:
+        if not directory.is_done(shard):
+            unfinished.append(shard)
+        done = _read_json(directory.done_path(shard)) or {}
+        finisher = f"{done.get('worker')}.jsonl"
+        # Le journal du worker qui a terminé la tranche est lu en dernier
+        journals = sorted(directory.journals(shard),
+                          key=lambda journal: (os.path.basename(journal) == finisher, os.path.getmtime(journal)))
+        for journal in journals:
+            data.update(iter_checkpoint(journal))
+    merged = {id: data[id] for id in sorted(data, key=int)}
+    write_json(merged, output)
+    return len(merged), unfinished
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Génération en tranches : état, fusion et réouverture des tranches")
+    parser.add_argument("command", choices=["status", "merge", "reopen"],
+                        help="status : état des tranches ; merge : fusion en un JSON ; reopen : rouvre les tranches incomplètes")
+    parser.add_argument("--shard-dir", required=True, help="Répertoire partagé de la génération")
+    parser.add_argument("--out", type=str, default="concepts_ontologie.json", help="Fichier JSON produit par merge")
+    args = parser.parse_args()
+
+    directory = ShardDirectory(args.shard_dir)
+    if args.command == "status":
+        now = time.time()
+        for shard, state, details in directory.status():
+            saved = len(directory.saved_ids(shard))
+            line = f"{shard.name} : {state:<9} {saved:>5}/{len(shard)} ids"
+            if state == "en cours":
+                line += f" — {details['owner']}, bail encore {details['expires'] - now:.0f} s"
+            elif state == "libre" and details is not None:
+                line += f" — bail expiré de {details['owner']}"
+            print(line)
+    elif args.command == "merge":
+        count, unfinished = merge(directory, args.out)
+        print(f"{count} entrées fusionnées dans {args.out}")
+        if unfinished:
+            print(f"⚠️ {len(unfinished)} tranche(s) non terminée(s) : {', '.join(s.name for s in unfinished)}")
+    else:
+        # Tranche marquée terminée avec des ids manquants (marque d'une version antérieure, ou
+        # journal supprimé depuis) : rouvrir la tranche les fait retenter
+        reopened = [shard for shard in directory.shards
+                    if directory.is_done(shard) and directory.missing_ids(shard)]
+        for shard in reopened:
+            directory.reopen(shard)
+        print(f"{len(reopened)} tranche(s) rouverte(s)")
@@ -0,0 +1,146 @@
+class TransitiveClosure:
+    """
+    Clôture transitive d'une relation binaire, calculée en une seule passe.
+
+    Les composantes fortement connexes (algorithme de Tarjan, itératif) sont fusionnées, puis
+    l'accessibilité est propagée sur le DAG condensé sous forme de bitsets (entiers Python,
+    un bit par composante). Tarjan produit les composantes dans l'ordre topologique inverse :
+    quand une composante est fermée, tout ce qu'elle atteint est déjà calculé.
+
+    L'objet sert directement d'index d'accessibilité (reaches) ; pairs() ne matérialise les
+    couples que si on le lui demande.
+    """
+
+    def __init__(self, edges):
+        """edges: itérable de couples (source, destination)."""
+        self.nodes = []         # id -> noeud
+        self.node_ids = {}      # noeud -> id
+        successors = []
+        for src, dst in edges:
+            s = self._intern(src, successors)
+            d = self._intern(dst, successors)
+            successors[s].add(d)
+
+        self.component = [-1] * len(self.nodes)   # id noeud -> id composante
+        self.members = []                          # id composante -> ids des noeuds
+        self.reach = []                            # id composante -> bitset des composantes atteintes
+        self._condense(successors)
+
+    def _intern(self, node, successors):
+        nid = self.node_ids.get(node)
+        if nid is None:
+            nid = len(self.nodes)
+            self.nodes.append(node)
+            self.node_ids[node] = nid
+            successors.append(set())
+        return nid
+
+    def _condense(self, successors):
+        n = len(self.nodes)
+        index = [-1] * n
+        low = [0] * n
+        on_stack = [False] * n
+        stack = []
+        counter = 0
+        adjacency = [list(s) for s in successors]
+
+        for root in range(n):
+            if index[root] != -1:
+                continue
+            work = [(root, 0)]
+            while work:
+                v, i = work[-1]
+                if i == 0:
+                    index[v] = low[v] = counter
+                    counter += 1
+                    stack.append(v)
+                    on_stack[v] = True
+                succ = adjacency[v]
+                descended = False
+                while i < len(succ):
+                    w = succ[i]
+                    i += 1
+                    if index[w] == -1:
+                        work[-1] = (v, i)
+                        work.append((w, 0))
+                        descended = True
+                        break
+                    if on_stack[w] and index[w] < low[v]:
+                        low[v] = index[w]
+                if descended:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    if low[v] < low[parent]:
+                        low[parent] = low[v]
+                if low[v] == index[v]:
+                    self._close_component(v, stack, on_stack, successors)
+
+    def _close_component(self, root, stack, on_stack, successors):
+        cid = len(self.members)
+        members = []
+        while True:
+            w = stack.pop()
+            on_stack[w] = False
+            self.component[w] = cid
+            members.append(w)
+            if w == root:
+                break
+        bits = 0
+        cyclic = len(members) > 1
+        for m in members:
+            for w in successors[m]:
+                other = self.component[w]
+                if other == cid:
+                    cyclic = True
+                else:
+                    bits |= (1 << other) | self.reach[other]
+        if cyclic:
+            bits |= 1 << cid
+        self.members.append(members)
+        self.reach.append(bits)
+
+    @staticmethod
+    def _bits(bits):
+        while bits:
+            low = bits & -bits
+            yield low.bit_length() - 1
+            bits ^= low
+
+    def reaches(self, src, dst):
+        """Vrai si dst est atteignable depuis src par un chemin d'au moins une arête."""
+        s = self.node_ids.get(src)
+        d = self.node_ids.get(dst)
+        if s is None or d is None:
+            return False
+        return bool(self.reach[self.component[s]] >> self.component[d] & 1)
+
+    def descendants(self, src):
+        """Ensemble des noeuds atteignables depuis src (src inclus seulement s'il est sur un cycle)."""
+        s = self.node_ids.get(src)
+        if s is None:
+            return set()
+        nodes = self.nodes
+        return {nodes[m] for c in self._bits(self.reach[self.component[s]]) for m in self.members[c]}
+
+    def pairs(self):
+        """Itère sur tous les couples (a, c) de la clôture, avec a != c."""
+        nodes = self.nodes
+        for cid, members in enumerate(self.members):
+            targets = [m for c in self._bits(self.reach[cid]) for m in self.members[c]]
+            for a in members:
+                for c in targets:
+                    if a != c:
+                        yield nodes[a], nodes[c]
+
+    def pair_count(self):
+        """Nombre de couples (a, c) de la clôture avec a != c, sans les matérialiser."""
+        sizes = [len(members) for members in self.members]
+        total = 0
+        for cid, size in enumerate(sizes):
+            reached = sum(sizes[c] for c in self._bits(self.reach[cid]))
+            if self.reach[cid] >> cid & 1:
+                reached -= 1
+            total += size * reached
+        return total
@@ -0,0 +1,330 @@
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Mapping, Set
+
+
+class CompactTripleStore:
+    """
+    Stockage compact des triplets (source, relation, destination).
+
+    Les concepts et les types de relation sont internés en petits entiers. Pour chaque type
+    de relation, l'adjacence est rangée au format CSR (offsets + cibles triées dans des
+    `array('I')`), dans les deux sens. Les ajouts et retraits récents sont gardés dans un
+    petit tampon, fusionné dans les tableaux par compact() (automatiquement quand le tampon
+    devient trop gros par rapport au reste).
+    Compromis : environ 10 fois moins de mémoire que des tuples dans un set et des dictionnaires
+    imbriqués, mais chaque accès encode et décode les concepts ; lues par les vues
+    (triples_view, graph_view), les inférences sont environ 2 fois plus lentes.
+    """
+
+    # Fraction du nombre de triplets compactés au-delà de laquelle le tampon est fusionné
+    COMPACT_RATIO = 0.25
+    COMPACT_MIN = 1024
+
+    def __init__(self, triples=()):
+        self.concepts = []          # id -> concept
+        self.concept_ids = {}       # concept -> id
+        self.relation_types = []    # id -> type de relation
+        self.relation_ids = {}      # type de relation -> id
+        self._forward = {}          # id relation -> (offsets, cibles) source -> destinations
+        self._backward = {}         # id relation -> (offsets, cibles) destination -> sources
+        self._compacted = 0         # nombre de triplets rangés dans les tableaux CSR
+        self._pending = defaultdict(lambda: defaultdict(set))
+        self._pending_reverse = defaultdict(lambda: defaultdict(set))
+        self._pending_count = 0
+        self._removed = set()       # triplets (s, r, d) compactés mais retirés depuis
+        self._size = 0
+        # Chargement initial directement au format CSR, sans passer par le tampon
+        pairs_by_rel = defaultdict(list)
+        for src, rel, dst in triples:
+            pairs_by_rel[self.intern_relation(rel)].append((self.intern_concept(src), self.intern_concept(dst)))
+        self._rebuild(pairs_by_rel)
+
+    # ---------- INTERNEMENT ----------
+
+    def intern_concept(self, concept):
+        cid = self.concept_ids.get(concept)
+        if cid is None:
+            cid = len(self.concepts)
+            self.concepts.append(concept)
+            self.concept_ids[concept] = cid
+        return cid
+
+    def intern_relation(self, rel):
+        rid = self.relation_ids.get(rel)
+        if rid is None:
+            rid = len(self.relation_types)
+            self.relation_types.append(rel)
+            self.relation_ids[rel] = rid
+        return rid
+
+    def _encode(self, triple):
+        """Renvoie le triplet sous forme d'entiers, ou None si un élément n'a jamais été vu."""
+        src, rel, dst = triple
+        s = self.concept_ids.get(src)
+        r = self.relation_ids.get(rel)
+        d = self.concept_ids.get(dst)
+        if s is None or r is None or d is None:
+            return None
+        return s, r, d
+
+    # ---------- LECTURE ----------
+
+    def _csr_slice(self, index, rid, cid):
+        csr = index.get(rid)
+        if csr is None:
+            return None, 0, 0
+        offsets, targets = csr
+        if cid + 1 >= len(offsets):
+            return targets, 0, 0
+        return targets, offsets[cid], offsets[cid + 1]
+
+    def _contains_ids(self, s, r, d):
+        if d in self._pending.get(r, {}).get(s, ()):
+            return True
+        targets, lo, hi = self._csr_slice(self._forward, r, s)
+        if lo == hi:
+            return False
+        pos = bisect_left(targets, d, lo, hi)
+        return pos < hi and targets[pos] == d and (s, r, d) not in self._removed
+
+    def neighbor_ids(self, rid, cid, reverse=False):
+        """Itère sur les voisins (ids) de cid pour la relation rid, dans un sens ou dans l'autre."""
+        index = self._backward if reverse else self._forward
+        targets, lo, hi = self._csr_slice(index, rid, cid)
+        if self._removed:
+            for i in range(lo, hi):
+                other = targets[i]
+                key = (other, rid, cid) if reverse else (cid, rid, other)
+                if key not in self._removed:
+                    yield other
+        else:
+            for i in range(lo, hi):
+                yield targets[i]
+        pending = self._pending_reverse if reverse else self._pending
+        yield from pending.get(rid, {}).get(cid, ())
+
+    def has_neighbors(self, rid, cid, reverse=False):
+        pending = self._pending_reverse if reverse else self._pending
+        if pending.get(rid, {}).get(cid):
+            return True
+        targets, lo, hi = self._csr_slice(self._backward if reverse else self._forward, rid, cid)
+        if lo == hi:
+            return False
+        if not self._removed:
+            return True
+        for _ in self.neighbor_ids(rid, cid, reverse):
+            return True
+        return False
+
+    def __contains__(self, triple):
+        encoded = self._encode(triple)
+        return encoded is not None and self._contains_ids(*encoded)
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        concepts = self.concepts
+        for rid, rel in enumerate(self.relation_types):
+            for s in range(len(concepts)):
+                for d in self.neighbor_ids(rid, s):
+                    yield concepts[s], rel, concepts[d]
+
+    # ---------- ÉCRITURE ----------
+
+    def add(self, triples):
+        """Ajoute des triplets et renvoie la liste de ceux qui étaient absents."""
+        added = []
+        for triple in triples:
+            src, rel, dst = triple
+            s = self.intern_concept(src)
+            r = self.intern_relation(rel)
+            d = self.intern_concept(dst)
+            if (s, r, d) in self._removed:
+                self._removed.discard((s, r, d))
+            elif self._contains_ids(s, r, d):
+                continue
+            else:
+                self._pending[r][s].add(d)
+                self._pending_reverse[r][d].add(s)
+                self._pending_count += 1
+            self._size += 1
+            added.append(triple)
+        if self._pending_count + len(self._removed) > max(self.COMPACT_MIN, self._compacted * self.COMPACT_RATIO):
+            self.compact()
+        return added
+
+    def remove(self, triples):
+        """Retire des triplets et renvoie la liste de ceux qui étaient présents."""
+        removed = []
+        for triple in triples:
+            encoded = self._encode(triple)
+            if encoded is None or not self._contains_ids(*encoded):
+                continue
+            s, r, d = encoded
+            pending = self._pending.get(r, {}).get(s)
+            if pending is not None and d in pending:
+                pending.discard(d)
+                self._pending_reverse[r][d].discard(s)
+                self._pending_count -= 1
+            else:
+                self._removed.add(encoded)
+            self._size -= 1
+            removed.append(triple)
+        return removed
+
+    @staticmethod
+    def _build_csr(pairs, nb_concepts):
+        """Construit (offsets, cibles) à partir de couples (clé, valeur) d'entiers, sans doublons."""
+        pairs.sort()
+        offsets = array('I', [0]) * (nb_concepts + 1)
+        targets = array('I')
+        last = None
+        for pair in pairs:
+            if pair != last:
+                offsets[pair[0] + 1] += 1
+                targets.append(pair[1])
+                last = pair
+        for i in range(nb_concepts):
+            offsets[i + 1] += offsets[i]
+        return offsets, targets
+
+    @staticmethod
+    def _csr_pairs(offsets, targets):
+        for key in range(len(offsets) - 1):
+            for i in range(offsets[key], offsets[key + 1]):
+                yield key, targets[i]
+
+    def _rebuild(self, pairs_by_rel):
+        """Remplace les tableaux CSR par ceux construits à partir de couples (source, destination)."""
+        nb_concepts = len(self.concepts)
+        forward, backward = {}, {}
+        size = 0
+        for rid, pairs in pairs_by_rel.items():
+            if not pairs:
+                continue
+            backward[rid] = self._build_csr([(d, s) for s, d in pairs], nb_concepts)
+            forward[rid] = self._build_csr(pairs, nb_concepts)
+            size += len(forward[rid][1])
+        self._forward, self._backward = forward, backward
+        self._pending.clear()
+        self._pending_reverse.clear()
+        self._pending_count = 0
+        self._removed.clear()
+        self._size = self._compacted = size
+
+    def compact(self):
+        """Fusionne le tampon d'ajouts/retraits dans les tableaux CSR."""
+        pairs_by_rel = defaultdict(list)
+        removed = self._removed
+        for rid, (offsets, targets) in self._forward.items():
+            pairs_by_rel[rid] = [(s, d) for s, d in self._csr_pairs(offsets, targets)
+                                 if not removed or (s, rid, d) not in removed]
+        for rid, by_src in self._pending.items():
+            pairs_by_rel[rid].extend((s, d) for s, dsts in by_src.items() for d in dsts)
+        self._rebuild(pairs_by_rel)
+
+    # ---------- VUES ----------
+
+    def triples_view(self):
+        return TripleSetView(self)
+
+    def graph_view(self, reverse=False):
+        return GraphView(self, reverse)
+
+
+class TripleSetView(Set):
+    """Vue ensembliste de tuples (source, relation, destination) sur un CompactTripleStore."""
+
+    def __init__(self, store):
+        self.store = store
+
+    @classmethod
+    def _from_iterable(cls, it):
+        return set(it)
+
+    def __contains__(self, triple):
+        return triple in self.store
+
+    def __iter__(self):
+        return iter(self.store)
+
+    def __len__(self):
+        return len(self.store)
+
+
+class GraphView(Mapping):
+    """Vue concept -> relation -> ensemble de concepts, équivalente à relation_graph."""
+
+    def __init__(self, store, reverse=False):
+        self.store = store
+        self.reverse = reverse
+
+    def _has_edges(self, cid):
+        store = self.store
+        return any(store.has_neighbors(rid, cid, self.reverse) for rid in range(len(store.relation_types)))
+
+    def __getitem__(self, concept):
+        cid = self.store.concept_ids.get(concept)
+        if cid is None or not self._has_edges(cid):
+            raise KeyError(concept)
+        return ConceptView(self.store, cid, self.reverse)
+
+    def __contains__(self, concept):
+        cid = self.store.concept_ids.get(concept)
+        return cid is not None and self._has_edges(cid)
+
+    def get(self, concept, default=None):
+        # Sans vérifier qu'il a des arêtes : la vue d'un concept isolé se comporte comme {}
+        cid = self.store.concept_ids.get(concept)
+        if cid is None:
+            return default
+        return ConceptView(self.store, cid, self.reverse)
+
+    def __iter__(self):
+        concepts = self.store.concepts
+        for cid in range(len(concepts)):
+            if self._has_edges(cid):
+                yield concepts[cid]
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class ConceptView(Mapping):
+    """Vue relation -> ensemble de concepts voisins pour un concept donné."""
+
+    def __init__(self, store, cid, reverse=False):
+        self.store = store
+        self.cid = cid
+        self.reverse = reverse
+
+    def get(self, rel, default=None):
+        store = self.store
+        rid = store.relation_ids.get(rel)
+        if rid is None:
+            return default
+        concepts = store.concepts
+        neighbors = frozenset(concepts[other] for other in store.neighbor_ids(rid, self.cid, self.reverse))
+        return neighbors if neighbors else default
+
+    def __getitem__(self, rel):
+        neighbors = self.get(rel)
+        if neighbors is None:
+            raise KeyError(rel)
+        return neighbors
+
+    def __contains__(self, rel):
+        rid = self.store.relation_ids.get(rel)
+        return rid is not None and self.store.has_neighbors(rid, self.cid, self.reverse)
+
+    def __iter__(self):
+        store = self.store
+        for rid, rel in enumerate(store.relation_types):
+            if store.has_neighbors(rid, self.cid, self.reverse):
+                yield rel
+
+    def __len__(self):
+        return sum(1 for _ in self)
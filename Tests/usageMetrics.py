@@ -0,0 +1,112 @@
+import json
+import threading
+import time
+from collections import defaultdict
+
+
+def percentile(sorted_values, fraction):
+    """Percentile (rang le plus proche) d'une liste déjà triée ; None si elle est vide."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _new_totals():
+    return {"requests": 0, "errors": 0, "cached": 0, "input_tokens": 0, "output_tokens": 0,
+            "seconds": 0.0, "cost": 0.0}
+
+
+class UsageMetrics:
+    """
+    Comptabilité des appels au backend LLM à partir de l'usage qu'il renvoie réellement
+    (tokens d'entrée et de sortie), avec la latence de chaque requête. Les totaux sont tenus
+    globalement, par mot et par relation ; snapshot() donne les débits, percentiles de
+    latence, taux d'erreur et dépense depuis le début, à tout moment et depuis n'importe quel
+    thread. Les réponses servies par le cache sont comptées à part (ni tokens ni coût).
+
+    prices : {backend: (coût par million de tokens d'entrée, coût par million de sortie)} ;
+    un backend absent (Ollama) ne coûte rien.
+    """
+
+    def __init__(self, prices=None):
+        self.prices = prices or {}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._latencies = []
+        self._backend_seconds = 0.0
+        self.totals = _new_totals()
+        self.by_word = defaultdict(_new_totals)
+        self.by_relation = defaultdict(_new_totals)
+
+    def cost(self, backend, input_tokens, output_tokens):
+        price_in, price_out = self.prices.get(backend, (0.0, 0.0))
+        return input_tokens / 1_000_000 * price_in + output_tokens / 1_000_000 * price_out
+
+    def record(self, backend, word, relation, latency, usage=None, error=False, cached=False):
+        """
+        Enregistre une requête. usage : {"input_tokens", "output_tokens"} tels que renvoyés
+        par le backend, et éventuellement "backend_seconds" (temps de calcul annoncé par Ollama).
+        """
+        usage = usage or {}
+        input_tokens = usage.get("input_tokens") or 0
+        output_tokens = usage.get("output_tokens") or 0
+        cost = self.cost(backend, input_tokens, output_tokens)
+        with self._lock:
+            for totals in (self.totals, self.by_word[word], self.by_relation[relation]):
+                totals["requests"] += 1
+                totals["errors"] += error
+                totals["cached"] += cached
+                totals["input_tokens"] += input_tokens
+                totals["output_tokens"] += output_tokens
+                totals["seconds"] += latency
+                totals["cost"] += cost
+            if not cached:
+                self._latencies.append(latency)
+            self._backend_seconds += usage.get("backend_seconds") or 0.0
+
+    def mean_request_cost(self):
+        """Coût moyen d'une requête au backend (hors cache), ou None avant la première."""
+        with self._lock:
+            calls = self.totals["requests"] - self.totals["cached"]
+            return self.totals["cost"] / calls if calls else None
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = time.monotonic() - self._started
+            totals = dict(self.totals)
+            latencies = sorted(self._latencies)
+            backend_seconds = self._backend_seconds
+        calls = totals["requests"] - totals["cached"]
+        tokens = totals["input_tokens"] + totals["output_tokens"]
+        return {
+            "elapsed_seconds": elapsed,
+            **totals,
+            "requests_per_second": totals["requests"] / elapsed if elapsed else 0.0,
+            "tokens_per_second": tokens / elapsed if elapsed else 0.0,
+            "output_tokens_per_second": totals["output_tokens"] / elapsed if elapsed else 0.0,
+            "error_rate": totals["errors"] / calls if calls else 0.0,
+            "latency_p50": percentile(latencies, 0.50),
+            "latency_p95": percentile(latencies, 0.95),
+            "latency_p99": percentile(latencies, 0.99),
+            "mean_input_tokens": totals["input_tokens"] / calls if calls else None,
+            "mean_output_tokens": totals["output_tokens"] / calls if calls else None,
+            "backend_seconds": backend_seconds,
+        }
+
+    def summary(self):
+        snap = self.snapshot()
+        p50 = f"{snap['latency_p50']:.2f}" if snap["latency_p50"] is not None else "-"
+        p95 = f"{snap['latency_p95']:.2f}" if snap["latency_p95"] is not None else "-"
+        return (f"{snap['requests_per_second']:.1f} req/s, {snap['tokens_per_second']:.0f} tok/s, "
+                f"p50/p95 {p50}/{p95}s, erreurs {snap['error_rate']:.1%}, dépensé {snap['cost']:.4f} $")
+
+    def report(self):
+        with self._lock:
+            by_word = {word: dict(totals) for word, totals in self.by_word.items()}
+            by_relation = {relation: dict(totals) for relation, totals in self.by_relation.items()}
+        return {"totals": self.snapshot(), "by_relation": by_relation, "by_word": by_word}
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
@@ -0,0 +1,136 @@
+import queue
+import threading
+
+
+class _Word:
+    __slots__ = ("seq", "key", "results", "remaining", "error")
+
+    def __init__(self, seq, key, size):
+        self.seq = seq
+        self.key = key
+        self.results = [None] * size
+        self.remaining = size
+        self.error = None
+
+
+class WordPool:
+    """
+    Pool de threads persistant pour les requêtes de tous les mots.
+
+    Chaque mot est soumis comme une liste de tâches (fonctions sans argument) ; les threads
+    prennent les tâches dans une file commune, quel que soit leur mot : une relation lente
+    n'occupe qu'un thread, les autres passent aux mots suivants. Quand toutes les tâches
+    d'un mot sont terminées, on_word(key, résultats) est appelé avec les résultats dans
+    l'ordre des tâches, par un thread de livraison dédié : un seul appel à la fois, on peut y
+    écrire sur disque sans bloquer les threads de requêtes.
+
+    max_words borne le nombre de mots soumis et pas encore livrés : submit() bloque au-delà,
+    ce qui borne aussi la file. ordered=True livre les mots dans l'ordre de soumission (un mot
+    lent retient alors les suivants) ; sinon, dans l'ordre où ils se terminent. Un mot dont
+    une tâche lève une exception n'est pas livré ; l'erreur est ajoutée à errors.
+    """
+
+    def __init__(self, workers=8, max_words=4, ordered=False, on_word=None):
+        self.ordered = ordered
+        self.on_word = on_word
+        self.errors = []
+        self.delivered = 0
+        self._tasks = queue.Queue()
+        self._word_slots = threading.BoundedSemaphore(max_words)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending_words = 0
+        self._next_seq = 0
+        self._next_delivery = 0
+        self._ready = {}
+        self._deliveries = queue.Queue()
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+        self._delivery_thread = threading.Thread(target=self._delivery_loop, daemon=True)
+        self._delivery_thread.start()
+
+    def submit(self, key, tasks):
+        """Soumet les tâches d'un mot ; bloque tant que max_words mots sont en cours."""
+        self._word_slots.acquire()
+        with self._lock:
+            word = _Word(self._next_seq, key, len(tasks))
+            self._next_seq += 1
+            self._pending_words += 1
+            if not tasks:
+                self._complete(word)
+                return
+        for index, task in enumerate(tasks):
+            self._tasks.put((word, index, task))
+
+    def _worker(self):
+        while True:
+            item = self._tasks.get()
+            if item is None:
+                return
+            word, index, task = item
+            try:
+                result, error = task(), None
+            except Exception as e:
+                result, error = None, e
+            with self._lock:
+                word.results[index] = result
+                if error is not None and word.error is None:
+                    word.error = error
+                word.remaining -= 1
+                if word.remaining == 0:
+                    self._complete(word)
+
+    def _complete(self, word):
+        # Appelé sous self._lock : les mots prêts partent, dans l'ordre, vers le thread de livraison
+        if not self.ordered:
+            self._deliveries.put(word)
+            return
+        self._ready[word.seq] = word
+        while self._next_delivery in self._ready:
+            self._deliveries.put(self._ready.pop(self._next_delivery))
+            self._next_delivery += 1
+
+    def _delivery_loop(self):
+        while True:
+            word = self._deliveries.get()
+            if word is None:
+                return
+            self._deliver(word)
+
+    def _deliver(self, word):
+        # Thread de livraison seul, hors de self._lock
+        try:
+            if word.error is not None:
+                self.errors.append((word.key, word.error))
+            elif self.on_word is not None:
+                self.on_word(word.key, word.results)
+                self.delivered += 1
+        except Exception as e:
+            self.errors.append((word.key, e))
+        finally:
+            with self._lock:
+                self._pending_words -= 1
+                self._idle.notify_all()
+            self._word_slots.release()
+
+    def join(self):
+        """Attend la livraison de tous les mots soumis."""
+        with self._idle:
+            while self._pending_words:
+                self._idle.wait()
+
+    def close(self):
+        """Attend les mots en cours puis arrête les threads."""
+        self.join()
+        for _ in self._threads:
+            self._tasks.put(None)
+        self._deliveries.put(None)
+        for thread in self._threads + [self._delivery_thread]:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()